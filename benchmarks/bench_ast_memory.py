@@ -0,0 +1,40 @@
+import argparse
+import tracemalloc
+
+from palu.ast.expr import BinaryExpr, CallExpr, IdentExpr
+from palu.ast.literals import NumberLiteral
+from palu.ast.op import BinaryOp
+from palu.ast.statements import ReturnStatement
+
+
+def build(count: int):
+    # 每组 8 个节点：return f(n) + n * 1，位置模拟 tree-sitter 每次返回的新元组
+    nodes = []
+    for row in range(count):
+        ident = IdentExpr((row, 4), (row, 5), 'n')
+        call = CallExpr((row, 11), (row, 15), IdentExpr((row, 11), (row, 12), 'f'), ident)
+        mul = BinaryExpr((row, 18), (row, 23), BinaryOp.MUL, IdentExpr((row, 18), (row, 19), 'n'),
+                         NumberLiteral((row, 22), (row, 23), '1'))
+        nodes.append(ReturnStatement((row, 4), (row, 23), BinaryExpr((row, 11), (row, 23), BinaryOp.ADD, call, mul)))
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='palu AST memory per node (python -m benchmarks.bench_ast_memory)')
+    parser.add_argument('--count', type=int, default=100_000)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    nodes = build(args.count)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_nodes = args.count * 8
+    print(f'nodes: {total_nodes}')
+    print(f'bytes per node: {(after - before) / total_nodes:.1f}')
+    del nodes
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import argparse
+import time
+
+from benchmarks.bench_parse import generate_source
+from palu.outline import outline
+from palu.parser import parse
+
+
+def main():
+    parser = argparse.ArgumentParser(description='declaration outline vs full parse (python -m benchmarks.bench_outline)')
+    parser.add_argument('--functions', type=int, default=200)
+    parser.add_argument('--statements', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    source = generate_source(args.functions, args.statements, args.depth)
+
+    best_parse = best_outline = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        parse(source)
+        parsed = time.perf_counter()
+        outline(source)
+        outlined = time.perf_counter()
+
+        best_parse = min(best_parse, parsed - start)
+        best_outline = min(best_outline, outlined - parsed)
+
+    print(f'source: {len(source) / 1024:.1f} KiB')
+    print(f'parse: {best_parse * 1000:.2f} ms')
+    print(f'outline: {best_outline * 1000:.2f} ms ({best_parse / best_outline:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import random
+import time
+
+from palu.parser import Transformer, _get_parser, _validate
+
+_OPERATORS = ('+', '-', '*', '/', '%', '==', '!=', '<', '>', '&&', '||', '<<', '>>')
+_LEAVES = ('n', 'total', '1', '42', 'true', 'false', 'null', 'f(n)')
+
+
+def _expression(rng: random.Random, depth: int) -> str:
+    if depth == 0:
+        return rng.choice(_LEAVES)
+    return f'{_expression(rng, depth - 1)} {rng.choice(_OPERATORS)} {_expression(rng, depth - 1)}'
+
+
+def generate_source(functions: int, statements: int, depth: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    lines = ['mod bench', '']
+    for i in range(functions):
+        lines.append(f'fn f{i}(n: i32) -> i32 do')
+        lines.append('    let total: i32 = 0')
+        for _ in range(statements):
+            lines.append(f'    total += {_expression(rng, depth)}')
+        lines.append('    return total')
+        lines.append('end')
+        lines.append('')
+    return '\n'.join(lines).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='parse-to-AST timing on expression heavy sources (python -m benchmarks.bench_parse)')
+    parser.add_argument('--functions', type=int, default=200)
+    parser.add_argument('--statements', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    source = generate_source(args.functions, args.statements, args.depth)
+    ts_parser = _get_parser()
+
+    best_parse = best_transform = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        tree = ts_parser.parse(source)
+        _validate(tree)
+        parsed = time.perf_counter()
+        Transformer().transform(tree, source)
+        transformed = time.perf_counter()
+
+        best_parse = min(best_parse, parsed - start)
+        best_transform = min(best_transform, transformed - parsed)
+
+    print(f'source: {len(source) / 1024:.1f} KiB')
+    print(f'tree-sitter parse + validate: {best_parse * 1000:.2f} ms')
+    print(f'transform: {best_transform * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
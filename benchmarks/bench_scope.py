@@ -0,0 +1,67 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+from palu.typechecker.scope import Scope, ScopedSymbol
+from palu.typechecker.symbol import PaluSymbol
+
+
+def build(depth: int, symbols: int):
+    scopes = [Scope('bench', Scope.ScopeKind.Mod)]
+    for level in range(depth):
+        scope = Scope()
+        scope.add_symbol(*(PaluSymbol(f'v{level}_{i}', None, [], is_variable=True) for i in range(symbols)))
+        scopes[-1].add_child_scope(scope)
+        scopes.append(scope)
+    return scopes
+
+
+def naive_lookup(scope: Scope, name: str):
+    # 原来的实现：递归向上查找，每次都分配新的 ScopedSymbol
+    if name in scope.symbols:
+        return ScopedSymbol(scope, scope.symbols[name])
+    elif scope.parent is not None:
+        return naive_lookup(scope.parent, name)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='palu scope lookup (python -m benchmarks.bench_scope)')
+    parser.add_argument('--depth', type=int, default=200)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--lookups', type=int, default=200_000)
+    args = parser.parse_args()
+
+    scopes = build(args.depth, args.symbols)
+    inner = scopes[-1]
+    rng = random.Random(0)
+    names = [f'v{rng.randrange(args.depth)}_{rng.randrange(args.symbols)}' for _ in range(args.lookups)]
+    names += ['undefined'] * (args.lookups // 10)
+
+    start = time.perf_counter()
+    for name in names:
+        naive_lookup(inner, name)
+    naive = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in names:
+        inner.lookup(name)
+    first = time.perf_counter() - start
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for name in names:
+        inner.lookup(name)
+    warm = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'depth: {args.depth}, symbols per scope: {args.symbols}, lookups: {len(names)}')
+    print(f'naive recursive:  {len(names) / naive:,.0f} lookups/s')
+    print(f'cached (cold):    {len(names) / first:,.0f} lookups/s')
+    print(f'cached (warm):    {len(names) / warm:,.0f} lookups/s, peak traced memory {peak} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import time
+import tracemalloc
+
+from palu.typechecker.predefined import global_scope
+from palu.typechecker.scope import Scope
+from palu.typechecker.symbol import PaluSymbol, Qualifier
+
+
+def build(count: int) -> Scope:
+    # 模拟生成的大模块：每个函数一个符号，外加两个参数变量
+    i32 = global_scope.lookup('i32')
+    assert i32 is not None
+    scope = Scope('bench', Scope.ScopeKind.Mod)
+    for idx in range(count):
+        params = [PaluSymbol(f'a{idx}', i32.symbol, []), PaluSymbol(f'b{idx}', i32.symbol, [], is_pointer=True)]
+        scope.add_symbol(PaluSymbol(f'f{idx}', None, [Qualifier.Export], is_function=True, params=params, ret=i32.symbol))
+    return scope
+
+
+def main():
+    parser = argparse.ArgumentParser(description='palu symbol table size (python -m benchmarks.bench_symbols)')
+    parser.add_argument('--count', type=int, default=100_000)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    scope = build(args.count)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    symbols = args.count * 3
+    print(f'symbols: {symbols}')
+    print(f'bytes per symbol (including scope tables and names): {(after - before) / symbols:.1f}')
+
+    funcs = [scope.symbols[f'f{idx}'] for idx in range(args.count)]
+    start = time.perf_counter()
+    for _ in range(10):
+        for sym in funcs:
+            sym.is_export
+            sym.is_static
+            sym.is_function
+    elapsed = time.perf_counter() - start
+    print(f'flag checks: {args.count * 30 / elapsed:,.0f}/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import random
+import time
+
+from palu.ast.arena import AstArena
+from palu.ast.expr import AssignmentExpr, BinaryExpr, CallExpr, IdentExpr, TypedIdent
+from palu.ast.func import Func
+from palu.ast.literals import NumberLiteral
+from palu.ast.op import AsssignmentOp, BinaryOp
+from palu.ast.source import ModDeclare, SourceFile
+from palu.ast.statements import DeclareStatement, If, ReturnStatement, WhileLoop
+from palu.transpiler import Transpiler
+
+_POS = (0, 0)
+_OPERATORS = (BinaryOp.ADD, BinaryOp.SUB, BinaryOp.MUL, BinaryOp.LT, BinaryOp.EQ, BinaryOp.AND)
+
+
+def _ident(name: str) -> IdentExpr:
+    return IdentExpr(_POS, _POS, name)
+
+
+def _expression(rng: random.Random, depth: int):
+    if depth == 0:
+        return _ident('n') if rng.random() < 0.5 else NumberLiteral(_POS, _POS, str(rng.randrange(100)))
+    if rng.random() < 0.1:
+        return CallExpr(_POS, _POS, _ident('f'), _expression(rng, depth - 1))
+    return BinaryExpr(_POS, _POS, rng.choice(_OPERATORS), _expression(rng, depth - 1), _expression(rng, depth - 1))
+
+
+def _statement(rng: random.Random):
+    choice = rng.random()
+    if choice < 0.4:
+        return AssignmentExpr(_POS, _POS, _ident('n'), AsssignmentOp.AddAssign, _expression(rng, 3))
+    elif choice < 0.6:
+        return DeclareStatement(_POS, _POS, TypedIdent('x', _ident('i32')), _expression(rng, 3))
+    elif choice < 0.8:
+        return If(_POS, _POS, _expression(rng, 2), [ReturnStatement(_POS, _POS, _expression(rng, 2))], None)
+    return WhileLoop(_POS, _POS, _expression(rng, 2), [AssignmentExpr(_POS, _POS, _ident('n'), AsssignmentOp.SubAssign,
+                                                                        NumberLiteral(_POS, _POS, '1'))])
+
+
+def generate_source(statements: int, per_function: int = 50, seed: int = 0) -> SourceFile:
+    rng = random.Random(seed)
+    nodes = [ModDeclare(_POS, _POS, 'bench')]
+    for i in range(0, statements, per_function):
+        body = [_statement(rng) for _ in range(min(per_function, statements - i))]
+        nodes.append(Func(_POS, _POS, f'f{i}', [TypedIdent('n', _ident('i32'))], _ident('i32'), body))
+    return SourceFile(_POS, _POS, nodes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='transpiler throughput (python -m benchmarks.bench_transpile)')
+    parser.add_argument('--statements', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=1)
+    args = parser.parse_args()
+
+    source = generate_source(args.statements)
+    nodes = len(AstArena.from_node(source))
+    transpiler = Transpiler(jobs=args.jobs)
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        output = transpiler.transpile(source)
+        best = min(best, time.perf_counter() - start)
+
+    print(f'nodes: {nodes}, output: {len(output) / 1024:.1f} KiB')
+    print(f'best: {best * 1000:.1f} ms, {nodes / best:,.0f} nodes/sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,222 @@
-from palu.transpiler import Transpiler
+import sys
+import time
+from typing import Any, Iterable, List, Optional, Tuple
+
 import click
-from prompt_toolkit import prompt
 
-from palu.parser import PaluSyntaxError, parse
+
+class _DefaultGroup(click.Group):
+    # `python -m palu a.palu -o a.c` 等价于 `python -m palu build a.palu -o a.c`
+    default_command = 'build'
+
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and not args[0].startswith('-'):
+            args.insert(0, self.default_command)
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=_DefaultGroup, invoke_without_command=True)
+@click.pass_context
+def cli(ctx: click.Context):
+    if ctx.invoked_subcommand is None:
+        ctx.invoke(repl)
 
 
-@click.command()
-def run():
-    transpiler = Transpiler()
+@cli.command()
+@click.option('-j', '--jobs', default=1, show_default=True, help='transpile functions with this many worker processes')
+def repl(jobs: int):
+    """Read palu declarations and print the transpiled C, or evaluate expressions using them."""
+    from prompt_toolkit import prompt
+
+    from palu.evaluator import EvalError, Evaluator, format_value
+    from palu.parser import PaluSyntaxError, parse
+    from palu.transpiler import Transpiler
+
+    transpiler = Transpiler(jobs=jobs)
+    evaluator = Evaluator()
     while True:
         inp = prompt('REPL => ')
         try:
             src = parse(inp.encode('utf-8'))
-            print('transpiled> {}'.format(transpiler.transpile(src)))
         except PaluSyntaxError as e:
-            print(f'syntax error at {e.line}:{e.column}')
-            print(e.tree.root_node.sexp())
+            # 不是声明时按表达式求值，包装成函数体里的 return 语句来解析
+            try:
+                wrapped = parse(f'fn __repl__(void) -> void do\nreturn {inp}\nend'.encode('utf-8'))
+            except PaluSyntaxError:
+                for line, column in e.errors:
+                    print(f'syntax error at {line}:{column}')
+                print(e.tree.root_node.sexp())
+                continue
+            try:
+                print(format_value(evaluator.evaluate(wrapped.statements[0].body[0].expr)))
+            except EvalError as error:
+                print(f'error: {error}')
+            continue
+
+        try:
+            evaluator.load(src)
+        except EvalError as error:
+            print(f'error: {error}')
+        print('transpiled> {}'.format(transpiler.transpile(src)))
+
+
+@cli.command()
+@click.argument('sources', nargs=-1, required=True)
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='output file, only valid with a single source')
+@click.option('--out-dir', type=click.Path(file_okay=False), help='directory for generated .c files')
+@click.option('-j', '--jobs', default=1, show_default=True, help='worker processes')
+@click.option('--cache-dir', type=click.Path(file_okay=False), help='reuse C output of unchanged sources from this directory')
+@click.option('--cache-size', default=256, show_default=True, help='cache size limit in MiB')
+@click.option('--check', is_flag=True, help='type check sources before transpiling')
+@click.option('-O', '--optimize', is_flag=True, help='fold constant expressions and simplify identities')
+def build(sources: Tuple[str, ...], output: Optional[str], out_dir: Optional[str], jobs: int,
+          cache_dir: Optional[str], cache_size: int, check: bool, optimize: bool):
+    """Compile .palu files, directories or globs to C."""
+    from palu.cache import CompilationCache
+    from palu.compiler import compile_files
+
+    jobs_list = _build_jobs(sources, output, out_dir)
+    cache = CompilationCache(cache_dir, cache_size * 1024 * 1024) if cache_dir is not None else None
+
+    start = time.perf_counter()
+    failed = _report(compile_files(jobs_list, jobs, cache, check, optimize))
+    click.echo(f'{len(jobs_list) - failed} compiled, {failed} failed in {(time.perf_counter() - start) * 1000:.1f} ms',
+               err=True)
+    if failed:
+        sys.exit(1)
+
+
+def _report(results: Iterable[Any]) -> int:
+    failed = 0
+    for result in results:
+        if result.error is not None:
+            failed += 1
+            click.echo(f'{result.error}', err=True)
+        else:
+            cached = ', cached' if result.cached else ''
+            click.echo(f'{result.source} -> {result.output} ({result.seconds * 1000:.1f} ms{cached})', err=True)
+    return failed
+
+
+@cli.command()
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False), help='unix socket to listen on')
+@click.option('--cache-dir', type=click.Path(file_okay=False), help='reuse C output of unchanged sources from this directory')
+@click.option('--cache-size', default=256, show_default=True, help='cache size limit in MiB')
+def serve(socket_path: Optional[str], cache_dir: Optional[str], cache_size: int):
+    """Run a compile daemon that keeps the parser loaded between builds."""
+    from palu.cache import CompilationCache
+    from palu.daemon import DaemonUnavailable, default_socket_path
+    from palu.daemon import serve as serve_forever
+
+    cache = CompilationCache(cache_dir, cache_size * 1024 * 1024) if cache_dir is not None else None
+    try:
+        path = socket_path or default_socket_path()
+        click.echo(f'listening on {path}', err=True)
+        serve_forever(path, cache)
+    except DaemonUnavailable as e:
+        raise click.ClickException(str(e))
+
+
+@cli.command()
+@click.argument('sources', nargs=-1)
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='output file, only valid with a single source')
+@click.option('--out-dir', type=click.Path(file_okay=False), help='directory for generated .c files')
+@click.option('-j', '--jobs', default=1, show_default=True, help='worker processes')
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False), help='unix socket of the daemon')
+@click.option('--check', is_flag=True, help='type check sources before transpiling')
+@click.option('-O', '--optimize', is_flag=True, help='fold constant expressions and simplify identities')
+@click.option('--stop', is_flag=True, help='stop the running daemon')
+def client(sources: Tuple[str, ...], output: Optional[str], out_dir: Optional[str], jobs: int,
+           socket_path: Optional[str], check: bool, optimize: bool, stop: bool):
+    """Compile through a running `palu serve` daemon, falling back to compiling in this process."""
+    from types import SimpleNamespace
+
+    # palu.compiler 推迟到编译时才导入 palu.parser，客户端（包括 _build_jobs）只走到路径相关的函数，不会加载 tree_sitter
+    from palu.daemon import DaemonClient, DaemonError, DaemonUnavailable
+
+    try:
+        daemon = DaemonClient(socket_path)
+    except DaemonUnavailable as e:
+        # 默认位置不安全时不能静默退回本地编译，否则问题永远不会被发现
+        raise click.ClickException(str(e))
+    if stop:
+        try:
+            daemon.shutdown()
+        except (DaemonUnavailable, DaemonError) as e:
+            raise click.ClickException(str(e))
+        return
+
+    if not sources:
+        raise click.UsageError('no source files given')
+
+    jobs_list = _build_jobs(sources, output, out_dir)
+    try:
+        results = daemon.compile(jobs_list, jobs, check, optimize)
+    except DaemonUnavailable:
+        from palu.compiler import compile_files
+
+        failed = _report(compile_files(jobs_list, jobs, check=check, optimize=optimize))
+    except DaemonError as e:
+        raise click.ClickException(f'palu daemon failed: {e}')
+    else:
+        failed = _report(SimpleNamespace(**result) for result in results)
+    if failed:
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument('directories', nargs=-1, required=True, type=click.Path(exists=True, file_okay=False))
+@click.option('--out-dir', type=click.Path(file_okay=False), help='directory for generated .c files')
+@click.option('-j', '--jobs', default=1, show_default=True, help='transpile functions with this many worker processes')
+@click.option('--interval', default=0.5, show_default=True, help='seconds between polls')
+def watch(directories: Tuple[str, ...], out_dir: Optional[str], jobs: int, interval: float):
+    """Rebuild changed .palu files whenever they are saved, and re-check the modules that depend on them."""
+    from palu.watch import Watcher
+
+    click.echo(f'watching {", ".join(directories)}', err=True)
+    try:
+        Watcher(directories, out_dir, jobs).run(_report, interval)
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+@click.argument('roots', nargs=-1, type=click.Path(exists=True, file_okay=False))
+@click.option('--db', default='.palu-index.db', show_default=True, type=click.Path(dir_okay=False), help='index database')
+@click.option('--lookup', 'names', multiple=True, help='print declarations of this palu or C name after updating')
+@click.option('--dependents', 'dependents', multiple=True, type=click.Path(dir_okay=False),
+              help='print files whose external declarations use functions defined in this file')
+def index(roots: Tuple[str, ...], db: str, names: Tuple[str, ...], dependents: Tuple[str, ...]):
+    """Update the workspace symbol index of top-level declarations."""
+    from palu.index import WorkspaceIndex
+
+    with WorkspaceIndex(db) as workspace:
+        start = time.perf_counter()
+        update = workspace.update(roots or ('.',))
+        click.echo(f'{len(update.indexed)} indexed, {len(update.removed)} removed, {update.unchanged} unchanged '
+                   f'in {(time.perf_counter() - start) * 1000:.1f} ms', err=True)
+        for name in names:
+            for symbol in workspace.lookup(name):
+                click.echo(f'{symbol.path}:{symbol.line + 1}:{symbol.column + 1}: '
+                           f'{symbol.kind} {symbol.c_name} {symbol.signature}')
+        for path in dependents:
+            for dependent in sorted(workspace.dependents(path)):
+                click.echo(dependent)
+
+
+def _build_jobs(sources: Tuple[str, ...], output: Optional[str], out_dir: Optional[str]) -> List[Tuple[str, str]]:
+    from palu.compiler import conflicting_outputs, expand_source_roots, output_path
 
+    paths = expand_source_roots(sources)
+    if not paths:
+        raise click.UsageError('no source files matched')
+    if output is not None and len(paths) != 1:
+        raise click.UsageError('-o/--output requires exactly one source file')
+    jobs = [(path, output if output is not None else output_path(path, out_dir, root)) for path, root in paths]
+    conflicts = conflicting_outputs(jobs)
+    if conflicts:
+        raise click.UsageError('; '.join(f'{", ".join(paths)} would all be written to {target}'
+                                         for target, paths in conflicts.items()))
+    return jobs
 
-run()
+cli()
@@ -0,0 +1,262 @@
+from array import array
+from typing import Dict, Iterator, List, Tuple, Union
+
+from palu.ast.expr import (AssignmentExpr, BinaryExpr, CallExpr, ConditionExpr,
+                           IdentExpr, ParenthesizedExpr, TypedIdent, UnaryExpr)
+from palu.ast.func import Func
+from palu.ast.literals import (BooleanLiteral, NullLiteral, NumberLiteral,
+                               StringLiteral)
+from palu.ast.node import Node, field_names, unpack_position
+from palu.ast.source import ModDeclare, SourceFile
+from palu.ast.statements import (DeclareStatement, EmptyStatement,
+                                 ExternalFunctionSpec, ExternalStatement,
+                                 ExternalVariableSpec, If, ReturnStatement,
+                                 TypeAliasStatement, WhileLoop)
+
+# kind 编号即在此元组中的下标，只能在末尾追加
+KINDS: Tuple[type, ...] = (
+    SourceFile, ModDeclare, Func, TypedIdent,
+    IdentExpr, BinaryExpr, UnaryExpr, ConditionExpr, CallExpr, ParenthesizedExpr, AssignmentExpr,
+    NumberLiteral, StringLiteral, BooleanLiteral, NullLiteral,
+    EmptyStatement, DeclareStatement, ExternalStatement, ExternalFunctionSpec, ExternalVariableSpec,
+    WhileLoop, If, ReturnStatement, TypeAliasStatement,
+)
+_KIND_IDS: Dict[type, int] = {cls: idx for idx, cls in enumerate(KINDS)}
+
+
+class _Marker(object):
+    __slots__ = ('name',)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+# payload 中的占位符：CHILD 表示按先序排在后面的一个子节点，LIST/TUPLE 开头的元组表示序列字段
+CHILD = _Marker('CHILD')
+LIST = _Marker('LIST')
+TUPLE = _Marker('TUPLE')
+
+AstValue = Union[Node, TypedIdent]
+
+
+# 列式存储的 AST：节点按先序排列，节点 i 的子树即下标区间 [i, subtree_ends[i])，
+# 非节点字段存放在去重后的 payload 表中。node(i) 按需还原出 palu.ast 对象。
+class AstArena(object):
+    def __init__(self) -> None:
+        super().__init__()
+        self.kinds = array('B')
+        self.starts = array('Q')
+        self.ends = array('Q')
+        self.subtree_ends = array('I')
+        self.payloads = array('I')
+        self.payload_table: List[tuple] = []
+        self._payload_ids: Dict[tuple, int] = {}
+        # payload id -> 字段名 -> (payload 项, 前面的字段占用的子节点数, 本字段的子节点数, 是否已经解码)，供 field/view 使用
+        self._layouts: Dict[int, Dict[str, tuple]] = {}
+
+    @classmethod
+    def from_node(cls, root: AstValue) -> 'AstArena':
+        arena = cls()
+        arena.append(root)
+        return arena
+
+    def append(self, root: AstValue) -> int:
+        kinds, starts, ends, subtree_ends, payloads = self.kinds, self.starts, self.ends, self.subtree_ends, self.payloads
+        first = len(kinds)
+        # 栈中的 int 表示该下标的子树已经处理完毕
+        stack: List[Union[AstValue, int]] = [root]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, int):
+                subtree_ends[value] = len(kinds)
+                continue
+
+            idx = len(kinds)
+            kind = _KIND_IDS[type(value)]
+            kinds.append(kind)
+            if isinstance(value, Node):
+                starts.append(value._start)
+                ends.append(value._end)
+            else:
+                starts.append(0)
+                ends.append(0)
+            subtree_ends.append(0)
+
+            children: List[AstValue] = []
+            payload = tuple(_encode(getattr(value, name), children) for name in field_names(type(value)))
+            payloads.append(self._intern_payload(kind, payload))
+
+            stack.append(idx)
+            stack.extend(reversed(children))
+
+        return first
+
+    def _intern_payload(self, kind: int, payload: tuple) -> int:
+        # True == 1，不同类型的节点不能共享 payload，所以 key 中带上 kind
+        key = (kind, payload)
+        payload_id = self._payload_ids.get(key)
+        if payload_id is None:
+            payload_id = self._payload_ids[key] = len(self.payload_table)
+            self.payload_table.append(payload)
+        return payload_id
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def kind(self, idx: int) -> type:
+        return KINDS[self.kinds[idx]]
+
+    def start_pos(self, idx: int) -> Tuple[int, int]:
+        return unpack_position(self.starts[idx])
+
+    def end_pos(self, idx: int) -> Tuple[int, int]:
+        return unpack_position(self.ends[idx])
+
+    def children(self, idx: int) -> Iterator[int]:
+        subtree_ends = self.subtree_ends
+        child, end = idx + 1, subtree_ends[idx]
+        while child < end:
+            yield child
+            child = subtree_ends[child]
+
+    def find(self, kind: type, start: int = 0, stop: int = -1) -> Iterator[int]:
+        kind_id = _KIND_IDS[kind]
+        kinds = self.kinds
+        if stop < 0:
+            stop = len(kinds)
+        for idx in range(start, stop):
+            if kinds[idx] == kind_id:
+                yield idx
+
+    def field(self, idx: int, name: str):
+        # 不还原节点，直接从 payload 读取字段；子节点字段返回子节点的下标，序列字段返回下标组成的 list/tuple
+        return self._field(idx, name, None)
+
+    def view(self, idx: int) -> 'NodeView':
+        return NodeView(self, idx)
+
+    def _field(self, idx: int, name: str, wrap):
+        payload_id = self.payloads[idx]
+        layout = self._layouts.get(payload_id)
+        if layout is None:
+            layout = self._layouts[payload_id] = _layout(KINDS[self.kinds[idx]], self.payload_table[payload_id])
+        entry, skip, count, decoded = layout[name]
+        if not count:
+            # list 每次重新构造，调用方修改时不会影响 payload
+            return entry if decoded else _decode(entry, [])
+
+        subtree_ends = self.subtree_ends
+        child = idx + 1
+        for _ in range(skip):
+            child = subtree_ends[child]
+        if entry is CHILD:
+            return child if wrap is None else wrap(self, child)
+        children: List = []
+        for _ in range(count):
+            children.append(child if wrap is None else wrap(self, child))
+            child = subtree_ends[child]
+        children.reverse()
+        return _decode(entry, children)
+
+    def node(self, idx: int) -> AstValue:
+        kinds, starts, ends, subtree_ends, payloads = self.kinds, self.starts, self.ends, self.subtree_ends, self.payloads
+        payload_table = self.payload_table
+        built: Dict[int, AstValue] = {}
+        # 倒序处理子树，保证构造父节点时子节点都已经构造完毕
+        for current in range(subtree_ends[idx] - 1, idx - 1, -1):
+            cls = KINDS[kinds[current]]
+            obj = cls.__new__(cls)
+            if cls is not TypedIdent:
+                obj._start = starts[current]
+                obj._end = ends[current]
+
+            children: List[AstValue] = []
+            child, end = current + 1, subtree_ends[current]
+            while child < end:
+                children.append(built.pop(child))
+                child = subtree_ends[child]
+
+            children.reverse()
+            for name, entry in zip(field_names(cls), payload_table[payloads[current]]):
+                setattr(obj, name, _decode(entry, children))
+            built[current] = obj
+
+        return built[idx]
+
+
+class NodeView(object):
+    # arena 中一个节点的只读视图，字段按需从数组和 payload 中读取，子节点同样是 NodeView；
+    # 属性名和对应的 palu.ast 类一致，只读取字段的 pass 可以不还原整棵树直接在 arena 上运行
+    __slots__ = ('arena', 'idx')
+
+    def __init__(self, arena: AstArena, idx: int) -> None:
+        self.arena = arena
+        self.idx = idx
+
+    @property
+    def kind(self) -> type:
+        return KINDS[self.arena.kinds[self.idx]]
+
+    @property
+    def start_pos(self) -> Tuple[int, int]:
+        return unpack_position(self.arena.starts[self.idx])
+
+    @property
+    def end_pos(self) -> Tuple[int, int]:
+        return unpack_position(self.arena.ends[self.idx])
+
+    def __getattr__(self, name: str):
+        try:
+            return self.arena._field(self.idx, name, NodeView)
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self) -> str:
+        line, column = self.start_pos
+        return f'<{self.kind.__name__} view {line}:{column}>'
+
+
+def _layout(cls: type, payload: tuple) -> Dict[str, tuple]:
+    layout: Dict[str, tuple] = {}
+    skip = 0
+    for name, entry in zip(field_names(cls), payload):
+        count = _count_children(entry)
+        if not count and not (isinstance(entry, tuple) and entry[0] is LIST):
+            layout[name] = (_decode(entry, []), skip, 0, True)
+        else:
+            layout[name] = (entry, skip, count, False)
+        skip += count
+    return layout
+
+
+def _count_children(entry) -> int:
+    if entry is CHILD:
+        return 1
+    elif isinstance(entry, tuple):
+        return sum(_count_children(item) for item in entry[1:])
+    return 0
+
+
+def _encode(value, children: List[AstValue]):
+    if isinstance(value, (Node, TypedIdent)):
+        children.append(value)
+        return CHILD
+    elif isinstance(value, list):
+        return (LIST, *(_encode(item, children) for item in value))
+    elif isinstance(value, tuple):
+        return (TUPLE, *(_encode(item, children) for item in value))
+    return value
+
+
+def _decode(entry, children: List[AstValue]):
+    # children 为倒序，pop() 依次取出先序排列的子节点
+    if entry is CHILD:
+        return children.pop()
+    elif isinstance(entry, tuple):
+        items = [_decode(item, children) for item in entry[1:]]
+        return items if entry[0] is LIST else tuple(items)
+    return entry
+
@@ -4,6 +4,8 @@ from palu.ast.op import BinaryOp, UnaryOp, AsssignmentOp
 
 
 class TypedIdent(object):
+    __slots__ = ('ident', 'typing', 'is_pointer')
+
     def __init__(self, ident: str, typing, is_pointer=False) -> None:
         super().__init__()
         self.ident = ident
@@ -12,12 +14,16 @@ class TypedIdent(object):
 
 
 class IdentExpr(Node):
+    __slots__ = ('ident',)
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], *ident: str) -> None:
         super().__init__(start, end)
         self.ident = ident
 
 
 class BinaryExpr(Node):
+    __slots__ = ('left', 'right', 'op')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], op: BinaryOp, left: Node, right: Node) -> None:
         super().__init__(start, end)
         self.left = left
@@ -26,6 +32,8 @@ class BinaryExpr(Node):
 
 
 class UnaryExpr(Node):
+    __slots__ = ('op', 'expr')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], op: UnaryOp, expr: Node) -> None:
         super().__init__(start, end)
         self.op = op
@@ -33,6 +41,8 @@ class UnaryExpr(Node):
 
 
 class ConditionExpr(Node):
+    __slots__ = ('condition', 'consequence', 'alternative')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], condition: Node, consequence: Node, alternative: Node) -> None:
         super().__init__(start, end)
         self.condition = condition
@@ -41,6 +51,8 @@ class ConditionExpr(Node):
 
 
 class CallExpr(Node):
+    __slots__ = ('ident', 'args')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], ident: IdentExpr, *args: Node) -> None:
         super().__init__(start, end)
         self.ident = ident
@@ -48,12 +60,16 @@ class CallExpr(Node):
 
 
 class ParenthesizedExpr(Node):
+    __slots__ = ('expr',)
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], expr: Node) -> None:
         super().__init__(start, end)
         self.expr = expr
 
 
 class AssignmentExpr(Node):
+    __slots__ = ('left', 'right', 'op')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], left: IdentExpr, op: AsssignmentOp, right: Node):
         super().__init__(start, end)
         self.left = left
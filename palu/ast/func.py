@@ -3,6 +3,8 @@ from typing import Sequence, Tuple
 
 
 class Func(Node):
+    __slots__ = ('func_name', 'params', 'returns', 'body')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], name: str, params: Sequence, ret, body:  Sequence[Node]):
         super().__init__(start, end)
         self.func_name = name
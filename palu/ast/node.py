@@ -1,11 +1,53 @@
-from abc import ABCMeta
-from typing import Tuple
+from typing import Dict, Tuple
+
+
+def pack_position(pos: Tuple[int, int]) -> int:
+    return pos[0] << 32 | pos[1]
+
+
+def unpack_position(packed: int) -> Tuple[int, int]:
+    return packed >> 32, packed & 0xFFFFFFFF
+
+
+class Node(object):
+    # 位置压缩为一个整数：行号在高 32 位，列号在低 32 位
+    __slots__ = ('_start', '_end')
 
-class Node(metaclass=ABCMeta):
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int]) -> None:
-        self.start_pos = start
-        self.end_pos = end
+        self._start = start[0] << 32 | start[1]
+        self._end = end[0] << 32 | end[1]
+
+    @property
+    def start_pos(self) -> Tuple[int, int]:
+        return unpack_position(self._start)
+
+    @start_pos.setter
+    def start_pos(self, pos: Tuple[int, int]):
+        self._start = pack_position(pos)
+
+    @property
+    def end_pos(self) -> Tuple[int, int]:
+        return unpack_position(self._end)
+
+    @end_pos.setter
+    def end_pos(self, pos: Tuple[int, int]):
+        self._end = pack_position(pos)
 
     def __repr__(self) -> str:
         return f'<{self.__class__.__name__} {self.start_pos[0]}:{self.start_pos[1]}>'
 
+
+_field_names: Dict[type, Tuple[str, ...]] = {}
+
+
+def field_names(cls: type) -> Tuple[str, ...]:
+    # AST 类（以及 TypedIdent）在 __slots__ 中声明的字段，不含位置
+    names = _field_names.get(cls)
+    if names is None:
+        names = tuple(
+            name
+            for klass in reversed(cls.__mro__)
+            if klass is not Node
+            for name in klass.__dict__.get('__slots__', ()))
+        _field_names[cls] = names
+    return names
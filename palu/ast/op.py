@@ -2,6 +2,9 @@ from enum import Enum
 
 
 class BinaryOp(Enum):
+    # 成员都是单例，按 id 哈希即可；Enum 默认的 __hash__ 是 Python 函数，运算符查表时开销很明显
+    __hash__ = object.__hash__
+
     ADD = '+'
     SUB = '-'
     MUL = '*'
@@ -23,12 +26,18 @@ class BinaryOp(Enum):
 
 
 class UnaryOp(Enum):
+    # 成员都是单例，按 id 哈希即可；Enum 默认的 __hash__ 是 Python 函数，运算符查表时开销很明显
+    __hash__ = object.__hash__
+
     ADD = '+'
     SUB = '-'
     NOT = '!'
 
 
 class AsssignmentOp(Enum):
+    # 成员都是单例，按 id 哈希即可；Enum 默认的 __hash__ 是 Python 函数，运算符查表时开销很明显
+    __hash__ = object.__hash__
+
     Direct = '='
     MulAssign = '*='
     DivAssign = '/='
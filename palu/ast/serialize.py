@@ -0,0 +1,252 @@
+import mmap
+import struct
+import sys
+from array import array
+from enum import Enum
+from typing import BinaryIO, Dict, List, Tuple, Type, Union
+
+from palu.ast.arena import CHILD, LIST, TUPLE, AstArena, AstValue
+from palu.ast.op import AsssignmentOp, BinaryOp, UnaryOp
+
+# 文件布局：header 之后依次为各列和 payload/字符串表，每段按 8 字节对齐，
+# 列数据按本机字节序直接写出，加载时用 memoryview.cast 零拷贝读取
+MAGIC = b'PALUAST\0'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<8sHBxIIII9Q')
+_SECTIONS = ('kinds', 'starts', 'ends', 'subtree_ends', 'payloads',
+             'payload_offsets', 'payload_blob', 'string_offsets', 'string_blob')
+_COLUMN_TYPES = {'kinds': 'B', 'starts': 'Q', 'ends': 'Q', 'subtree_ends': 'I', 'payloads': 'I',
+                 'payload_offsets': 'I', 'string_offsets': 'I'}
+
+_ENUMS: Tuple[Type[Enum], ...] = (BinaryOp, UnaryOp, AsssignmentOp)
+_ENUM_IDS: Dict[type, int] = {cls: idx for idx, cls in enumerate(_ENUMS)}
+_ENUM_MEMBERS = [list(cls) for cls in _ENUMS]
+_ENUM_INDEX: Dict[Enum, int] = {member: idx for members in _ENUM_MEMBERS for idx, member in enumerate(members)}
+
+_NONE, _TRUE, _FALSE, _INT, _STR, _ENUM, _CHILD, _LIST, _TUPLE = range(9)
+
+
+class AstFormatError(Exception):
+    pass
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+class _Encoder(object):
+    def __init__(self) -> None:
+        super().__init__()
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+
+    def encode(self, out: bytearray, entry):
+        if entry is None:
+            out.append(_NONE)
+        elif entry is True:
+            out.append(_TRUE)
+        elif entry is False:
+            out.append(_FALSE)
+        elif entry is CHILD:
+            out.append(_CHILD)
+        elif isinstance(entry, Enum):
+            out.append(_ENUM)
+            _write_varint(out, _ENUM_IDS[type(entry)])
+            _write_varint(out, _ENUM_INDEX[entry])
+        elif isinstance(entry, int):
+            out.append(_INT)
+            # zigzag 编码，负数也能用 varint 表示
+            _write_varint(out, entry * 2 if entry >= 0 else -entry * 2 - 1)
+        elif isinstance(entry, str):
+            out.append(_STR)
+            string_id = self._string_ids.get(entry)
+            if string_id is None:
+                string_id = self._string_ids[entry] = len(self.strings)
+                self.strings.append(entry)
+            _write_varint(out, string_id)
+        elif isinstance(entry, tuple) and entry and (entry[0] is LIST or entry[0] is TUPLE):
+            out.append(_LIST if entry[0] is LIST else _TUPLE)
+            _write_varint(out, len(entry) - 1)
+            for item in entry[1:]:
+                self.encode(out, item)
+        else:
+            raise AstFormatError(f'cannot serialize payload value {entry!r}')
+
+
+class _LazyStrings(object):
+    def __init__(self, offsets, blob) -> None:
+        super().__init__()
+        self._offsets = offsets
+        self._blob = blob
+        self._cache: Dict[int, str] = {}
+
+    def __getitem__(self, idx: int) -> str:
+        text = self._cache.get(idx)
+        if text is None:
+            text = self._cache[idx] = str(self._blob[self._offsets[idx]:self._offsets[idx + 1]], 'utf-8')
+        return text
+
+
+class _LazyPayloads(object):
+    # 按 payload id 惰性解码，只还原实际访问到的节点用到的 payload
+    def __init__(self, offsets, blob, strings: _LazyStrings) -> None:
+        super().__init__()
+        self._offsets = offsets
+        self._blob = blob
+        self._strings = strings
+        self._cache: Dict[int, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx: int) -> tuple:
+        payload = self._cache.get(idx)
+        if payload is None:
+            count, pos = _read_varint(self._blob, self._offsets[idx])
+            items = []
+            for _ in range(count):
+                item, pos = self._decode(pos)
+                items.append(item)
+            payload = self._cache[idx] = tuple(items)
+        return payload
+
+    def _decode(self, pos: int):
+        tag = self._blob[pos]
+        pos += 1
+        if tag == _NONE:
+            return None, pos
+        elif tag == _TRUE:
+            return True, pos
+        elif tag == _FALSE:
+            return False, pos
+        elif tag == _CHILD:
+            return CHILD, pos
+        elif tag == _ENUM:
+            enum_id, pos = _read_varint(self._blob, pos)
+            member, pos = _read_varint(self._blob, pos)
+            return _ENUM_MEMBERS[enum_id][member], pos
+        elif tag == _INT:
+            value, pos = _read_varint(self._blob, pos)
+            return (value >> 1 if not value & 1 else -(value >> 1) - 1), pos
+        elif tag == _STR:
+            string_id, pos = _read_varint(self._blob, pos)
+            return self._strings[string_id], pos
+        elif tag == _LIST or tag == _TUPLE:
+            count, pos = _read_varint(self._blob, pos)
+            items: List[object] = [LIST if tag == _LIST else TUPLE]
+            for _ in range(count):
+                item, pos = self._decode(pos)
+                items.append(item)
+            return tuple(items), pos
+        raise AstFormatError(f'unknown payload tag {tag}')
+
+
+def _pad(out: bytearray):
+    out.extend(b'\0' * (-len(out) % 8))
+
+
+def dumps(value: Union[AstArena, AstValue]) -> bytes:
+    arena = value if isinstance(value, AstArena) else AstArena.from_node(value)
+    encoder = _Encoder()
+
+    payload_offsets = array('I')
+    payload_blob = bytearray()
+    for payload in arena.payload_table:
+        payload_offsets.append(len(payload_blob))
+        _write_varint(payload_blob, len(payload))
+        for entry in payload:
+            encoder.encode(payload_blob, entry)
+    payload_offsets.append(len(payload_blob))
+
+    string_offsets = array('I')
+    string_blob = bytearray()
+    for text in encoder.strings:
+        string_offsets.append(len(string_blob))
+        string_blob.extend(text.encode('utf-8'))
+    string_offsets.append(len(string_blob))
+
+    sections = {
+        'kinds': arena.kinds, 'starts': arena.starts, 'ends': arena.ends, 'subtree_ends': arena.subtree_ends,
+        'payloads': arena.payloads, 'payload_offsets': payload_offsets, 'payload_blob': payload_blob,
+        'string_offsets': string_offsets, 'string_blob': string_blob,
+    }
+    out = bytearray(_HEADER.size)
+    offsets = []
+    for name in _SECTIONS:
+        _pad(out)
+        offsets.append(len(out))
+        section = sections[name]
+        out.extend(section.tobytes() if isinstance(section, array) else section)
+    _HEADER.pack_into(out, 0, MAGIC, FORMAT_VERSION, 0 if sys.byteorder == 'little' else 1,
+                      len(arena), len(arena.payload_table), len(encoder.strings), len(out), *offsets)
+    return bytes(out)
+
+
+def loads(data) -> AstArena:
+    view = memoryview(data)
+    if len(view) < _HEADER.size:
+        raise AstFormatError('truncated palu AST data')
+    magic, version, byteorder, node_count, payload_count, string_count, total, *offsets = _HEADER.unpack_from(view)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise AstFormatError('not a palu AST of a supported version')
+    if total > len(view):
+        raise AstFormatError('truncated palu AST data')
+
+    swap = byteorder != (0 if sys.byteorder == 'little' else 1)
+    counts = {'kinds': node_count, 'starts': node_count, 'ends': node_count, 'subtree_ends': node_count,
+              'payloads': node_count, 'payload_offsets': payload_count + 1, 'string_offsets': string_count + 1}
+    bounds = [*offsets, total]
+    sections: Dict[str, object] = {}
+    for idx, name in enumerate(_SECTIONS):
+        raw = view[bounds[idx]:bounds[idx + 1]]
+        typecode = _COLUMN_TYPES.get(name)
+        if typecode is None:
+            sections[name] = raw
+            continue
+
+        size = counts[name] * array(typecode).itemsize
+        if swap:
+            # 字节序不同时只能复制一份再转换
+            column = array(typecode, raw[:size].tobytes())
+            column.byteswap()
+            sections[name] = column
+        else:
+            sections[name] = raw[:size].cast(typecode)
+
+    strings = _LazyStrings(sections['string_offsets'], sections['string_blob'])
+    arena = AstArena()
+    arena.kinds = sections['kinds']  # type: ignore
+    arena.starts = sections['starts']  # type: ignore
+    arena.ends = sections['ends']  # type: ignore
+    arena.subtree_ends = sections['subtree_ends']  # type: ignore
+    arena.payloads = sections['payloads']  # type: ignore
+    arena.payload_table = _LazyPayloads(sections['payload_offsets'], sections['payload_blob'], strings)  # type: ignore
+    return arena
+
+
+def dump(value: Union[AstArena, AstValue], fp: BinaryIO):
+    fp.write(dumps(value))
+
+
+def load(fp: BinaryIO) -> AstArena:
+    # 通过 mmap 加载，只有访问到的节点所在的页才会被读入内存
+    try:
+        mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        raise AstFormatError('truncated palu AST data')
+    return loads(mapping)
@@ -3,12 +3,16 @@ from palu.ast.node import Node
 
 
 class ModDeclare(Node):
+    __slots__ = ('name',)
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], name: str) -> None:
         super().__init__(start, end)
         self.name = name
 
 
 class SourceFile(Node):
+    __slots__ = ('mod', 'statements')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], statements: Sequence[Node]) -> None:
         super().__init__(start, end)
         self.mod = ''
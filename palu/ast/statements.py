@@ -3,11 +3,15 @@ from typing import Optional, Sequence, Tuple
 
 
 class EmptyStatement(Node):
+    __slots__ = ()
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int]) -> None:
         super().__init__(start, end)
 
 
 class DeclareStatement(Node):
+    __slots__ = ('typed_ident', 'initial_value')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], typed_ident, initial_value: Node) -> None:
         super().__init__(start, end)
         self.typed_ident = typed_ident
@@ -15,12 +19,16 @@ class DeclareStatement(Node):
 
 
 class ExternalStatement(Node):
+    __slots__ = ('spec',)
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], spec) -> None:
         super().__init__(start, end)
         self.spec = spec
 
 
 class ExternalFunctionSpec(Node):
+    __slots__ = ('ident', 'params', 'returns')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], ident, params, returns) -> None:
         super().__init__(start, end)
         self.ident = ident
@@ -29,12 +37,16 @@ class ExternalFunctionSpec(Node):
 
 
 class ExternalVariableSpec(Node):
+    __slots__ = ('typed_ident',)
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], typed_ident) -> None:
         super().__init__(start, end)
         self.typed_ident = typed_ident
 
 
 class WhileLoop(Node):
+    __slots__ = ('condition', 'body')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], condition: Node, statements: Sequence[Node]) -> None:
         super().__init__(start, end)
         self.condition = condition
@@ -42,6 +54,8 @@ class WhileLoop(Node):
 
 
 class If(Node):
+    __slots__ = ('condition', 'consequence', 'alternative')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], condition: Node, consequence: Sequence[Node], alternative: Optional[Sequence[Node]]) -> None:
         super().__init__(start, end)
         self.condition = condition
@@ -50,12 +64,16 @@ class If(Node):
 
 
 class ReturnStatement(Node):
+    __slots__ = ('expr',)
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], expr: Node) -> None:
         super().__init__(start, end)
         self.expr = expr
 
 
 class TypeAliasStatement(Node):
+    __slots__ = ('ident', 'typing', 'is_pointer')
+
     def __init__(self, start: Tuple[int, int], end: Tuple[int, int], ident: str, typing, is_pointer=False) -> None:
         super().__init__(start, end)
         self.ident = ident
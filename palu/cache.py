@@ -0,0 +1,91 @@
+import hashlib
+import os
+from typing import List, Optional, Tuple, Union
+
+from palu import __version__
+from palu.ast.arena import AstArena, AstValue
+from palu.ast.serialize import AstFormatError, dumps, load
+from palu.compiler import write_atomic
+from palu.grammar import grammar_hash
+
+
+class CompilationCache(object):
+    # 以 源码 + grammar + palu 版本 + 转译选项 的 hash 为 key 保存生成的 C 代码（以及可选的序列化 AST），
+    # 超过 max_bytes 时按最近使用时间（mtime）淘汰
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024) -> None:
+        super().__init__()
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def key(self, source: bytes, options: str = '') -> str:
+        digest = hashlib.sha256()
+        for part in (__version__, grammar_hash(), options):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(source)
+        return digest.hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key, '.c')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def put(self, key: str, text: str):
+        write_atomic(self._path(key, '.c'), text)
+
+    def get_ast(self, key: str) -> Optional[AstArena]:
+        path = self._path(key, '.ast')
+        try:
+            with open(path, 'rb') as f:
+                arena = load(f)
+        except (FileNotFoundError, AstFormatError):
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arena
+
+    def put_ast(self, key: str, value: Union[AstArena, AstValue]):
+        write_atomic(self._path(key, '.ast'), dumps(value))
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for directory, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
@@ -0,0 +1,218 @@
+import glob
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from palu.ast.source import SourceFile
+    from palu.cache import CompilationCache
+
+
+class CompileResult(NamedTuple):
+    source: str
+    output: str
+    seconds: float
+    error: Optional[str] = None
+    cached: bool = False
+
+
+def _source_root(pattern: str) -> str:
+    # 目录和 glob 的输出在 --out-dir 下保留相对这个根目录的路径
+    if os.path.isdir(pattern):
+        return pattern
+    if glob.has_magic(pattern):
+        magic = min(pattern.index(c) for c in '*?[' if c in pattern)
+        return os.path.dirname(pattern[:magic]) or os.curdir
+    return os.path.dirname(pattern) or os.curdir
+
+
+def expand_source_roots(patterns: Iterable[str]) -> List[Tuple[str, str]]:
+    # 支持文件、目录（递归查找 .palu）和 glob，结果去重并保持顺序；同时返回每个文件所属的根目录
+    result: List[Tuple[str, str]] = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, '**', '*.palu'), recursive=True))
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+
+        root = _source_root(pattern)
+        for path in matches:
+            if path not in seen:
+                seen.add(path)
+                result.append((path, root))
+    return result
+
+
+def expand_sources(patterns: Iterable[str]) -> List[str]:
+    return [path for path, _ in expand_source_roots(patterns)]
+
+
+def scan_sources(roots: Iterable[str]) -> Dict[str, Tuple[int, int]]:
+    # 递归查找 .palu 文件，返回路径到 (mtime_ns, size) 的映射，用于判断文件是否可能发生了变化
+    stamps: Dict[str, Tuple[int, int]] = {}
+    stack = list(roots)
+    while stack:
+        path = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif entry.name.endswith('.palu'):
+                        st = entry.stat()
+                        stamps[entry.path] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            continue
+    return stamps
+
+
+def output_path(source: str, out_dir: Optional[str] = None, root: Optional[str] = None) -> str:
+    target = os.path.splitext(source)[0] + '.c'
+    if out_dir is not None:
+        relative = os.path.relpath(target, root) if root is not None else os.pardir
+        if relative.startswith(os.pardir):
+            # 没有根目录或者不在根目录下时只保留文件名
+            relative = os.path.basename(target)
+        target = os.path.join(out_dir, relative)
+    return target
+
+
+def conflicting_outputs(jobs: Iterable[Tuple[str, str]]) -> Dict[str, List[str]]:
+    # 多个源文件生成到同一个输出文件时会互相覆盖，返回 输出 -> 源文件列表
+    sources: Dict[str, List[str]] = {}
+    for source, output in jobs:
+        sources.setdefault(os.path.normpath(output), []).append(source)
+    return {output: paths for output, paths in sources.items() if len(paths) > 1}
+
+
+def write_atomic(path: str, data: Union[str, bytes]):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.palu-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data.encode('utf-8') if isinstance(data, str) else data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def compile_source(source: bytes, jobs: int = 1, check: bool = False, optimize: bool = False) -> str:
+    from palu.parser import parse
+
+    return _compile_ast(parse(source), jobs, check, optimize)
+
+
+def _compile_ast(ast: 'SourceFile', jobs: int, check: bool, optimize: bool) -> str:
+    from palu.transpiler import Transpiler
+    from palu.typechecker.checker import PaluTypeError, TypeChecker
+
+    if check:
+        errors = TypeChecker(jobs).check(ast)
+        if errors:
+            raise PaluTypeError(errors)
+    return Transpiler(jobs=jobs, optimize=optimize).transpile(ast)
+
+
+def _options(check: bool, optimize: bool) -> str:
+    # 影响输出（或是否报错）的选项，参与缓存 key 的计算
+    return ','.join(name for name, enabled in (('check', check), ('optimize', optimize)) if enabled)
+
+
+def _write_if_changed(path: str, text: str):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return
+    except OSError:
+        pass
+    write_atomic(path, text)
+
+
+def compile_file(source: str, output: str, jobs: int = 1, cache: Optional['CompilationCache'] = None,
+                 check: bool = False, optimize: bool = False) -> CompileResult:
+    # palu.parser 会加载 tree_sitter，推迟到真正需要编译时再导入，daemon 客户端只用到路径相关的函数
+    from palu.parser import PaluSyntaxError, parse_file
+    from palu.typechecker.checker import PaluTypeError
+
+    start = time.perf_counter()
+    try:
+        key = None
+        if cache is None:
+            # 不需要计算缓存 key 时通过 mmap 读取，很大的生成文件不需要整体复制到内存里
+            text = _compile_ast(parse_file(source), jobs, check, optimize)
+        else:
+            # key 和编译必须用同一份内容，否则编译期间文件被修改会把新的输出存到旧的 key 下
+            with open(source, 'rb') as f:
+                data = f.read()
+            key = cache.key(data, _options(check, optimize))
+            cached = cache.get(key)
+            if cached is not None:
+                _write_if_changed(output, cached)
+                return CompileResult(source, output, time.perf_counter() - start, cached=True)
+            text = compile_source(data, jobs, check, optimize)
+        write_atomic(output, text)
+        if cache is not None and key is not None:
+            cache.put(key, text)
+    except PaluSyntaxError as e:
+        message = '; '.join(f'{source}:{line + 1}:{column + 1}: syntax error' for line, column in e.errors)
+        return CompileResult(source, output, time.perf_counter() - start, message)
+    except PaluTypeError as e:
+        message = '; '.join(f'{source}:{line + 1}:{column + 1}: {text}' for (line, column), text in e.errors)
+        return CompileResult(source, output, time.perf_counter() - start, message)
+    except OSError as e:
+        return CompileResult(source, output, time.perf_counter() - start, str(e))
+    except Exception as e:
+        # 语法上合法但还不支持的写法（比如 0x10 这样的字面量）只让这一个文件失败，不影响同一批的其它文件
+        return CompileResult(source, output, time.perf_counter() - start, f'{source}: {type(e).__name__}: {e}')
+    return CompileResult(source, output, time.perf_counter() - start)
+
+
+def _try_cached(source: str, output: str, cache: 'CompilationCache', options: str) -> Optional[CompileResult]:
+    start = time.perf_counter()
+    try:
+        with open(source, 'rb') as f:
+            text = cache.get(cache.key(f.read(), options))
+        if text is None:
+            return None
+        _write_if_changed(output, text)
+    except OSError:
+        return None
+    return CompileResult(source, output, time.perf_counter() - start, cached=True)
+
+
+def _compile_job(job: Tuple[str, str, Optional['CompilationCache'], bool, bool]) -> CompileResult:
+    source, output, cache, check, optimize = job
+    return compile_file(source, output, cache=cache, check=check, optimize=optimize)
+
+
+def compile_files(jobs: List[Tuple[str, str]], workers: int = 1, cache: Optional['CompilationCache'] = None,
+                  check: bool = False, optimize: bool = False) -> Iterator[CompileResult]:
+    # 先在当前进程里处理缓存命中，全部命中时不需要启动进程池
+    pending = jobs
+    if cache is not None:
+        pending = []
+        for source, output in jobs:
+            result = _try_cached(source, output, cache, _options(check, optimize))
+            if result is None:
+                pending.append((source, output))
+            else:
+                yield result
+
+    # 单个文件时把并行度交给 Transpiler 按函数拆分，多个文件时按文件分发到进程池
+    if len(pending) == 1:
+        yield compile_file(*pending[0], jobs=workers, cache=cache, check=check, optimize=optimize)
+    elif workers <= 1:
+        yield from map(_compile_job, [(source, output, cache, check, optimize) for source, output in pending])
+    elif pending:
+        with ProcessPoolExecutor(workers) as executor:
+            yield from executor.map(_compile_job, [(source, output, cache, check, optimize) for source, output in pending])
+
+    if cache is not None:
+        cache.evict()
@@ -0,0 +1,200 @@
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from palu import __version__
+
+if TYPE_CHECKING:
+    from palu.cache import CompilationCache
+
+# 客户端只依赖标准库，不能在模块顶层导入 palu.compiler / tree_sitter，否则就失去了常驻进程的意义
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+class DaemonError(Exception):
+    # daemon 处理请求时出错，返回了 error 响应；和连接不上不同，不应该退回本地编译
+    pass
+
+
+def _private_dir(path: str) -> str:
+    # 默认 socket 所在的目录只能由当前用户访问，否则其他用户可以抢先创建同名 socket 冒充 daemon
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise DaemonUnavailable(f'refusing to use {path}: it must be a directory owned by the current user '
+                                'and not accessible by others (mode 0700)')
+    return path
+
+
+def default_socket_path() -> str:
+    override = os.environ.get('PALU_SOCKET')
+    if override:
+        return override
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or os.path.join(tempfile.gettempdir(), f'palu-{os.getuid()}')
+    return os.path.join(_private_dir(runtime_dir), 'palu.sock')
+
+
+def warm_up():
+    # 在 fork 之前把 grammar、parser 和预定义作用域都加载好，子进程直接继承
+    import gc
+
+    import palu.compiler  # noqa: F401
+    import palu.typechecker.predefined  # noqa: F401
+    from palu.grammar import load_language
+    from palu.parser import _get_parser
+
+    load_language()
+    _get_parser()
+    # 避免子进程中的 gc 触碰这些常驻对象导致写时复制
+    gc.freeze()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: 'DaemonServer'
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.dispatch(json.loads(line))
+            except Exception as e:
+                response = {'error': f'{type(e).__name__}: {e}'}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class DaemonServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    # 每个连接 fork 一个子进程处理，子进程继承已经预热的 parser，多个构建任务可以并行编译
+    block_on_close = False
+
+    def __init__(self, path: str, cache: Optional['CompilationCache'] = None) -> None:
+        self.path = path
+        self.cache = cache
+        self.pid = os.getpid()
+        _remove_stale_socket(path)
+        # 只允许当前用户连接
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(umask)
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get('op')
+        if op == 'ping':
+            return {'version': __version__, 'pid': self.pid}
+        elif op == 'compile':
+            from palu.compiler import compile_files
+
+            jobs = [(source, output) for source, output in request['files']]
+            results = compile_files(jobs, int(request.get('jobs', 1)), self.cache,
+                                    bool(request.get('check')), bool(request.get('optimize')))
+            return {'results': [result._asdict() for result in results]}
+        elif op == 'shutdown':
+            os.kill(self.pid, signal.SIGTERM)
+            return {}
+        raise ValueError(f'unknown op {op!r}')
+
+    def serve(self):
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            self.serve_forever()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            self.server_close()
+            if os.getpid() == self.pid:
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+
+
+def _remove_stale_socket(path: str):
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return
+    # 只删除当前用户留下的 socket，不碰其它文件
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise DaemonUnavailable(f'{path} exists and is not a palu daemon socket of the current user')
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        # 之前的进程异常退出留下的 socket 文件
+        os.remove(path)
+    else:
+        raise DaemonUnavailable(f'a palu daemon is already listening on {path}')
+    finally:
+        sock.close()
+
+
+def serve(path: Optional[str] = None, cache: Optional['CompilationCache'] = None):
+    warm_up()
+    DaemonServer(path or default_socket_path(), cache).serve()
+
+
+class DaemonClient(object):
+    def __init__(self, path: Optional[str] = None, timeout: Optional[float] = None) -> None:
+        super().__init__()
+        self.path = path or default_socket_path()
+        self.timeout = timeout
+
+    def request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            try:
+                sock.connect(self.path)
+            except OSError as e:
+                raise DaemonUnavailable(f'cannot connect to palu daemon at {self.path}: {e}')
+            with sock.makefile('rwb') as f:
+                f.write(json.dumps(payload).encode('utf-8') + b'\n')
+                f.flush()
+                line = f.readline()
+        finally:
+            sock.close()
+
+        if not line:
+            raise DaemonUnavailable('palu daemon closed the connection')
+        response = json.loads(line)
+        if 'error' in response:
+            raise DaemonError(response['error'])
+        return response
+
+    def ping(self) -> Dict[str, Any]:
+        return self.request({'op': 'ping'})
+
+    def compile(self, files: Sequence[Tuple[str, str]], jobs: int = 1, check: bool = False,
+                optimize: bool = False) -> List[Dict[str, Any]]:
+        # daemon 的工作目录和客户端不同，发送绝对路径，返回结果时再换回调用方给出的路径
+        names = {}
+        absolute = []
+        for source, output in files:
+            names[os.path.abspath(source)] = source
+            names[os.path.abspath(output)] = output
+            absolute.append((os.path.abspath(source), os.path.abspath(output)))
+
+        results = self.request({'op': 'compile', 'files': absolute, 'jobs': jobs, 'check': check,
+                                'optimize': optimize})['results']
+        for result in results:
+            result['source'] = names.get(result['source'], result['source'])
+            result['output'] = names.get(result['output'], result['output'])
+        return results
+
+    def shutdown(self):
+        self.request({'op': 'shutdown'})
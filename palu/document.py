@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional, Tuple, Union
+
+from tree_sitter import Tree
+
+from palu.ast.expr import TypedIdent
+from palu.ast.node import Node as PaluNode
+from palu.ast.node import field_names
+from palu.ast.source import SourceFile
+from palu.parser import Transformer, _get_parser, _validate
+
+
+class _Entry(object):
+    def __init__(self, start_byte: int, end_byte: int, kind: str, node: PaluNode) -> None:
+        super().__init__()
+        self.start_byte = start_byte
+        self.end_byte = end_byte
+        self.kind = kind
+        self.node = node
+        # 尚未应用到 node 上的行号偏移，等到重新生成 SourceFile 时一次性应用
+        self.pending_rows = 0
+
+
+def _point_at(source: bytes, byte: int) -> Tuple[int, int]:
+    row = source.count(b'\n', 0, byte)
+    return row, byte - (source.rfind(b'\n', 0, byte) + 1)
+
+
+def _shifted(node: PaluNode, delta: int) -> PaluNode:
+    # 之前返回的 SourceFile 还引用着旧节点，复制一份并平移行号，旧的语法树保持不变；
+    # 表达式可能嵌套很深，用显式栈先序收集节点，再按逆序从叶子开始复制
+    packed_delta = delta << 32
+    order: List[Union[PaluNode, TypedIdent]] = []
+    stack: List[Union[PaluNode, TypedIdent]] = [node]
+    while stack:
+        value = stack.pop()
+        order.append(value)
+        for name in field_names(type(value)):
+            child = getattr(value, name)
+            if isinstance(child, (PaluNode, TypedIdent)):
+                stack.append(child)
+            elif isinstance(child, (list, tuple)):
+                stack.extend(item for item in child if isinstance(item, (PaluNode, TypedIdent)))
+
+    copies: Dict[int, Union[PaluNode, TypedIdent]] = {}
+
+    def copied(value):
+        if isinstance(value, (PaluNode, TypedIdent)):
+            return copies[id(value)]
+        elif isinstance(value, (list, tuple)):
+            items = [copies[id(item)] if isinstance(item, (PaluNode, TypedIdent)) else item for item in value]
+            return items if isinstance(value, list) else tuple(items)
+        return value
+
+    for value in reversed(order):
+        if id(value) in copies:
+            continue
+        cls = type(value)
+        copy = cls.__new__(cls)
+        if isinstance(value, PaluNode):
+            copy._start = value._start + packed_delta
+            copy._end = value._end + packed_delta
+        for name in field_names(cls):
+            setattr(copy, name, copied(getattr(value, name)))
+        copies[id(value)] = copy
+
+    result = copies[id(node)]
+    assert isinstance(result, PaluNode)
+    return result
+
+
+# 面向编辑器的增量解析：编辑作用于上一次的 tree-sitter 语法树后增量重新解析，
+# 文本和位置都没有变化的顶层声明直接复用之前生成的 palu AST 节点，只有行号变化的声明复用一份平移过的副本。
+class Document(object):
+    def __init__(self, source: bytes) -> None:
+        super().__init__()
+        self.source = source
+        self.tree: Tree = _get_parser().parse(source)
+        self._entries: List[_Entry] = []
+        self._source_file: Optional[SourceFile] = None
+
+    def edit(self, start_byte: int, old_end_byte: int, new_text: bytes):
+        start_point = _point_at(self.source, start_byte)
+        old_end_point = _point_at(self.source, old_end_byte)
+        newlines = new_text.count(b'\n')
+        if newlines:
+            new_end_point = (start_point[0] + newlines, len(new_text) - (new_text.rfind(b'\n') + 1))
+        else:
+            new_end_point = (start_point[0], start_point[1] + len(new_text))
+        new_end_byte = start_byte + len(new_text)
+
+        self.source = self.source[:start_byte] + new_text + self.source[old_end_byte:]
+        self.tree.edit(start_byte, old_end_byte, new_end_byte, start_point, old_end_point, new_end_point)
+        self.tree = _get_parser().parse(self.source, self.tree)
+        self._source_file = None
+
+        byte_delta = new_end_byte - old_end_byte
+        row_delta = new_end_point[0] - old_end_point[0]
+        entries: List[_Entry] = []
+        for entry in self._entries:
+            if entry.end_byte <= start_byte:
+                entries.append(entry)
+            elif entry.start_byte >= old_end_byte:
+                # 和编辑位置同一行的声明列号也变了，直接丢弃重新转换
+                if entry.node.start_pos[0] + entry.pending_rows != old_end_point[0]:
+                    entry.start_byte += byte_delta
+                    entry.end_byte += byte_delta
+                    entry.pending_rows += row_delta
+                    entries.append(entry)
+        self._entries = entries
+
+    @property
+    def source_file(self) -> SourceFile:
+        if self._source_file is None:
+            self._source_file = self._transform()
+        return self._source_file
+
+    def _transform(self) -> SourceFile:
+        tree = self.tree
+        root = tree.root_node
+        _validate(tree)
+
+        reusable: Dict[Tuple[int, int, str], _Entry] = {
+            (entry.start_byte, entry.end_byte, entry.kind): entry for entry in self._entries}
+        transformer = Transformer()
+        entries: List[_Entry] = []
+        statements: List[PaluNode] = []
+        for stmt in root.children:
+            entry = reusable.get((stmt.start_byte, stmt.end_byte, stmt.type))
+            if entry is None:
+                entry = _Entry(stmt.start_byte, stmt.end_byte, stmt.type, transformer.transform_top_level(stmt, self.source))
+            elif entry.pending_rows:
+                entry.node = _shifted(entry.node, entry.pending_rows)
+                entry.pending_rows = 0
+            entries.append(entry)
+            statements.append(entry.node)
+
+        self._entries = entries
+        return SourceFile(root.start_point, root.end_point, statements)
@@ -0,0 +1,813 @@
+import math
+import operator
+import re
+import struct
+import sys
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Set, TextIO, Tuple, Union
+
+from palu.ast.expr import (AssignmentExpr, BinaryExpr, CallExpr, ConditionExpr, IdentExpr, ParenthesizedExpr,
+                           TypedIdent, UnaryExpr)
+from palu.ast.func import Func
+from palu.ast.literals import BooleanLiteral, NullLiteral, NumberLiteral, StringLiteral
+from palu.ast.node import Node
+from palu.ast.op import AsssignmentOp, BinaryOp, UnaryOp
+from palu.ast.source import ModDeclare, SourceFile
+from palu.ast.statements import (DeclareStatement, EmptyStatement, ExternalFunctionSpec, ExternalStatement,
+                                 ExternalVariableSpec, If, ReturnStatement, TypeAliasStatement, WhileLoop)
+from palu.optimizer import _c_div
+from palu.typechecker.checker import _expr_operands
+from palu.typechecker.scope import Scope
+
+# 每个 AST 节点只编译一次，生成接收栈帧（list）的 Python 闭包；局部变量在编译期分配槽位，
+# 运行时按下标访问。整数运算按 C 的整数提升和常用算术转换规则进行，结果截断到对应的位宽，
+# 保证和转译出来的 C 代码行为一致
+
+
+class EvalError(Exception):
+    pass
+
+
+class _Type(NamedTuple):
+    name: str
+    # int / float / bool / string / pointer / void
+    kind: str
+    bits: int = 0
+    signed: bool = False
+
+    def __str__(self) -> str:
+        return self.name
+
+
+_BUILTIN_TYPES: Dict[str, _Type] = {
+    'void': _Type('void', 'void'),
+    'bool': _Type('bool', 'bool'),
+    'string': _Type('string', 'string'),
+    'f32': _Type('f32', 'float', 32, True),
+    'f64': _Type('f64', 'float', 64, True),
+    **{f'{sign}{bits}': _Type(f'{sign}{bits}', 'int', bits, sign == 'i') for sign in 'iu' for bits in (8, 16, 32, 64)},
+}
+_VOID = _BUILTIN_TYPES['void']
+_BOOL = _BUILTIN_TYPES['bool']
+_STRING = _BUILTIN_TYPES['string']
+_I32 = _BUILTIN_TYPES['i32']
+_I64 = _BUILTIN_TYPES['i64']
+_U64 = _BUILTIN_TYPES['u64']
+_F32 = _BUILTIN_TYPES['f32']
+_F64 = _BUILTIN_TYPES['f64']
+_POINTER = _Type('pointer', 'pointer')
+
+_NUMERIC_KINDS = frozenset(('int', 'float', 'bool'))
+
+_FLOAT32 = struct.Struct('f')
+_FLT_MAX = 3.4028234663852886e38
+
+
+def _round_f32(value: float) -> float:
+    if math.isnan(value) or math.isinf(value):
+        return value
+    if abs(value) > _FLT_MAX:
+        return math.copysign(math.inf, value)
+    return _FLOAT32.unpack(_FLOAT32.pack(value))[0]
+
+
+def _wrapper(t: _Type) -> Callable[[Any], Any]:
+    if t.kind == 'float':
+        return _round_f32 if t.bits == 32 else float
+    mask = (1 << t.bits) - 1
+    if t.signed:
+        half = 1 << (t.bits - 1)
+        return lambda v: ((v + half) & mask) - half
+    return lambda v: v & mask
+
+
+_WRAPPERS = {t: _wrapper(t) for t in _BUILTIN_TYPES.values() if t.kind in ('int', 'float')}
+
+
+def _converter(target: _Type, source: _Type) -> Optional[Callable[[Any], Any]]:
+    # 返回 None 表示不需要转换
+    if target == source:
+        return None
+    if target.kind == 'int':
+        wrap = _WRAPPERS[target]
+        if source.kind == 'int':
+            if source.signed == target.signed and source.bits <= target.bits:
+                return None
+            if target.signed and source.bits < target.bits:
+                return None
+            return wrap
+        elif source.kind == 'bool':
+            return int
+        elif source.kind == 'float':
+            return lambda v: wrap(int(v))
+    elif target.kind == 'float':
+        if source.kind == 'float' and target.bits > source.bits:
+            return None
+        return _WRAPPERS[target]
+    elif target.kind == 'bool':
+        return bool
+    return None
+
+
+def _convert(closure: Callable, target: _Type, source: _Type) -> Callable:
+    convert = _converter(target, source)
+    if convert is None:
+        return closure
+    return lambda frame: convert(closure(frame))
+
+
+def _promote(t: _Type) -> _Type:
+    if t.kind == 'bool' or (t.kind == 'int' and t.bits < 32):
+        return _I32
+    return t
+
+
+def _common(a: _Type, b: _Type) -> _Type:
+    # C 的常用算术转换
+    if a.kind == 'float' or b.kind == 'float':
+        return _F64 if _F64 in (a, b) else _F32
+    a, b = _promote(a), _promote(b)
+    if a == b:
+        return a
+    if a.signed == b.signed:
+        return a if a.bits > b.bits else b
+    unsigned, signed = (a, b) if not a.signed else (b, a)
+    return unsigned if unsigned.bits >= signed.bits else signed
+
+
+def _literal_type(value: int) -> _Type:
+    if -(1 << 31) <= value < (1 << 31):
+        return _I32
+    elif value < (1 << 63):
+        return _I64
+    return _U64
+
+
+def _decode_string(text: str) -> str:
+    # 去掉引号并处理 C 风格的转义
+    return text[1:-1].encode('latin-1', 'backslashreplace').decode('unicode_escape')
+
+
+_MISSING = object()
+_PRINTF_SPEC = re.compile(r'%([-+ #0]*\d*(?:\.\d+)?)(hh|h|ll|l|z|j|t|L)?([diouxXeEfgGcs%])')
+# 整数转换按长度修饰符对应的 C 类型截断，没有修饰符时是 int
+_PRINTF_BITS = {'hh': 8, 'h': 16, 'l': 64, 'll': 64, 'z': 64, 'j': 64, 't': 64}
+
+
+def _printf_argument_types(conversion: str) -> Tuple[type, ...]:
+    if conversion in 'diouxXc':
+        return (int,)
+    elif conversion == 's':
+        return (str,)
+    return (int, float)
+
+
+def _printf(stdout: TextIO, fmt: str, *args) -> int:
+    if not isinstance(fmt, str):
+        raise EvalError(f'printf: format must be a string, got {_type_of_value(fmt)}')
+    values = iter(args)
+
+    def replace(match: 're.Match') -> str:
+        flags, length, conversion = match.groups()
+        if conversion == '%':
+            return '%'
+        value = next(values, _MISSING)
+        if value is _MISSING:
+            raise EvalError(f'printf: no argument for {match.group()} in {fmt!r}')
+        if not isinstance(value, _printf_argument_types(conversion)):
+            raise EvalError(f'printf: {match.group()} does not accept {_type_of_value(value)} argument {format_value(value)}')
+        if conversion in 'diouxX':
+            mask = (1 << _PRINTF_BITS.get(length, 32)) - 1
+            value &= mask
+            if conversion in 'di' and value > mask >> 1:
+                value -= mask + 1
+            return f'%{flags}{"d" if conversion in "diu" else conversion}' % value
+        elif conversion == 'c':
+            # %c 按 unsigned char 输出
+            return f'%{flags}c' % chr(value & 0xff)
+        return f'%{flags}{conversion}' % value
+
+    text = _PRINTF_SPEC.sub(replace, fmt)
+    stdout.write(text)
+    return len(text)
+
+
+class _Function(object):
+    __slots__ = ('name', 'params', 'returns', 'variadic', 'func', 'nslots', 'body', 'calls')
+
+    def __init__(self, name: str, params: Sequence[_Type], returns: _Type, variadic: bool, func: Func) -> None:
+        self.name = name
+        self.params = params
+        self.returns = returns
+        self.variadic = variadic
+        self.func = func
+        self.nslots = 0
+        self.body: Optional[Callable[[list], bool]] = None
+        # 函数体中调用的函数名，签名变化时据此找到需要重新编译的调用方
+        self.calls: Set[str] = set()
+
+    def replace_body(self, compiled: '_Function'):
+        self.func, self.nslots, self.body, self.calls = compiled.func, compiled.nslots, compiled.body, compiled.calls
+
+    def invoke(self, args: list):
+        # 槽位 0 保存返回值，参数从槽位 1 开始
+        frame = [None] * self.nslots
+        count = len(self.params)
+        frame[1:count + 1] = args[:count]
+        body = self.body
+        if body is None:
+            raise EvalError(f'function {self.name} is not compiled')
+        body(frame)
+        return frame[0]
+
+
+class _External(object):
+    __slots__ = ('evaluator', 'name', 'params', 'returns', 'variadic')
+
+    def __init__(self, evaluator: 'Evaluator', name: str, params: Sequence[_Type], returns: _Type, variadic: bool) -> None:
+        self.evaluator = evaluator
+        self.name = name
+        self.params = params
+        self.returns = returns
+        self.variadic = variadic
+
+    def invoke(self, args: list):
+        # 调用时才解析，允许先声明 external 再加载提供它的模块
+        evaluator = self.evaluator
+        function = evaluator._c_functions.get(self.name)
+        if function is not None:
+            return function.invoke(args)
+        implementation = evaluator.externals.get(self.name)
+        if implementation is None or not callable(implementation):
+            raise EvalError(f'external function {self.name} is not provided')
+        result = implementation(*args)
+        convert = _converter(self.returns, _type_of_value(result))
+        return result if convert is None or self.returns.kind == 'void' else convert(result)
+
+
+def _signature(function: Union[_Function, _External]) -> tuple:
+    return type(function), tuple(function.params), function.returns, function.variadic
+
+
+class _Namespace(NamedTuple):
+    functions: Dict[str, Union[_Function, _External]]
+    variables: Dict[str, _Type]
+    aliases: Dict[str, _Type]
+    # name mangling 之后的 C 符号名到函数
+    c_functions: Dict[str, _Function]
+
+
+def _type_of_value(value) -> _Type:
+    if isinstance(value, bool):
+        return _BOOL
+    elif isinstance(value, int):
+        return _literal_type(value)
+    elif isinstance(value, float):
+        return _F64
+    elif isinstance(value, str):
+        return _STRING
+    return _POINTER
+
+
+_COMPARISONS = {
+    BinaryOp.EQ: operator.eq, BinaryOp.NE: operator.ne, BinaryOp.GT: operator.gt,
+    BinaryOp.LT: operator.lt, BinaryOp.GTE: operator.ge, BinaryOp.LTE: operator.le,
+}
+_ARITHMETIC = {BinaryOp.ADD: operator.add, BinaryOp.SUB: operator.sub, BinaryOp.MUL: operator.mul}
+_BITWISE = {BinaryOp.BIT_AND: operator.and_, BinaryOp.BIT_OR: operator.or_, BinaryOp.BIT_XOR: operator.xor}
+
+_COMPOUND_ASSIGNMENTS = {
+    AsssignmentOp.MulAssign: BinaryOp.MUL, AsssignmentOp.DivAssign: BinaryOp.DIV,
+    AsssignmentOp.AddAssign: BinaryOp.ADD, AsssignmentOp.SubAssign: BinaryOp.SUB,
+    AsssignmentOp.LSAssign: BinaryOp.LSHIFT, AsssignmentOp.RSAssign: BinaryOp.RSHIFT,
+    AsssignmentOp.BAAssign: BinaryOp.BIT_AND, AsssignmentOp.BOAssign: BinaryOp.BIT_OR,
+    AsssignmentOp.BXAssign: BinaryOp.BIT_XOR,
+}
+
+Compiled = Tuple[Callable[[list], Any], _Type]
+
+
+def _int_division(op: BinaryOp, wrap: Callable, left: Callable, right: Callable) -> Callable:
+    if op is BinaryOp.DIV:
+        def divide(frame):
+            a, b = left(frame), right(frame)
+            if b == 0:
+                raise EvalError('integer division by zero')
+            return wrap(_c_div(a, b))
+        return divide
+
+    def remainder(frame):
+        a, b = left(frame), right(frame)
+        if b == 0:
+            raise EvalError('integer division by zero')
+        return wrap(a - b * _c_div(a, b))
+    return remainder
+
+
+def _float_division(left: Callable, right: Callable, wrap: Callable) -> Callable:
+    def divide(frame):
+        a, b = left(frame), right(frame)
+        if b == 0:
+            # IEEE 754：x / 0 得到带符号的无穷大，0 / 0 得到 NaN
+            if a == 0 or math.isnan(a):
+                return math.nan
+            return math.copysign(math.inf, a) * math.copysign(1.0, b)
+        return wrap(a / b)
+    return divide
+
+
+def _shift(op: BinaryOp, result: _Type, left: Callable, right: Callable) -> Callable:
+    wrap = _WRAPPERS[result]
+    bits = result.bits
+
+    def shift(frame):
+        a, n = left(frame), right(frame)
+        if not 0 <= n < bits:
+            raise EvalError(f'shift count {n} is out of range for {result}')
+        return wrap(a << n) if op is BinaryOp.LSHIFT else a >> n
+    return shift
+
+
+def _binary(node: Node, op: BinaryOp, left: Compiled, right: Compiled) -> Compiled:
+    (lc, lt), (rc, rt) = left, right
+    if op is BinaryOp.AND:
+        return (lambda frame: bool(lc(frame)) and bool(rc(frame))), _BOOL
+    elif op is BinaryOp.OR:
+        return (lambda frame: bool(lc(frame)) or bool(rc(frame))), _BOOL
+
+    numeric = lt.kind in _NUMERIC_KINDS and rt.kind in _NUMERIC_KINDS
+    if op in _COMPARISONS:
+        compare = _COMPARISONS[op]
+        if numeric:
+            common = _common(lt, rt)
+            lc, rc = _convert(lc, common, lt), _convert(rc, common, rt)
+        elif op not in (BinaryOp.EQ, BinaryOp.NE):
+            raise _error(node, f'operator {op.value} is not supported on {lt} and {rt}')
+        return (lambda frame: compare(lc(frame), rc(frame))), _BOOL
+
+    if not numeric:
+        raise _error(node, f'operator {op.value} is not supported on {lt} and {rt}')
+    if op in (BinaryOp.LSHIFT, BinaryOp.RSHIFT):
+        result = _promote(lt)
+        if result.kind != 'int' or _promote(rt).kind != 'int':
+            raise _error(node, f'operator {op.value} requires integral operands, got {lt} and {rt}')
+        return _shift(op, result, _convert(lc, result, lt), _convert(rc, _promote(rt), rt)), result
+
+    common = _common(lt, rt)
+    wrap = _WRAPPERS[common]
+    lc, rc = _convert(lc, common, lt), _convert(rc, common, rt)
+    if op in _ARITHMETIC:
+        arithmetic = _ARITHMETIC[op]
+        return (lambda frame: wrap(arithmetic(lc(frame), rc(frame)))), common
+    elif op is BinaryOp.DIV and common.kind == 'float':
+        return _float_division(lc, rc, wrap), common
+    elif common.kind != 'int':
+        raise _error(node, f'operator {op.value} requires integral operands, got {lt} and {rt}')
+    elif op is BinaryOp.DIV or op is BinaryOp.PERC:
+        return _int_division(op, wrap, lc, rc), common
+    bitwise = _BITWISE[op]
+    return (lambda frame: wrap(bitwise(lc(frame), rc(frame)))), common
+
+
+def _error(node: Node, message: str) -> EvalError:
+    line, column = node.start_pos
+    return EvalError(f'{line + 1}:{column + 1}: {message}')
+
+
+def _ident_name(node: Node, ident: IdentExpr) -> str:
+    if len(ident.ident) != 1:
+        raise _error(node, f'{"".join(ident.ident)}: member access is not supported')
+    return ident.ident[0]
+
+
+class _FunctionCompiler(object):
+    # 把一个函数体编译成闭包，同时为局部变量分配栈帧槽位
+    def __init__(self, evaluator: 'Evaluator', returns: _Type, namespace: Optional[_Namespace] = None) -> None:
+        super().__init__()
+        self.evaluator = evaluator
+        self.namespace = namespace or evaluator._namespace()
+        self.returns = returns
+        self.calls: Set[str] = set()
+        # 作用域链，内层在后；变量名映射到 (槽位, 类型)，类型别名映射到类型
+        self.scopes: List[Dict[str, Union[Tuple[int, _Type], _Type]]] = [{}]
+        self.nslots = 1
+        self._statements: Dict[type, Callable[[Node], Callable[[list], Any]]] = {
+            DeclareStatement: self._declare,
+            AssignmentExpr: self._assignment,
+            CallExpr: self._expression_statement,
+            If: self._if,
+            WhileLoop: self._while,
+            ReturnStatement: self._return,
+            EmptyStatement: lambda stmt: None,
+            TypeAliasStatement: self._type_alias,
+        }
+        self._exprs: Dict[type, Callable[[Any, List[Compiled]], Compiled]] = {
+            IdentExpr: self._ident,
+            BinaryExpr: lambda node, operands: _binary(node, node.op, *operands),
+            UnaryExpr: self._unary,
+            ConditionExpr: self._condition,
+            ParenthesizedExpr: lambda node, operands: operands[0],
+            CallExpr: self._call,
+            NumberLiteral: lambda node, operands: ((lambda frame, v=node.value: v), _literal_type(node.value)),
+            BooleanLiteral: lambda node, operands: ((lambda frame, v=node.value: v), _BOOL),
+            StringLiteral: lambda node, operands: ((lambda frame, v=_decode_string(node.value): v), _STRING),
+            NullLiteral: lambda node, operands: ((lambda frame: None), _POINTER),
+        }
+
+    def declare(self, name: str, t: _Type) -> int:
+        slot = self.nslots
+        self.nslots += 1
+        self.scopes[-1][name] = (slot, t)
+        return slot
+
+    def lookup(self, node: Node, name: str) -> Tuple[int, _Type]:
+        for scope in reversed(self.scopes):
+            found = scope.get(name)
+            if isinstance(found, tuple):
+                return found
+            elif found is not None:
+                break
+        raise _error(node, f'{name} is not a variable')
+
+    def resolve_type(self, node: Node, typing: IdentExpr, is_pointer: bool = False) -> _Type:
+        if is_pointer:
+            return _POINTER
+        name = _ident_name(node, typing)
+        for scope in reversed(self.scopes):
+            found = scope.get(name)
+            if isinstance(found, _Type):
+                return found
+        found = self.namespace.aliases.get(name) or _BUILTIN_TYPES.get(name)
+        if found is None:
+            raise _error(node, f'unknown type {name}')
+        return found
+
+    def block(self, statements: Sequence[Node]) -> Callable[[list], bool]:
+        self.scopes.append({})
+        try:
+            compiled = [c for c in map(self.statement, statements) if c is not None]
+        finally:
+            self.scopes.pop()
+
+        # 语句闭包返回真值表示函数已经 return
+        if len(compiled) == 1:
+            return compiled[0]
+
+        def run(frame):
+            for stmt in compiled:
+                if stmt(frame):
+                    return True
+            return False
+        return run
+
+    def statement(self, stmt: Node) -> Optional[Callable[[list], Any]]:
+        handler = self._statements.get(type(stmt))
+        if handler is None:
+            raise _error(stmt, f'unexpected {type(stmt).__name__} in function body')
+        return handler(stmt)
+
+    def expr(self, expr: Node) -> Compiled:
+        # 和类型检查一样用显式栈后序遍历
+        exprs = self._exprs
+        values: List[Compiled] = []
+        stack: List[Tuple[Node, bool]] = [(expr, False)]
+        while stack:
+            node, visited = stack.pop()
+            operands = _expr_operands(node)
+            if not visited and operands:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(operands))
+                continue
+
+            count = len(operands)
+            operand_values = values[len(values) - count:] if count else []
+            if count:
+                del values[len(values) - count:]
+
+            handler = exprs.get(type(node))
+            if handler is None:
+                raise _error(node, f'unexpected {type(node).__name__} in expression')
+            values.append(handler(node, operand_values))
+        return values[0]
+
+    def _declare(self, stmt: DeclareStatement):
+        typed_ident: TypedIdent = stmt.typed_ident
+        value, value_type = self.expr(stmt.initial_value)
+        if typed_ident.typing is None:
+            t = value_type
+        else:
+            t = self.resolve_type(stmt, typed_ident.typing, typed_ident.is_pointer)
+        # 先编译初始值再声明变量，初始值里的同名变量指向外层
+        value = _convert(value, t, value_type)
+        slot = self.declare(typed_ident.ident, t)
+
+        def declare(frame):
+            frame[slot] = value(frame)
+        return declare
+
+    def _assignment(self, stmt: AssignmentExpr):
+        slot, t = self.lookup(stmt, _ident_name(stmt, stmt.left))
+        value, value_type = self.expr(stmt.right)
+        if stmt.op is not AsssignmentOp.Direct:
+            op = _COMPOUND_ASSIGNMENTS[stmt.op]
+            value, value_type = _binary(stmt, op, (operator.itemgetter(slot), t), (value, value_type))
+        value = _convert(value, t, value_type)
+
+        def assign(frame):
+            frame[slot] = value(frame)
+        return assign
+
+    def _expression_statement(self, stmt: Node):
+        value, _ = self.expr(stmt)
+
+        def run(frame):
+            value(frame)
+        return run
+
+    def _if(self, stmt: If):
+        condition, _ = self.expr(stmt.condition)
+        consequence = self.block(stmt.consequence)
+        if not stmt.alternative:
+            return lambda frame: consequence(frame) if condition(frame) else False
+        alternative = self.block(stmt.alternative)
+        return lambda frame: consequence(frame) if condition(frame) else alternative(frame)
+
+    def _while(self, stmt: WhileLoop):
+        condition, _ = self.expr(stmt.condition)
+        body = self.block(stmt.body)
+
+        def loop(frame):
+            while condition(frame):
+                if body(frame):
+                    return True
+            return False
+        return loop
+
+    def _return(self, stmt: ReturnStatement):
+        if stmt.expr is None:
+            def return_void(frame):
+                return True
+            return return_void
+
+        value, value_type = self.expr(stmt.expr)
+        if self.returns.kind != 'void':
+            value = _convert(value, self.returns, value_type)
+
+        def return_value(frame):
+            frame[0] = value(frame)
+            return True
+        return return_value
+
+    def _type_alias(self, stmt: TypeAliasStatement):
+        self.scopes[-1][stmt.ident] = self.resolve_type(stmt, stmt.typing, stmt.is_pointer)
+        return None
+
+    def _ident(self, node: IdentExpr, operands) -> Compiled:
+        name = _ident_name(node, node)
+        for scope in reversed(self.scopes):
+            found = scope.get(name)
+            if isinstance(found, tuple):
+                slot, t = found
+                return operator.itemgetter(slot), t
+        evaluator = self.evaluator
+        t = self.namespace.variables.get(name)
+        if t is not None:
+            def external_variable(frame):
+                if name not in evaluator.externals:
+                    raise EvalError(f'external variable {name} is not provided')
+                return evaluator.externals[name]
+            return external_variable, t
+        raise _error(node, f'{name} is not defined')
+
+    def _unary(self, node: UnaryExpr, operands: List[Compiled]) -> Compiled:
+        value, t = operands[0]
+        if node.op is UnaryOp.NOT:
+            return (lambda frame: not value(frame)), _BOOL
+        if t.kind not in _NUMERIC_KINDS:
+            raise _error(node, f'operator {node.op.value} is not supported on {t}')
+        result = _promote(t)
+        value = _convert(value, result, t)
+        if node.op is UnaryOp.SUB:
+            wrap = _WRAPPERS[result]
+            return (lambda frame: wrap(-value(frame))), result
+        return value, result
+
+    def _condition(self, node: ConditionExpr, operands: List[Compiled]) -> Compiled:
+        (condition, _), (consequence, ct), (alternative, at) = operands
+        t = ct
+        if ct.kind in _NUMERIC_KINDS and at.kind in _NUMERIC_KINDS and ct != at:
+            t = _common(ct, at)
+            consequence, alternative = _convert(consequence, t, ct), _convert(alternative, t, at)
+        return (lambda frame: consequence(frame) if condition(frame) else alternative(frame)), t
+
+    def _call(self, node: CallExpr, operands: List[Compiled]) -> Compiled:
+        name = _ident_name(node, node.ident)
+        function = self.namespace.functions.get(name)
+        if function is None:
+            raise _error(node, f'{name} is not a function')
+        self.calls.add(name)
+        if len(operands) < len(function.params) or (len(operands) > len(function.params) and not function.variadic):
+            raise _error(node, f'{name} expects {len(function.params)} arguments, got {len(operands)}')
+
+        # 参数按形参类型转换，可变参数部分原样传递
+        args = [_convert(value, param, t) for (value, t), param in zip(operands, function.params)]
+        args.extend(value for value, _ in operands[len(function.params):])
+        invoke = function.invoke
+        if not args:
+            return (lambda frame: invoke([])), function.returns
+        return (lambda frame: invoke([arg(frame) for arg in args])), function.returns
+
+
+# 每层 palu 调用大约占用 5 个 Python 栈帧。调用在单独的线程上执行，线程使用更大的栈，
+# 执行期间提高解释器的递归上限，palu 递归深度可以达到约 5 万层，超过时报告 EvalError
+_RECURSION_LIMIT = 250_000
+_STACK_SIZE = 512 << 20
+
+_deep_lock = threading.Lock()
+_deep_runs = 0
+_saved_recursion_limit = 0
+_deep_thread = threading.local()
+
+
+def _run_deep(function: Callable, *args):
+    global _deep_runs, _saved_recursion_limit
+    if getattr(_deep_thread, 'active', False):
+        # external 的 Python 实现里再次调用 Evaluator 时已经在执行线程上了
+        return function(*args)
+
+    outcome: List[Tuple[bool, Any]] = []
+
+    def run():
+        _deep_thread.active = True
+        try:
+            outcome.append((True, function(*args)))
+        except BaseException as e:
+            outcome.append((False, e))
+
+    with _deep_lock:
+        if _deep_runs == 0:
+            _saved_recursion_limit = sys.getrecursionlimit()
+            sys.setrecursionlimit(max(_saved_recursion_limit, _RECURSION_LIMIT))
+        _deep_runs += 1
+    try:
+        with _deep_lock:
+            stack_size = threading.stack_size(_STACK_SIZE)
+            try:
+                thread = threading.Thread(target=run, name='palu-evaluator')
+                thread.start()
+            finally:
+                threading.stack_size(stack_size)
+        thread.join()
+    finally:
+        # 所有执行线程都结束后恢复原来的递归上限
+        with _deep_lock:
+            _deep_runs -= 1
+            if _deep_runs == 0:
+                sys.setrecursionlimit(_saved_recursion_limit)
+
+    ok, value = outcome[0]
+    if not ok:
+        raise value
+    return value
+
+
+def format_value(value) -> str:
+    if value is None:
+        return 'null'
+    elif isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+class Evaluator(object):
+    # 在当前进程里执行 palu 代码。多次 load 共享同一个命名空间，后加载的同名函数覆盖先前的定义；
+    # external 声明的函数先在已加载模块的 C 符号名（name mangling 之后）中查找，再查找 externals 提供的 Python 实现
+    def __init__(self, externals: Optional[Dict[str, Any]] = None, stdout: Optional[TextIO] = None) -> None:
+        super().__init__()
+        self.stdout = stdout
+        self.externals: Dict[str, Any] = {
+            'printf': lambda fmt, *args: _printf(self.stdout or sys.stdout, fmt, *args),
+            'puts': lambda text: _printf(self.stdout or sys.stdout, '%s\n', text),
+            'putchar': lambda c: _printf(self.stdout or sys.stdout, '%c', c) and c,
+        }
+        if externals:
+            self.externals.update(externals)
+        self.functions: Dict[str, Union[_Function, _External]] = {}
+        self.variables: Dict[str, _Type] = {}
+        self.aliases: Dict[str, _Type] = {}
+        self._c_functions: Dict[str, _Function] = {}
+
+    def _namespace(self) -> _Namespace:
+        return _Namespace(self.functions, self.variables, self.aliases, self._c_functions)
+
+    def load(self, source_file: SourceFile):
+        # 所有声明和函数体先在命名空间的副本上编译，全部成功后才生效，
+        # 失败时已加载的函数不受影响
+        mod = source_file.mod
+        # C 符号名和 TypeChecker 一样由模块作用域做 name mangling
+        scope = Scope(mod, Scope.ScopeKind.Mod, name_mangling=bool(mod))
+        staged = _Namespace(dict(self.functions), dict(self.variables), dict(self.aliases), dict(self._c_functions))
+        signatures = _FunctionCompiler(self, _VOID, staged)
+        # 新编译的函数，以及签名不变时要替换函数体的已加载函数
+        pending: List[Tuple[_Function, Optional[_Function]]] = []
+        changed: Set[str] = set()
+
+        def declare(name: str, function: Union[_Function, _External]) -> Optional[Union[_Function, _External]]:
+            # 已经编译的调用方持有原来的对象，签名不变时沿用它，返回被沿用的对象
+            previous = self.functions.get(name)
+            if previous is not None and _signature(previous) == _signature(function):
+                staged.functions[name] = previous
+                return previous
+            if previous is not None:
+                changed.add(name)
+            staged.functions[name] = function
+            return None
+
+        # 先收集所有声明，函数体可以互相调用
+        for stmt in source_file.statements:
+            if isinstance(stmt, ModDeclare):
+                continue
+            elif isinstance(stmt, TypeAliasStatement):
+                staged.aliases[stmt.ident] = signatures.resolve_type(stmt, stmt.typing, stmt.is_pointer)
+            elif isinstance(stmt, ExternalStatement):
+                spec = stmt.spec
+                if isinstance(spec, ExternalFunctionSpec):
+                    params, variadic = self._params(signatures, stmt, spec.params)
+                    returns = signatures.resolve_type(stmt, spec.returns)
+                    declare(spec.ident, _External(self, spec.ident, params, returns, variadic))
+                elif isinstance(spec, ExternalVariableSpec):
+                    typed_ident = spec.typed_ident
+                    t = _I32 if typed_ident.typing is None else \
+                        signatures.resolve_type(stmt, typed_ident.typing, typed_ident.is_pointer)
+                    staged.variables[typed_ident.ident] = t
+            elif isinstance(stmt, Func):
+                params, variadic = self._params(signatures, stmt, stmt.params)
+                returns = signatures.resolve_type(stmt, stmt.returns)
+                function = _Function(stmt.func_name, params, returns, variadic, stmt)
+                reused = declare(stmt.func_name, function)
+                replaced = reused if isinstance(reused, _Function) else None
+                staged.c_functions[scope.name_mangling(stmt.func_name)] = replaced or function
+                pending.append((function, replaced))
+            else:
+                raise _error(stmt, f'unexpected {type(stmt).__name__} at module level')
+
+        # 调用了签名变化的函数的调用方要按新签名重新编译，编译失败时整个 load 都不生效
+        redefined = {function.name for function, _ in pending}
+        for name, caller in self.functions.items():
+            if isinstance(caller, _Function) and name not in redefined and caller.calls & changed:
+                pending.append((_Function(caller.name, caller.params, caller.returns, caller.variadic, caller.func), caller))
+
+        for function, _ in pending:
+            self._compile(function, staged)
+
+        for function, visible in pending:
+            if visible is not None:
+                visible.replace_body(function)
+        self.functions, self.variables, self.aliases, self._c_functions = staged
+
+    def _compile(self, function: _Function, namespace: _Namespace):
+        func = function.func
+        compiler = _FunctionCompiler(self, function.returns, namespace)
+        for param in func.params:
+            if isinstance(param, TypedIdent):
+                compiler.declare(param.ident, compiler.resolve_type(func, param.typing, param.is_pointer))
+        function.body = compiler.block(func.body)
+        function.nslots = compiler.nslots
+        function.calls = compiler.calls
+
+    def _params(self, compiler: _FunctionCompiler, node: Node,
+                params: Sequence[Union[TypedIdent, str]]) -> Tuple[List[_Type], bool]:
+        types: List[_Type] = []
+        variadic = False
+        for param in params:
+            if param == '...':
+                variadic = True
+            elif isinstance(param, TypedIdent):
+                if param.typing is None:
+                    raise _error(node, f'parameter {param.ident} has no type')
+                types.append(compiler.resolve_type(node, param.typing, param.is_pointer))
+        return types, variadic
+
+    def call(self, name: str, *args):
+        function = self.functions.get(name)
+        if function is None:
+            raise EvalError(f'{name} is not a function')
+        if len(args) != len(function.params):
+            raise EvalError(f'{name} expects {len(function.params)} arguments, got {len(args)}')
+        converted = []
+        for value, param in zip(args, function.params):
+            convert = _converter(param, _type_of_value(value))
+            converted.append(value if convert is None else convert(value))
+        try:
+            return _run_deep(function.invoke, converted)
+        except RecursionError:
+            raise EvalError(f'maximum recursion depth exceeded while calling {name}') from None
+
+    def evaluate(self, expr: Node):
+        compiler = _FunctionCompiler(self, _VOID)
+        value, _ = compiler.expr(expr)
+        frame = [None] * compiler.nslots
+        try:
+            return _run_deep(value, frame)
+        except RecursionError:
+            raise EvalError('maximum recursion depth exceeded') from None
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import sys
+import threading
+from typing import Optional
+
+from tree_sitter import Language
+
+GRAMMAR_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tree-sitter-palu')
+
+# 参与 grammar hash 计算的文件，任意一个变化都会生成新的动态库
+_GRAMMAR_SOURCES = ('grammar.js', 'src/parser.c', 'src/scanner.c', 'src/scanner.cc')
+_LIBRARY_SUFFIX = '.dll' if sys.platform == 'win32' else '.so'
+
+_lock = threading.Lock()
+_language: Optional[Language] = None
+_grammar_hash: Optional[str] = None
+
+
+def cache_dir() -> str:
+    override = os.environ.get('PALU_CACHE_DIR')
+    if override:
+        return override
+
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'palu')
+
+
+def _tree_sitter_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version('tree_sitter')
+    except Exception:
+        return 'unknown'
+
+
+def grammar_hash() -> str:
+    global _grammar_hash
+    if _grammar_hash is None:
+        digest = hashlib.sha256()
+        digest.update(_tree_sitter_version().encode('utf-8'))
+        for name in _GRAMMAR_SOURCES:
+            path = os.path.join(GRAMMAR_DIR, name)
+            if not os.path.exists(path):
+                continue
+            digest.update(b'\0' + name.encode('utf-8') + b'\0')
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _grammar_hash = digest.hexdigest()
+    return _grammar_hash
+
+
+def library_path() -> str:
+    return os.path.join(cache_dir(), f'palu-{grammar_hash()[:16]}{_LIBRARY_SUFFIX}')
+
+
+def _build_library(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 先编译到临时文件再原子替换，避免并发进程加载到写了一半的动态库
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        Language.build_library(tmp_path, [GRAMMAR_DIR])
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_language() -> Language:
+    global _language
+    language = _language
+    if language is None:
+        with _lock:
+            language = _language
+            if language is None:
+                path = library_path()
+                if not os.path.exists(path):
+                    _build_library(path)
+                language = _language = Language(path, 'palu')
+    return language
@@ -0,0 +1,202 @@
+import contextlib
+import hashlib
+import os
+import sqlite3
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from palu.compiler import scan_sources
+from palu.outline import FuncOutline, Outline, ParamOutline, TypeAliasOutline, TypeRef, outline
+from palu.parser import _map_source
+from palu.typechecker.scope import Scope
+
+# 表结构变化时递增，打开旧版本的索引会直接重建
+SCHEMA_VERSION = 1
+
+_SCHEMA = '''
+CREATE TABLE files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest BLOB NOT NULL,
+    mod TEXT,
+    has_error INTEGER NOT NULL
+);
+CREATE TABLE symbols (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    c_name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    mod TEXT,
+    line INTEGER NOT NULL,
+    column INTEGER NOT NULL,
+    signature TEXT NOT NULL
+);
+CREATE INDEX symbols_name ON symbols(name);
+CREATE INDEX symbols_c_name ON symbols(c_name);
+CREATE INDEX symbols_mod ON symbols(mod);
+CREATE INDEX symbols_path ON symbols(path);
+'''
+
+KIND_FUNC = 'func'
+KIND_EXTERNAL_FUNC = 'external_func'
+KIND_EXTERNAL_VARIABLE = 'external_variable'
+KIND_TYPE_ALIAS = 'type_alias'
+
+
+class IndexedSymbol(NamedTuple):
+    name: str
+    # name mangling 之后的 C 符号名
+    c_name: str
+    kind: str
+    mod: Optional[str]
+    path: str
+    line: int
+    column: int
+    signature: str
+
+
+class IndexUpdate(NamedTuple):
+    indexed: List[str]
+    removed: List[str]
+    unchanged: int
+
+
+def _format_type(typing: Optional[TypeRef]) -> str:
+    if typing is None:
+        return ''
+    return ('*' if typing.is_pointer else '') + '.'.join(typing.ident)
+
+
+def _format_param(param: Union[ParamOutline, str]) -> str:
+    if isinstance(param, str):
+        return param
+    return f'{param.name}: {_format_type(param.typing)}' if param.typing else param.name
+
+
+def _rows(path: str, result: Outline) -> List[tuple]:
+    mod = result.mod
+    # 和 TypeChecker 一致：只有模块内定义的函数做 name mangling
+    scope = Scope(mod, Scope.ScopeKind.Mod, name_mangling=bool(mod))
+    rows: List[tuple] = []
+    for decl in result.declarations:
+        line, column = decl.start
+        if isinstance(decl, FuncOutline):
+            signature = f'({", ".join(map(_format_param, decl.params))}) -> {_format_type(decl.returns)}'
+            if decl.external:
+                rows.append((path, decl.name, decl.name, KIND_EXTERNAL_FUNC, mod, line, column, signature))
+            else:
+                rows.append((path, decl.name, scope.name_mangling(decl.name), KIND_FUNC, mod, line, column, signature))
+        elif isinstance(decl, TypeAliasOutline):
+            rows.append((path, decl.name, decl.name, KIND_TYPE_ALIAS, mod, line, column, _format_type(decl.typing)))
+        else:
+            rows.append((path, decl.name, decl.name, KIND_EXTERNAL_VARIABLE, mod, line, column, _format_type(decl.typing)))
+    return rows
+
+
+def _under(path: str, roots: List[str]) -> bool:
+    return any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in roots)
+
+
+class WorkspaceIndex(object):
+    # 保存工作区内所有模块顶层声明的 SQLite 索引，按 (mtime, size) 和内容 hash 增量更新，
+    # 跨模块查找名字时直接查表，不需要重新解析依赖的文件
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        if version == SCHEMA_VERSION:
+            return
+        with self.db:
+            self.db.execute('DROP TABLE IF EXISTS symbols')
+            self.db.execute('DROP TABLE IF EXISTS files')
+            self.db.executescript(_SCHEMA)
+            self.db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self) -> 'WorkspaceIndex':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def update(self, roots: Iterable[str]) -> IndexUpdate:
+        roots = [os.path.abspath(root) for root in roots]
+        stamps = {os.path.abspath(path): stamp for path, stamp in scan_sources(roots).items()}
+        known = {path: (mtime_ns, size, digest)
+                 for path, mtime_ns, size, digest in self.db.execute('SELECT path, mtime_ns, size, digest FROM files')}
+
+        indexed: List[str] = []
+        unchanged = 0
+        with self.db:
+            removed = sorted(path for path in known if path not in stamps and _under(path, roots))
+            self.db.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in removed])
+
+            for path, (mtime_ns, size) in sorted(stamps.items()):
+                previous = known.get(path)
+                if previous is not None and previous[:2] == (mtime_ns, size):
+                    unchanged += 1
+                    continue
+                with contextlib.ExitStack() as stack:
+                    try:
+                        source = stack.enter_context(_map_source(path))
+                    except FileNotFoundError:
+                        # 扫描之后被删除了；只忽略打开文件的错误，解析失败（比如 grammar 无法构建）要报告出来
+                        continue
+                    digest = hashlib.sha256(source).digest()
+                    if previous is not None and previous[2] == digest:
+                        # 只是 touch 了一下，内容没变
+                        self.db.execute('UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?', (mtime_ns, size, path))
+                        unchanged += 1
+                        continue
+                    result = outline(source)
+
+                self.db.execute('DELETE FROM files WHERE path = ?', (path,))
+                self.db.execute('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                                (path, mtime_ns, size, digest, result.mod, int(result.has_error)))
+                self.db.executemany('INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?)', _rows(path, result))
+                indexed.append(path)
+        return IndexUpdate(indexed, removed, unchanged)
+
+    def _select(self, where: str, args: tuple) -> List[IndexedSymbol]:
+        cursor = self.db.execute(
+            f'SELECT name, c_name, kind, mod, path, line, column, signature FROM symbols WHERE {where} '
+            'ORDER BY path, line', args)
+        return [IndexedSymbol(*row) for row in cursor]
+
+    def lookup(self, name: str, mod: Optional[str] = None) -> List[IndexedSymbol]:
+        # name 可以是 palu 中的名字，也可以是 name mangling 之后的 C 符号名
+        if mod is not None:
+            return self._select('name = ? AND mod = ?', (name, mod))
+        return self._select('name = ? OR c_name = ?', (name, name))
+
+    def module(self, mod: str) -> List[IndexedSymbol]:
+        return self._select('mod = ?', (mod,))
+
+    def file(self, path: str) -> List[IndexedSymbol]:
+        return self._select('path = ?', (os.path.abspath(path),))
+
+    def definitions(self, c_name: str) -> List[IndexedSymbol]:
+        # external 声明引用的 C 符号由哪些模块的函数提供
+        return self._select('c_name = ? AND kind = ?', (c_name, KIND_FUNC))
+
+    def dependents(self, path: str) -> Set[str]:
+        # 通过 external 声明引用了该文件中函数的其它文件
+        cursor = self.db.execute(
+            'SELECT DISTINCT e.path FROM symbols AS f JOIN symbols AS e ON e.c_name = f.c_name '
+            'WHERE f.path = ? AND f.kind = ? AND e.kind = ? AND e.path != f.path',
+            (os.path.abspath(path), KIND_FUNC, KIND_EXTERNAL_FUNC))
+        return {row[0] for row in cursor}
+
+    def files(self) -> List[Tuple[str, Optional[str], bool]]:
+        return [(path, mod, bool(has_error))
+                for path, mod, has_error in self.db.execute('SELECT path, mod, has_error FROM files ORDER BY path')]
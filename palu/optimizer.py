@@ -0,0 +1,279 @@
+from typing import Callable, Dict, List, Optional, Union
+
+from palu.ast.expr import BinaryExpr, ConditionExpr, ParenthesizedExpr, TypedIdent, UnaryExpr
+from palu.ast.literals import BooleanLiteral, NumberLiteral
+from palu.ast.node import Node, field_names
+from palu.ast.op import BinaryOp, UnaryOp
+from palu.ast.statements import DeclareStatement, If, WhileLoop
+
+# 折叠按 C 的 int 计算，超出 32 位有符号范围或者会触发未定义行为时保持原样
+_INT_MIN = -(1 << 31)
+_INT_MAX = (1 << 31) - 1
+
+_COMPARISONS: Dict[BinaryOp, Callable[[int, int], bool]] = {
+    BinaryOp.EQ: lambda a, b: a == b,
+    BinaryOp.NE: lambda a, b: a != b,
+    BinaryOp.GT: lambda a, b: a > b,
+    BinaryOp.LT: lambda a, b: a < b,
+    BinaryOp.GTE: lambda a, b: a >= b,
+    BinaryOp.LTE: lambda a, b: a <= b,
+}
+
+# x op c 等价于 x 的右操作数 c
+_RIGHT_IDENTITIES = {
+    BinaryOp.ADD: 0, BinaryOp.SUB: 0, BinaryOp.MUL: 1, BinaryOp.DIV: 1,
+    BinaryOp.LSHIFT: 0, BinaryOp.RSHIFT: 0, BinaryOp.BIT_OR: 0, BinaryOp.BIT_XOR: 0,
+}
+# c op x 等价于 x 的左操作数 c
+_LEFT_IDENTITIES = {BinaryOp.ADD: 0, BinaryOp.MUL: 1, BinaryOp.BIT_OR: 0, BinaryOp.BIT_XOR: 0}
+
+Literal = Union[NumberLiteral, BooleanLiteral]
+
+
+class _Splice(object):
+    # 替换语句列表中的一个语句为零个或多个语句
+    __slots__ = ('statements',)
+
+    def __init__(self, statements: List[Node]) -> None:
+        self.statements = statements
+
+
+def _is_literal(node) -> bool:
+    return type(node) is NumberLiteral or type(node) is BooleanLiteral
+
+
+def _truth(literal: Literal) -> bool:
+    return bool(literal.value)
+
+
+def _c_div(a: int, b: int) -> int:
+    # C 的整数除法向零取整
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def _fold_int(op: BinaryOp, a: int, b: int) -> Optional[int]:
+    if op is BinaryOp.ADD:
+        result = a + b
+    elif op is BinaryOp.SUB:
+        result = a - b
+    elif op is BinaryOp.MUL:
+        result = a * b
+    elif op is BinaryOp.DIV or op is BinaryOp.PERC:
+        if b == 0:
+            return None
+        q = _c_div(a, b)
+        result = q if op is BinaryOp.DIV else a - b * q
+    elif op is BinaryOp.BIT_AND:
+        result = a & b
+    elif op is BinaryOp.BIT_OR:
+        result = a | b
+    elif op is BinaryOp.BIT_XOR:
+        result = a ^ b
+    elif op is BinaryOp.LSHIFT:
+        if a < 0 or not 0 <= b < 31:
+            return None
+        result = a << b
+    elif op is BinaryOp.RSHIFT:
+        # 负数右移是实现定义的
+        if a < 0 or not 0 <= b < 32:
+            return None
+        result = a >> b
+    else:
+        return None
+    return result if _INT_MIN <= result <= _INT_MAX else None
+
+
+def _number(node: Node, value: int) -> NumberLiteral:
+    return _located(NumberLiteral.__new__(NumberLiteral), node, value)
+
+
+def _boolean(node: Node, value: bool) -> BooleanLiteral:
+    return _located(BooleanLiteral.__new__(BooleanLiteral), node, value)
+
+
+def _truth_literal(node: Node, value: bool, *operands: Node) -> Literal:
+    # 比较和逻辑运算在 C 中的结果是 int，只有操作数都是 true/false 时才输出 TRUE/FALSE，
+    # 否则折叠成 1/0，不在没有用到 bool 的程序里引入未定义的标识符
+    if all(type(operand) is BooleanLiteral for operand in operands):
+        return _boolean(node, value)
+    return _number(node, int(value))
+
+
+def _located(literal, node: Node, value):
+    literal._start = node._start
+    literal._end = node._end
+    literal.value = value
+    return literal
+
+
+def _in_int_range(literal: Node) -> bool:
+    return type(literal) is NumberLiteral and _INT_MIN <= literal.value <= _INT_MAX  # type: ignore
+
+
+def _fold_binary(expr: BinaryExpr) -> Node:
+    left, right, op = expr.left, expr.right, expr.op
+    if _is_literal(left) and _is_literal(right):
+        if op is BinaryOp.AND:
+            return _truth_literal(expr, _truth(left) and _truth(right), left, right)
+        elif op is BinaryOp.OR:
+            return _truth_literal(expr, _truth(left) or _truth(right), left, right)
+        elif type(left) is BooleanLiteral and type(right) is BooleanLiteral:
+            if op is BinaryOp.EQ or op is BinaryOp.NE:
+                return _boolean(expr, (left.value == right.value) == (op is BinaryOp.EQ))
+        elif _in_int_range(left) and _in_int_range(right):
+            compare = _COMPARISONS.get(op)
+            if compare is not None:
+                return _number(expr, int(compare(left.value, right.value)))
+            value = _fold_int(op, left.value, right.value)
+            if value is not None:
+                return _number(expr, value)
+        return expr
+
+    # 短路求值：右侧不会被执行，可以整体丢弃
+    if _is_literal(left):
+        if op is BinaryOp.AND and not _truth(left):
+            return _truth_literal(expr, False, left)
+        if op is BinaryOp.OR and _truth(left):
+            return _truth_literal(expr, True, left)
+
+    if type(right) is NumberLiteral and _RIGHT_IDENTITIES.get(op, None) == right.value:
+        return left
+    if type(left) is NumberLiteral and _LEFT_IDENTITIES.get(op, None) == left.value:
+        return right
+    return expr
+
+
+def _fold_unary(expr: UnaryExpr) -> Node:
+    operand = expr.expr
+    if expr.op is UnaryOp.NOT and _is_literal(operand):
+        return _truth_literal(expr, not _truth(operand), operand)
+    if type(operand) is NumberLiteral and _in_int_range(operand):
+        value = -operand.value if expr.op is UnaryOp.SUB else operand.value
+        if _INT_MIN <= value <= _INT_MAX:
+            return _number(expr, value)
+    if type(operand) is NumberLiteral and operand.value < 0:
+        # 不能折叠的负数字面量加上括号，避免输出 --2147483648
+        paren = ParenthesizedExpr.__new__(ParenthesizedExpr)
+        paren._start, paren._end, paren.expr = operand._start, operand._end, operand
+        return _copy(expr, {'expr': paren})
+    return expr
+
+
+def _fold_condition(expr: ConditionExpr) -> Node:
+    if _is_literal(expr.condition):
+        return expr.consequence if _truth(expr.condition) else expr.alternative
+    return expr
+
+
+def _fold_parenthesized(expr: ParenthesizedExpr) -> Node:
+    if _is_literal(expr.expr) and not (type(expr.expr) is NumberLiteral and expr.expr.value < 0):
+        return expr.expr
+    return expr
+
+
+def _block(node: Node, statements: List[Node]) -> If:
+    # 没有单独的块语句节点，用 if(1) {...} 保留一层作用域
+    block = If.__new__(If)
+    block._start, block._end = node._start, node._end
+    block.condition, block.consequence, block.alternative = _number(node, 1), statements, None
+    return block
+
+
+def _fold_if(stmt: If) -> Union[Node, _Splice]:
+    if not _is_literal(stmt.condition):
+        return stmt
+
+    branch = stmt.consequence if _truth(stmt.condition) else stmt.alternative
+    if not branch:
+        return _Splice([])
+    # 分支里有变量声明时直接展开会改变作用域，只去掉不会执行的分支
+    if any(type(n) is DeclareStatement for n in branch):
+        return _block(stmt, list(branch))
+    return _Splice(list(branch))
+
+
+def _fold_while(stmt: WhileLoop) -> Union[Node, _Splice]:
+    if _is_literal(stmt.condition) and not _truth(stmt.condition):
+        return _Splice([])
+    return stmt
+
+
+_RULES: Dict[type, Callable] = {
+    BinaryExpr: _fold_binary,
+    UnaryExpr: _fold_unary,
+    ConditionExpr: _fold_condition,
+    ParenthesizedExpr: _fold_parenthesized,
+    If: _fold_if,
+    WhileLoop: _fold_while,
+}
+
+
+def _copy(node, changes: Dict[str, object]):
+    cls = type(node)
+    obj = cls.__new__(cls)
+    if isinstance(node, Node):
+        obj._start = node._start
+        obj._end = node._end
+    for name in field_names(cls):
+        setattr(obj, name, changes[name] if name in changes else getattr(node, name))
+    return obj
+
+
+def _replace_value(value, replaced: Dict[int, object]):
+    if isinstance(value, (Node, TypedIdent)):
+        return replaced.get(id(value), value)
+    elif isinstance(value, (list, tuple)):
+        items = []
+        changed = False
+        for item in value:
+            new = replaced.get(id(item), item) if isinstance(item, (Node, TypedIdent)) else item
+            if new is not item:
+                changed = True
+            if type(new) is _Splice:
+                items.extend(new.statements)
+            else:
+                items.append(new)
+        if not changed:
+            return value
+        return items if isinstance(value, list) else tuple(items)
+    return value
+
+
+def optimize(root: Node) -> Node:
+    # 返回优化后的 AST；没有变化的子树原样共享，不修改传入的节点
+    order: List[Union[Node, TypedIdent]] = []
+    stack: List[Union[Node, TypedIdent]] = [root]
+    while stack:
+        value = stack.pop()
+        order.append(value)
+        for name in field_names(type(value)):
+            child = getattr(value, name)
+            if isinstance(child, (Node, TypedIdent)):
+                stack.append(child)
+            elif isinstance(child, (list, tuple)):
+                stack.extend(item for item in child if isinstance(item, (Node, TypedIdent)))
+
+    # 先序的逆序保证处理父节点时子节点都已经处理过
+    replaced: Dict[int, object] = {}
+    for value in reversed(order):
+        changes = {}
+        for name in field_names(type(value)):
+            child = getattr(value, name)
+            new = _replace_value(child, replaced)
+            if new is not child:
+                changes[name] = new
+        new_value = _copy(value, changes) if changes else value
+
+        rule = _RULES.get(type(new_value))
+        if rule is not None:
+            new_value = rule(new_value)
+        if new_value is not value:
+            replaced[id(value)] = new_value
+
+    result = replaced.get(id(root), root)
+    if isinstance(result, _Splice):
+        # 根节点本身是常量条件的 if/while 时没有外层语句列表可以展开
+        return _block(root, result.statements)
+    assert isinstance(result, Node)
+    return result
@@ -0,0 +1,153 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from tree_sitter import Node as TSNode
+from tree_sitter import Tree
+
+from palu.grammar import load_language
+from palu.parser import SourceBuffer, Transformer, _map_source, _parse_buffer
+
+# 只匹配顶层声明，函数体内的节点不会生成 palu AST。
+# 返回类型不限定节点类型，指针和 ident_expr 都交给 type_ref
+_QUERY = '''
+(source_file (mod name: (ident) @mod))
+(source_file (func func_name: (ident) @func.name params: (params) @func.params returns: (_) @func.returns))
+(source_file (external (external_function
+    func_name: (ident) @external.name params: (params) @external.params returns: (_) @external.returns)))
+(source_file (external (external_variable typed_ident: (typed_ident) @variable)))
+(source_file (type_alias ident: (ident) @alias.name typing: (_) @alias.typing))
+'''
+
+_query = None
+
+
+def _get_query():
+    global _query
+    if _query is None:
+        _query = load_language().query(_QUERY)
+    return _query
+
+
+class TypeRef(NamedTuple):
+    ident: Tuple[str, ...]
+    is_pointer: bool = False
+
+
+class ParamOutline(NamedTuple):
+    name: str
+    typing: Optional[TypeRef]
+
+
+class FuncOutline(NamedTuple):
+    name: str
+    # 参数或者 'void' / '...'
+    params: Tuple[Union[ParamOutline, str], ...]
+    returns: TypeRef
+    start: Tuple[int, int]
+    external: bool = False
+
+
+class VariableOutline(NamedTuple):
+    name: str
+    typing: Optional[TypeRef]
+    start: Tuple[int, int]
+
+
+class TypeAliasOutline(NamedTuple):
+    name: str
+    typing: TypeRef
+    start: Tuple[int, int]
+
+
+Declaration = Union[FuncOutline, VariableOutline, TypeAliasOutline]
+
+
+class Outline(NamedTuple):
+    mod: Optional[str]
+    declarations: Tuple[Declaration, ...]
+    # 有语法错误时只包含能识别出来的声明
+    has_error: bool = False
+
+
+class _Reader(object):
+    # 借用 Transformer 的 memoryview 切片和 intern 表读取文本，但不构造 palu AST
+    def __init__(self, source) -> None:
+        super().__init__()
+        self.source = source
+        self.transformer = Transformer()
+
+    def text(self, node: TSNode) -> str:
+        return self.transformer.get_text(node, self.source)
+
+    def type_ref(self, node: TSNode) -> TypeRef:
+        is_pointer = node.type == 'pointer'
+        if is_pointer:
+            underlying = node.child_by_field_name('underlying')
+            assert underlying
+            node = underlying
+        # 只取具名的 ident 子节点，a.b 得到 ('a', 'b')，不包含 '.'
+        return TypeRef(tuple(self.text(child) for child in node.children if child.is_named), is_pointer)
+
+    def typed_ident(self, node: TSNode) -> Tuple[str, Optional[TypeRef]]:
+        ident_node = node.child_by_field_name('ident')
+        typing_node = node.child_by_field_name('typing')
+        assert ident_node
+        return self.text(ident_node), self.type_ref(typing_node) if typing_node else None
+
+    def params(self, node: TSNode) -> Tuple[Union[ParamOutline, str], ...]:
+        result: List[Union[ParamOutline, str]] = []
+        for child in node.children:
+            if child.type in '(,)':
+                continue
+            elif child.type == 'typed_ident':
+                result.append(ParamOutline(*self.typed_ident(child)))
+            else:
+                result.append(self.text(child))
+        return tuple(result)
+
+
+def _top_level_start(node: TSNode) -> int:
+    parent = node.parent
+    while parent is not None and parent.type != 'source_file':
+        node, parent = parent, parent.parent
+    return node.start_byte
+
+
+def _collect(tree: Tree, source) -> Outline:
+    reader = _Reader(source)
+    mod: Optional[str] = None
+    declarations: List[Declaration] = []
+    # 同一个声明的各个捕获按位置先后出现，返回类型总是最后一个。
+    # 换到下一个顶层声明时清空，上一个声明残留的捕获不会和后面的声明拼在一起
+    pending: Dict[str, TSNode] = {}
+    declaration_start = -1
+    with reader.transformer.reading(source):
+        for node, name in _get_query().captures(tree.root_node):
+            start = _top_level_start(node)
+            if start != declaration_start:
+                pending.clear()
+                declaration_start = start
+            if name == 'mod':
+                mod = reader.text(node)
+            elif name == 'variable':
+                declarations.append(VariableOutline(*reader.typed_ident(node), node.parent.start_point))
+            elif name in ('func.returns', 'external.returns'):
+                kind = name.split('.')[0]
+                name_node, params_node = pending.pop(f'{kind}.name'), pending.pop(f'{kind}.params')
+                declarations.append(FuncOutline(reader.text(name_node), reader.params(params_node), reader.type_ref(node),
+                                                name_node.parent.start_point, kind == 'external'))
+            elif name == 'alias.typing':
+                name_node = pending.pop('alias.name')
+                declarations.append(TypeAliasOutline(reader.text(name_node), reader.type_ref(node),
+                                                     name_node.parent.start_point))
+            else:
+                pending[name] = node
+    return Outline(mod, tuple(declarations), tree.root_node.has_error)
+
+
+def outline(source: SourceBuffer) -> Outline:
+    return _collect(_parse_buffer(source), source)
+
+
+def outline_file(path: str) -> Outline:
+    with _map_source(path) as source:
+        return _collect(_parse_buffer(source), source)
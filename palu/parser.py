@@ -1,7 +1,10 @@
-from typing import List, Sequence, Union
+import contextlib
+import mmap
+import os
+import stat
+import sys
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
-from tree_sitter import Language
-from tree_sitter import Node
 from tree_sitter import Node as TSNode
 from tree_sitter import Parser as TSParser
 from tree_sitter import Tree
@@ -18,63 +21,154 @@ from palu.ast.statements import (DeclareStatement, EmptyStatement,
                                  ExternalFunctionSpec, ExternalStatement,
                                  ExternalVariableSpec, If, ReturnStatement,
                                  TypeAliasStatement, WhileLoop)
-
-lang_lib = 'build/palu.dll'
-
-Language.build_library(lang_lib, ['tree-sitter-palu'])
-palu = Language(lang_lib, 'palu')
+from palu.grammar import _tree_sitter_version, load_language
 
 
 class PaluSyntaxError(Exception):
-    def __init__(self, tree, line, column) -> None:
+    def __init__(self, tree, line, column, errors: Optional[List[Tuple[int, int]]] = None) -> None:
         super().__init__((line, column))
         self.tree = tree
         self.line = line
         self.column = column
+        # 语法树中所有错误位置，第一个即 (line, column)
+        self.errors = errors if errors is not None else [(line, column)]
+
+
+_parser: Optional[TSParser] = None
 
 
-_parser = TSParser()
-_parser.set_language(palu)
+def _get_parser() -> TSParser:
+    global _parser
+    if _parser is None:
+        parser = TSParser()
+        parser.set_language(load_language())
+        _parser = parser
+    return _parser
 
 
-def _validate_recursive(tree: Tree, node: Node):
-    if node.has_error or node.is_missing:
-        raise PaluSyntaxError(tree, *node.start_point)
+def _collect_errors(tree: Tree) -> List[Tuple[int, int]]:
+    errors: List[Tuple[int, int]] = []
+    cursor = tree.walk()
+    while True:
+        node = cursor.node
+        if node.is_missing or node.type == 'ERROR':
+            errors.append(node.start_point)
+        elif node.has_error and cursor.goto_first_child():
+            # 只进入含有错误的子树，没有错误的子树整棵跳过
+            continue
 
-    for child in node.children:
-        _validate_recursive(tree, child)
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return errors
+
+
+def _validate(tree: Tree):
+    if not tree.root_node.has_error:
+        return
+
+    errors = _collect_errors(tree)
+    if not errors:
+        errors = [tree.root_node.start_point]
+    raise PaluSyntaxError(tree, *errors[0], errors)
 
 
 def parse(source: bytes) -> SourceFile:
     transformer = Transformer()
-    tree = _parser.parse(source)
-    _validate_recursive(tree, tree.root_node)
+    tree = _get_parser().parse(source)
+    _validate(tree)
     return transformer.transform(tree, source)
 
 
+# 源码可以是 bytes，也可以是文件映射
+SourceBuffer = Union[bytes, mmap.mmap]
+
+_READ_CHUNK = 1 << 16
+
+
+def _binding_supports_read_callback() -> bool:
+    # tree_sitter 0.20 起 Parser.parse 才接受 read callback，0.19 只接受 bytes
+    try:
+        major, minor = (int(part) for part in _tree_sitter_version().split('.')[:2])
+    except ValueError:
+        return False
+    return (major, minor) >= (0, 20)
+
+
+_READ_CALLBACK = _binding_supports_read_callback()
+
+
+def _parse_buffer(buffer: SourceBuffer) -> Tree:
+    parser = _get_parser()
+    if isinstance(buffer, bytes):
+        return parser.parse(buffer)
+    if _READ_CALLBACK:
+        # 按块读取映射的内容，不复制整个文件
+        return parser.parse(lambda byte, point: buffer[byte:byte + _READ_CHUNK])
+    return parser.parse(bytes(buffer))
+
+
+@contextlib.contextmanager
+def _map_source(path: str) -> Iterator[SourceBuffer]:
+    with open(path, 'rb') as f:
+        # 绑定不支持 read callback 时 tree-sitter 总要拿到一份 bytes，映射省不掉这次复制，直接读文件。
+        # 空文件和管道之类的非普通文件不能 mmap
+        st = os.fstat(f.fileno())
+        if not _READ_CALLBACK or not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+            yield f.read()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def parse_file(path: str) -> SourceFile:
+    with _map_source(path) as source:
+        tree = _parse_buffer(source)
+        _validate(tree)
+        # Transformer 同样通过映射读取标识符和字面量，源码不会整体读进内存
+        return Transformer().transform(tree, source)
+
+
 class Transformer(object):
     def __init__(self) -> None:
         super().__init__()
+        self._view = memoryview(b'')
+        self._interned: Dict[bytes, str] = {}
 
-    def transform(self, tree: Tree, source: bytes) -> SourceFile:
+    def transform(self, tree: Tree, source: SourceBuffer) -> SourceFile:
         statements: List[PaluNode] = []
         root = tree.root_node
-        for stmt in root.children:
-            if stmt.type == 'mod':
-                result = self.transform_mod(stmt, source)
-            elif stmt.type == 'external':
-                result = self.transform_external_stmt(stmt, source)
-            elif stmt.type == 'func':
-                result = self.transform_func_stmt(stmt, source)
-            elif stmt.type == 'type_alias':
-                result = self.transform_type_alias(stmt, source)
-            else:
-                raise Exception(f'unexpected node type {stmt.type}')
-            statements.append(result)
+        with self.reading(source):
+            for stmt in root.children:
+                statements.append(self.transform_top_level(stmt, source))
 
         return SourceFile(root.start_point, root.end_point, statements)
 
-    def transform_statement(self, node: TSNode, source: bytes) -> PaluNode:
+    @contextlib.contextmanager
+    def reading(self, source: SourceBuffer) -> Iterator[None]:
+        # 通过 memoryview 切片不会复制源码，同一次解析中相同的标识符共享一个 str 对象
+        self._view = memoryview(source)
+        self._interned = {}
+        try:
+            yield
+        finally:
+            # 释放对 source 的引用，mmap 之类的缓冲区才能被关闭
+            self._view.release()
+            self._view = memoryview(b'')
+            self._interned = {}
+
+    def transform_top_level(self, node: TSNode, source: SourceBuffer) -> PaluNode:
+        if node.type == 'mod':
+            return self.transform_mod(node, source)
+        elif node.type == 'external':
+            return self.transform_external_stmt(node, source)
+        elif node.type == 'func':
+            return self.transform_func_stmt(node, source)
+        elif node.type == 'type_alias':
+            return self.transform_type_alias(node, source)
+        else:
+            raise Exception(f'unexpected node type {node.type}')
+
+    def transform_statement(self, node: TSNode, source: SourceBuffer) -> PaluNode:
         real_stmt = node.children[0]
         if real_stmt.type == 'empty':
             return EmptyStatement(real_stmt.start_point, real_stmt.end_point)
@@ -95,13 +189,13 @@ class Transformer(object):
         else:
             raise Exception(f'unexpected node type {real_stmt.type}')
 
-    def transform_mod(self, node: TSNode, source: bytes):
+    def transform_mod(self, node: TSNode, source: SourceBuffer):
         ident_node = node.child_by_field_name('name')
         assert ident_node
         name = self.get_text(ident_node, source)
         return ModDeclare(node.start_point, node.end_point, name)
 
-    def transform_declare_stmt(self, node: TSNode, source: bytes):
+    def transform_declare_stmt(self, node: TSNode, source: SourceBuffer):
         typed_ident = node.child_by_field_name('typed_ident')
         initial_node = node.child_by_field_name('initial')
 
@@ -113,7 +207,7 @@ class Transformer(object):
 
         return DeclareStatement(node.start_point, node.end_point, ident, initial_value)
 
-    def transform_external_stmt(self, node: TSNode, source: bytes):
+    def transform_external_stmt(self, node: TSNode, source: SourceBuffer):
         real_stmt = node.children[0]
         if real_stmt.type == 'external_variable':
             typed_ident_node = real_stmt.child_by_field_name('typed_ident')
@@ -151,7 +245,7 @@ class Transformer(object):
         else:
             raise Exception(f'unexpected external statement type {real_stmt.type}')
 
-    def transform_while_stmt(self, node: TSNode, source: bytes):
+    def transform_while_stmt(self, node: TSNode, source: SourceBuffer):
         condition = node.child_by_field_name('condition')
         body = node.child_by_field_name('body')
 
@@ -162,7 +256,7 @@ class Transformer(object):
 
         return WhileLoop(node.start_point, node.end_point, self.transform_expr(condition, source), cb)
 
-    def transform_if_stmt(self, node: TSNode, source: bytes):
+    def transform_if_stmt(self, node: TSNode, source: SourceBuffer):
         condition = node.child_by_field_name('condition')
         consequence_node = node.child_by_field_name('consequence')
         alternative_node = node.child_by_field_name('alternative')
@@ -180,14 +274,14 @@ class Transformer(object):
 
             return If(node.start_point, node.end_point, self.transform_expr(condition, source), consequence, None)
 
-    def transform_return_stmt(self, node: TSNode, source: bytes):
+    def transform_return_stmt(self, node: TSNode, source: SourceBuffer):
         returns = node.child_by_field_name('returns')
 
         assert returns
 
         return ReturnStatement(node.start_point, node.end_point, self.transform_expr(returns, source))
 
-    def transform_type_alias(self, node: TSNode, source: bytes):
+    def transform_type_alias(self, node: TSNode, source: SourceBuffer):
         ident_node = node.child_by_field_name('ident')
         typing_node = node.child_by_field_name('typing')
 
@@ -206,63 +300,89 @@ class Transformer(object):
 
         return TypeAliasStatement(node.start_point, node.end_point, ident, typing, typing_node.type == 'pointer')
 
-    def transform_expr(self, node: TSNode, source: bytes) -> PaluNode:
-        real_expr = node.children[0]
-
-        if real_expr.type == 'ident_expr':
-            return self.transform_ident_expr(real_expr, source)
-        elif real_expr.type == 'binary_expr':
-            return self.transform_binary_expr(real_expr, source)
-        elif real_expr.type == 'unary_expr':
-            return self.transform_unary_expr(real_expr, source)
-        elif real_expr.type == 'cond_expr':
-            return self.transform_condition_expr(real_expr, source)
-        elif real_expr.type == 'call_expr':
-            return self.transform_call_expr(real_expr, source)
-        elif real_expr.type == 'parenthesized_expr':
-            return self.transform_parenthesized_expr(real_expr, source)
-        elif real_expr.type == 'number_literal':
-            return self.transform_number_literal(real_expr, source)
-        elif real_expr.type == 'string_literal':
-            return self.transform_string_literal(real_expr, source)
-        elif real_expr.type == 'true_lit':
-            return self.transform_true_lit(real_expr, source)
-        elif real_expr.type == 'false_lit':
-            return self.transform_false_lit(real_expr, source)
-        elif real_expr.type == 'null_lit':
-            return self.transform_null_lit(real_expr)
-        else:
-            raise Exception(f'unexpected expr type {real_expr.type}')
+    def transform_expr(self, node: TSNode, source: SourceBuffer) -> PaluNode:
+        return self._build_expr(node.children[0], source)
 
-    def transform_ident_expr(self, node: TSNode, source: bytes):
+    def transform_ident_expr(self, node: TSNode, source: SourceBuffer):
         ident = [*map(lambda n: self.get_text(n, source), node.children)]
         return IdentExpr(node.start_point, node.end_point, *ident)
 
-    def transform_binary_expr(self, node: TSNode, source: bytes):
-        operator = node.child_by_field_name('operator')
+    def transform_binary_expr(self, node: TSNode, source: SourceBuffer):
+        return self._build_expr(node, source)
+
+    def transform_unary_expr(self, node: TSNode, source: SourceBuffer):
+        return self._build_expr(node, source)
+
+    def transform_condition_expr(self, node: TSNode, source: SourceBuffer):
+        return self._build_expr(node, source)
+
+    def transform_call_expr(self, node: TSNode, source: SourceBuffer):
+        return self._build_expr(node, source)
+
+    def _build_expr(self, root: TSNode, source: SourceBuffer) -> PaluNode:
+        # 代码生成器会产生上万项的表达式链，这里用显式栈按后序构造 AST，
+        # 栈中 arity 为 -1 表示尚未展开的节点，否则表示子表达式已构造完毕、等待合成的节点
+        leaves = self._leaf_expr_dispatch
+        compounds = self._compound_expr_dispatch
+        results: List[PaluNode] = []
+        stack: List[Tuple[TSNode, str, int]] = [(root, root.type, -1)]
+        while stack:
+            node, kind, arity = stack.pop()
+            if arity >= 0:
+                split = len(results) - arity
+                operands = results[split:]
+                del results[split:]
+                results.append(compounds[kind][1](self, node, operands, source))
+                continue
+
+            leaf = leaves.get(kind)
+            if leaf is not None:
+                results.append(leaf(self, node, source))
+                continue
+
+            compound = compounds.get(kind)
+            if compound is None:
+                raise Exception(f'unexpected expr type {kind}')
+
+            operand_nodes = compound[0](self, node)
+            stack.append((node, kind, len(operand_nodes)))
+            for operand in reversed(operand_nodes):
+                real_expr = operand.children[0]
+                stack.append((real_expr, real_expr.type, -1))
+
+        return results[0]
+
+    def _binary_operands(self, node: TSNode) -> List[TSNode]:
         left = node.child_by_field_name('left')
         right = node.child_by_field_name('right')
 
-        assert operator
         assert left
         assert right
 
-        return BinaryExpr(
-            node.start_point, node.end_point,
-            BinaryOp(operator.type),
-            self.transform_expr(left, source),
-            self.transform_expr(right, source))
+        return [left, right]
 
-    def transform_unary_expr(self, node: TSNode, source: bytes):
+    def _build_binary_expr(self, node: TSNode, operands: List[PaluNode], source: SourceBuffer):
         operator = node.child_by_field_name('operator')
-        argument = node.child_by_field_name('argument')
 
         assert operator
+
+        return BinaryExpr(node.start_point, node.end_point, BinaryOp(operator.type), *operands)
+
+    def _unary_operands(self, node: TSNode) -> List[TSNode]:
+        argument = node.child_by_field_name('argument')
+
         assert argument
 
-        return UnaryExpr(node.start_point, node.end_point, UnaryOp(operator.type), self.transform_expr(argument, source))
+        return [argument]
 
-    def transform_condition_expr(self, node: TSNode, source: bytes):
+    def _build_unary_expr(self, node: TSNode, operands: List[PaluNode], source: SourceBuffer):
+        operator = node.child_by_field_name('operator')
+
+        assert operator
+
+        return UnaryExpr(node.start_point, node.end_point, UnaryOp(operator.type), *operands)
+
+    def _condition_operands(self, node: TSNode) -> List[TSNode]:
         condition = node.child_by_field_name('condition')
         consequence = node.child_by_field_name('consequence')
         alternative = node.child_by_field_name('alternative')
@@ -271,26 +391,37 @@ class Transformer(object):
         assert consequence
         assert alternative
 
-        return ConditionExpr(
-            node.start_point, node.end_point,
-            self.transform_expr(condition, source),
-            self.transform_expr(consequence, source),
-            self.transform_expr(alternative, source),
-        )
+        return [condition, consequence, alternative]
 
-    def transform_call_expr(self, node: TSNode, source: bytes):
-        func_name_node = node.child_by_field_name('func_name')
+    def _build_condition_expr(self, node: TSNode, operands: List[PaluNode], source: SourceBuffer):
+        return ConditionExpr(node.start_point, node.end_point, *operands)
+
+    def _call_operands(self, node: TSNode) -> List[TSNode]:
         args_node = node.child_by_field_name('args')
 
-        assert func_name_node
         assert args_node
 
+        return [n for n in args_node.children if n.is_named]
+
+    def _build_call_expr(self, node: TSNode, operands: List[PaluNode], source: SourceBuffer):
+        func_name_node = node.child_by_field_name('func_name')
+
+        assert func_name_node
+
         func_name = self.transform_ident_expr(func_name_node, source)
-        args = self._transform_argument_list(args_node, source)
+        return CallExpr(node.start_point, node.end_point, func_name, *operands)
+
+    def _parenthesized_operands(self, node: TSNode) -> List[TSNode]:
+        expr = node.child_by_field_name('expr')
 
-        return CallExpr(node.start_point, node.end_point, func_name, *args)
+        assert expr
 
-    def transform_func_stmt(self, node: TSNode, source: bytes):
+        return [expr]
+
+    def _build_parenthesized_expr(self, node: TSNode, operands: List[PaluNode], source: SourceBuffer):
+        return ParenthesizedExpr(node.start_point, node.end_point, *operands)
+
+    def transform_func_stmt(self, node: TSNode, source: SourceBuffer):
         func_name_node = node.child_by_field_name('func_name')
         params_node = node.child_by_field_name('params')
         returns_node = node.child_by_field_name('returns')
@@ -312,14 +443,10 @@ class Transformer(object):
 
         return Func(node.start_point, node.end_point, func_name, params, returns, body)
 
-    def transform_parenthesized_expr(self, node: TSNode, source: bytes):
-        expr = node.child_by_field_name('expr')
+    def transform_parenthesized_expr(self, node: TSNode, source: SourceBuffer):
+        return self._build_expr(node, source)
 
-        assert expr
-
-        return ParenthesizedExpr(node.start_point, node.end_point, self.transform_expr(expr, source))
-
-    def transform_assignment_stmt(self, node: TSNode, source: bytes):
+    def transform_assignment_stmt(self, node: TSNode, source: SourceBuffer):
         left_node = node.child_by_field_name('left')
         op_node = node.child_by_field_name('operator')
         right_node = node.child_by_field_name('right')
@@ -334,22 +461,24 @@ class Transformer(object):
 
         return AssignmentExpr(node.start_point, node.end_point, left, op, right)
 
-    def transform_number_literal(self, node: TSNode, source: bytes):
-        return NumberLiteral(node.start_point, node.end_point, str(source[node.start_byte:node.end_byte], 'utf-8'))
+    def transform_number_literal(self, node: TSNode, source: SourceBuffer):
+        return NumberLiteral(node.start_point, node.end_point, self.get_text(node, source))
 
-    def transform_string_literal(self, node: TSNode, source: bytes):
-        return StringLiteral(node.start_point, node.end_point, str(source[node.start_byte:node.end_byte], 'utf-8'))
+    def transform_string_literal(self, node: TSNode, source: SourceBuffer):
+        # 字符串字面量很少重复，不放进 intern 表
+        text = str(self._slice(node, source), 'utf-8')
+        return StringLiteral(node.start_point, node.end_point, text)
 
-    def transform_true_lit(self, node: TSNode, source: bytes) -> BooleanLiteral:
-        return BooleanLiteral(node.start_point, node.end_point, str(source[node.start_byte:node.end_byte], 'utf-8'))
+    def transform_true_lit(self, node: TSNode, source: SourceBuffer) -> BooleanLiteral:
+        return BooleanLiteral(node.start_point, node.end_point, self.get_text(node, source))
 
-    def transform_false_lit(self, node: TSNode, source: bytes) -> BooleanLiteral:
-        return BooleanLiteral(node.start_point, node.end_point, str(source[node.start_byte:node.end_byte], 'utf-8'))
+    def transform_false_lit(self, node: TSNode, source: SourceBuffer) -> BooleanLiteral:
+        return BooleanLiteral(node.start_point, node.end_point, self.get_text(node, source))
 
-    def transform_null_lit(self, node: TSNode) -> NullLiteral:
+    def transform_null_lit(self, node: TSNode, source: SourceBuffer) -> NullLiteral:
         return NullLiteral(node.start_point, node.end_point)
 
-    def _transform_typed_ident(self, node: TSNode, source: bytes) -> TypedIdent:
+    def _transform_typed_ident(self, node: TSNode, source: SourceBuffer) -> TypedIdent:
         ident_node = node.child_by_field_name('ident')
         typing_node = node.child_by_field_name('typing')
 
@@ -368,13 +497,10 @@ class Transformer(object):
 
         return TypedIdent(ident, typing, typing_node.type == 'pointer')
 
-    def _transform_codeblock(self, node: TSNode, source: bytes) -> Sequence[PaluNode]:
+    def _transform_codeblock(self, node: TSNode, source: SourceBuffer) -> Sequence[PaluNode]:
         return [*map(lambda n: self.transform_statement(n, source), filter(lambda n: n.is_named, node.children))]
 
-    def _transform_argument_list(self, node: TSNode, source: bytes) -> Sequence[PaluNode]:
-        return [*map(lambda n: self.transform_expr(n, source), filter(lambda n: n.is_named, node.children))]
-
-    def _transform_params(self, node: TSNode, source: bytes) -> Sequence[Union[TypedIdent, str]]:
+    def _transform_params(self, node: TSNode, source: SourceBuffer) -> Sequence[Union[TypedIdent, str]]:
         result: List[Union[TypedIdent, str]] = []
         for child in node.children:
             if child.type in '(,)':
@@ -386,5 +512,37 @@ class Transformer(object):
 
         return result
 
-    def get_text(self, node: TSNode, source: bytes) -> str:
-        return str(source[node.start_byte:node.end_byte], 'utf-8')
+    def _slice(self, node: TSNode, source: SourceBuffer) -> memoryview:
+        view = self._view
+        if view.obj is not source:
+            view = memoryview(source)
+        return view[node.start_byte:node.end_byte]
+
+    def get_text(self, node: TSNode, source: SourceBuffer) -> str:
+        chunk = self._slice(node, source)
+        # 只读的字节 memoryview 可以直接和 bytes 比较并计算相同的 hash，命中时不产生任何拷贝
+        key = chunk if chunk.readonly else chunk.tobytes()
+        text = self._interned.get(key)  # type: ignore
+        if text is None:
+            text = sys.intern(str(chunk, 'utf-8'))
+            self._interned[chunk.tobytes()] = text
+        return text
+
+    _leaf_expr_dispatch: Dict[str, Callable[['Transformer', TSNode, SourceBuffer], PaluNode]] = {
+        'ident_expr': transform_ident_expr,
+        'number_literal': transform_number_literal,
+        'string_literal': transform_string_literal,
+        'true_lit': transform_true_lit,
+        'false_lit': transform_false_lit,
+        'null_lit': transform_null_lit,
+    }
+
+    # 复合表达式：(取子表达式节点, 用构造好的子表达式合成节点)
+    _compound_expr_dispatch: Dict[str, Tuple[Callable[['Transformer', TSNode], List[TSNode]],
+                                             Callable[['Transformer', TSNode, List[PaluNode], SourceBuffer], PaluNode]]] = {
+        'binary_expr': (_binary_operands, _build_binary_expr),
+        'unary_expr': (_unary_operands, _build_unary_expr),
+        'cond_expr': (_condition_operands, _build_condition_expr),
+        'call_expr': (_call_operands, _build_call_expr),
+        'parenthesized_expr': (_parenthesized_operands, _build_parenthesized_expr),
+    }
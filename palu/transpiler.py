@@ -1,5 +1,6 @@
-from io import StringIO
-from typing import Callable, Dict, List
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, TextIO, Tuple, Union
 
 
 from palu.ast.expr import (AssignmentExpr, BinaryExpr, CallExpr, ConditionExpr,
@@ -8,19 +9,68 @@ from palu.ast.func import Func
 from palu.ast.literals import (BooleanLiteral, NullLiteral, NumberLiteral,
                                StringLiteral)
 from palu.ast.node import Node
+from palu.ast.op import BinaryOp, UnaryOp
 from palu.ast.source import ModDeclare, SourceFile
 from palu.ast.statements import (DeclareStatement, EmptyStatement,
                                  ExternalFunctionSpec, ExternalStatement,
                                  ExternalVariableSpec, If, ReturnStatement,
                                  TypeAliasStatement, WhileLoop)
+from palu.optimizer import optimize
 from palu.typechecker.predefined import global_scope
 from palu.typechecker.scope import Scope, ScopedSymbol
 from palu.typechecker.symbol import PaluSymbol
 
 
+# 与 tree-sitter-palu/grammar.js 中的 PREC 一致，也与 C 的运算符优先级一致，只在需要时输出括号
+_PREC_CONDITIONAL = -2
+_PREC_UNARY = 13
+_PREC_PRIMARY = 100
+_BINARY_PREC: Dict[BinaryOp, int] = {
+    BinaryOp.OR: 1,
+    BinaryOp.AND: 2,
+    BinaryOp.BIT_OR: 3,
+    BinaryOp.BIT_XOR: 4,
+    BinaryOp.BIT_AND: 5,
+    BinaryOp.EQ: 6, BinaryOp.NE: 6,
+    BinaryOp.GT: 7, BinaryOp.GTE: 7, BinaryOp.LT: 7, BinaryOp.LTE: 7,
+    BinaryOp.LSHIFT: 9, BinaryOp.RSHIFT: 9,
+    BinaryOp.ADD: 10, BinaryOp.SUB: 10,
+    BinaryOp.MUL: 11, BinaryOp.DIV: 11, BinaryOp.PERC: 11,
+}
+# 运算符的优先级，以及按 [左侧加括号][右侧加括号] 预先拼好的中缀片段
+_BINARY_EMIT: Dict[BinaryOp, Tuple[int, Tuple[Tuple[str, str], Tuple[str, str]]]] = {
+    op: (_BINARY_PREC[op], ((f' {op.value} ', f' {op.value} ('), (f') {op.value} ', f') {op.value} (')))
+    for op in BinaryOp
+}
+# 二元表达式以外的节点按类查优先级，不在表里的都是 _PREC_PRIMARY。
+# 常量折叠产生的负数字面量输出为 -n，相当于一元表达式；
+# 没有哪个位置要求高于一元的优先级，非负字面量按一元处理也不会多出括号，所以不必看值
+_CLASS_PREC: Dict[type, int] = {
+    UnaryExpr: _PREC_UNARY,
+    NumberLiteral: _PREC_UNARY,
+    ConditionExpr: _PREC_CONDITIONAL,
+}
+
+
+def _precedence(node: Node) -> int:
+    if isinstance(node, BinaryExpr):
+        return _BINARY_PREC[node.op]
+    return _CLASS_PREC.get(node.__class__, _PREC_PRIMARY)
+
+
+class _DispatchTable(dict):
+    def __missing__(self, cls: type):
+        # 未注册的子类沿 MRO 查找父类的处理函数，结果缓存起来
+        for base in cls.__mro__[1:]:
+            if base in self:
+                handler = self[cls] = self[base]
+                return handler
+        raise KeyError(cls)
+
+
 class _Emitter:
     def __init__(self) -> None:
-        self.dispatch_dict: Dict[type, Callable] = {}
+        self.dispatch_dict: Dict[type, Callable] = _DispatchTable()
 
     def emit(self, this, data):
         self.dispatch_dict[data.__class__](this, data)
@@ -35,11 +85,25 @@ class _Emitter:
 class Transpiler:
     _emitter = _Emitter()
     _on = _emitter.on
+    _dispatch = _emitter.dispatch_dict
 
-    def __init__(self) -> None:
+    def __init__(self, buffer_size: int = 64 * 1024, jobs: int = 1, parallel_threshold: int = 64,
+                 optimize: bool = False) -> None:
         self.current_scope = global_scope
         self.scope_stack: List[Scope] = []
-        self._buffer = StringIO()
+        self.buffer_size = buffer_size
+        # 函数数量达到 parallel_threshold 时才把函数体分发到进程池
+        self.jobs = jobs
+        self.parallel_threshold = parallel_threshold
+        # 输出前先做常量折叠和代数化简
+        self.optimize = optimize
+        # 当前顶层声明的输出片段，声明结束时 join 一次
+        self._chunks: List[str] = []
+        self._append = self._chunks.append
+        # 已经 join 完成、等待写出的顶层声明
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self._out: Optional[TextIO] = None
 
     def enter(self, scope):
         self.scope_stack.append(self.current_scope)
@@ -49,19 +113,87 @@ class Transpiler:
         self.current_scope = self.scope_stack.pop()
 
     def _emit(self, node: Node):
-        self._emitter.emit(self, node)
+        self._dispatch[node.__class__](self, node)
 
     def _write(self, *text: str):
-        for t in text:
-            self._buffer.write(t)
+        self._chunks.extend(text)
+
+    def _seal(self):
+        if self._chunks:
+            piece = ''.join(self._chunks)
+            self._chunks.clear()
+            self._pending.append(piece)
+            self._pending_size += len(piece)
+
+    def _flush(self, force: bool = False):
+        self._seal()
+        # 只有 transpile_to 时才有输出目标，累计超过 buffer_size 就写出
+        if self._out is None:
+            return
+        if (force and self._pending) or self._pending_size >= self.buffer_size:
+            self._out.write(''.join(self._pending))
+            self._pending.clear()
+            self._pending_size = 0
+
+    def _reset(self, out: Optional[TextIO]):
+        self.current_scope = global_scope
+        self.scope_stack.clear()
+        self._chunks.clear()
+        self._pending.clear()
+        self._pending_size = 0
+        self._out = out
+
+    def _take(self) -> str:
+        piece = ''.join(self._chunks)
+        self._chunks.clear()
+        return piece
 
     @_on(SourceFile)
     def _transpile_source_file(self, node: SourceFile):
+        if self.jobs > 1 and sum(isinstance(n, Func) for n in node.statements) >= self.parallel_threshold:
+            self._transpile_source_file_parallel(node)
+            return
+
         self.enter(Scope())
         for n in node.statements:
             self._emit(n)
+            self._flush()
+        self.leave()
+
+    def _transpile_source_file_parallel(self, node: SourceFile):
+        # 顶层声明按顺序处理，函数只记录所在作用域后交给进程池，结果按源码顺序拼回
+        self.enter(Scope())
+        pieces: List[Optional[str]] = []
+        funcs: List[Tuple[Scope, Func]] = []
+        for n in node.statements:
+            if isinstance(n, Func):
+                funcs.append((self.current_scope, n))
+                pieces.append(None)
+            else:
+                self._emit(n)
+                pieces.append(self._take())
         self.leave()
 
+        global _forked_funcs
+        chunksize = max(1, len(funcs) // (self.jobs * 4))
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # fork 出来的子进程直接继承 AST，只需要传下标；pickle AST 比转译本身还慢
+            _forked_funcs = funcs
+            executor = ProcessPoolExecutor(self.jobs, mp_context=multiprocessing.get_context('fork'))
+            jobs: Sequence[Union[int, Tuple[Scope, Func]]] = range(len(funcs))
+        else:
+            executor = ProcessPoolExecutor(self.jobs)
+            jobs = funcs
+
+        try:
+            with executor:
+                results = executor.map(_transpile_func_job, jobs, chunksize=chunksize)
+                for piece in pieces:
+                    self._append(next(results) if piece is None else piece)
+                    self._flush()
+        finally:
+            _forked_funcs = None
+
     @_on(ModDeclare)
     def _transpile_mod_declare(self, mod: ModDeclare):
         self.enter(Scope(mod.name, Scope.ScopeKind.Mod))
@@ -69,39 +201,40 @@ class Transpiler:
     @_on(IdentExpr)
     def _transpile_ident_expr(self, ident_expr: IdentExpr):
         # TODO: 应该考虑 name mangling，对于 mod 级别非导出的 palu 函数用 mod 名称做前缀
-        self._write('.'.join(ident_expr.ident))
+        ident = ident_expr.ident
+        self._append(ident[0] if len(ident) == 1 else '.'.join(ident))
 
     @_on(NumberLiteral)
     def _transpile_number_literal(self, literal: NumberLiteral):
-        self._write(literal.value.__str__())
+        self._append(str(literal.value))
 
     @_on(BooleanLiteral)
     def _transpile_boolean_literal(self, literal: BooleanLiteral):
-        self._write('TRUE' if literal.value else 'FALSE')
+        self._append('TRUE' if literal.value else 'FALSE')
 
     @_on(NullLiteral)
     def _transpile_null_literal(self, _: NullLiteral):
-        self._write('NULL')
+        self._append('NULL')
 
     @_on(StringLiteral)
     def _transpile_string_literal(self, literal: StringLiteral):
-        self._write(literal.value)
+        self._append(literal.value)
 
     @_on(DeclareStatement)
     def _transpile_declare_stmt(self, decl: DeclareStatement):
         self._emit(decl.typed_ident)
 
         if decl.initial_value is not None:
-            self._write(' = ')
+            self._append(' = ')
             self._emit(decl.initial_value)
 
-        self._write(';')
+        self._append(';')
 
     @_on(ExternalStatement)
     def _transpile_external_stmt(self, external_stmt: ExternalStatement):
-        self._write('extern ')
+        self._append('extern ')
         self._emit(external_stmt.spec)
-        self._write(';')
+        self._append(';')
 
     @_on(ExternalVariableSpec)
     def _transpile_external_var(self, external_var_spec: ExternalVariableSpec):
@@ -111,130 +244,189 @@ class Transpiler:
     def _transpile_external_fn(self, external_fn_spec: ExternalFunctionSpec):
         self._emit(external_fn_spec.returns)
         self._write(' ', external_fn_spec.ident, '(')
-        for idx, param in enumerate(external_fn_spec.params):
+        self._emit_params(external_fn_spec.params)
+        self._append(')')
+
+    def _emit_params(self, params):
+        append, emit = self._append, self._emit
+        for idx, param in enumerate(params):
+            if idx:
+                append(',')
             if isinstance(param, str):
-                self._write(param)
+                append(param)
             else:
-                self._emit(param)
+                emit(param)
 
-            if idx < len(external_fn_spec.params)-1:
-                self._write(',')
-        self._write(')')
+    def _emit_block(self, statements):
+        emit = self._emit
+        for n in statements:
+            emit(n)
 
     @_on(WhileLoop)
     def _transpile_while_loop(self, while_loop: WhileLoop):
-        self._write('while(')
+        self._append('while(')
         self._emit(while_loop.condition)
-        self._write(') {')
-        for n in while_loop.body:
-            self._emit(n)
-        self._write('}')
+        self._append(') {')
+        self._emit_block(while_loop.body)
+        self._append('}')
 
     @_on(EmptyStatement)
     def _transpile_empty_stmt(self, _: EmptyStatement):
-        self._write(';')
+        self._append(';')
 
     @_on(If)
     def _transpile_if_stmt(self, if_stmt: If):
-        self._write('if(')
+        self._append('if(')
         self._emit(if_stmt.condition)
-        self._write(') {')
-        for n in if_stmt.consequence:
-            self._emit(n)
+        self._append(') {')
+        self._emit_block(if_stmt.consequence)
 
         if if_stmt.alternative:
-            self._write('} else {')
-            for n in if_stmt.alternative:
-                self._emit(n)
+            self._append('} else {')
+            self._emit_block(if_stmt.alternative)
 
-        self._write('}')
+        self._append('}')
 
     @_on(ReturnStatement)
     def _transpile_return_stmt(self, ret: ReturnStatement):
-        self._write('return ')
+        self._append('return ')
         self._emit(ret.expr)
-        self._write(';')
+        self._append(';')
 
     @_on(Func)
     def _transpile_func(self, fn: Func):
         self._emit(fn.returns)
-        self._write(f' {self.current_scope.name_mangling(fn.func_name)}(')
-        for idx, param in enumerate(fn.params):
-            if isinstance(param, str):
-                self._write(param)
-            else:
-                self._emit(param)
-
-            if idx < len(fn.params)-1:
-                self._write(',')
-        self._write(') {')
-        for n in fn.body:
-            self._emit(n)
-        self._write('}')
+        self._write(' ', self.current_scope.name_mangling(fn.func_name), '(')
+        self._emit_params(fn.params)
+        self._append(') {')
+        self._emit_block(fn.body)
+        self._append('}')
 
     @_on(CallExpr)
     def _transpile_call_expr(self, call_expr: CallExpr):
-        self._emit(call_expr.ident)
-        self._write('(')
+        append, emit = self._append, self._emit
+        emit(call_expr.ident)
+        append('(')
         for idx, arg in enumerate(call_expr.args):
-            self._emit(arg)
-            if idx < len(call_expr.args)-1:
-                self._write(',')
-        self._write(')')
+            if idx:
+                append(',')
+            emit(arg)
+        append(')')
 
     @_on(TypedIdent)
     def _transpile_typed_ident(self, typed_ident: TypedIdent):
         self._emit(typed_ident.typing)
         if typed_ident.is_pointer:
-            self._write('*')
-        self._write(' ', typed_ident.ident)
+            self._write('* ', typed_ident.ident)
+        else:
+            self._write(' ', typed_ident.ident)
 
     @_on(TypeAliasStatement)
     def _transpile_type_alias_stmt(self, stmt: TypeAliasStatement):
-        self._write('typedef ')
+        self._append('typedef ')
         self._emit(stmt.typing)
         if stmt.is_pointer:
-            self._write('*')
-
-        self._write(f' {stmt.ident};')
+            self._write('* ', stmt.ident, ';')
+        else:
+            self._write(' ', stmt.ident, ';')
 
     @_on(ParenthesizedExpr)
     def _transpile_parenthesized_expr(self, expr: ParenthesizedExpr):
-        self._write('(')
+        self._append('(')
         self._emit(expr.expr)
-        self._write(')')
+        self._append(')')
+
+    def _emit_operand(self, node: Node, parenthesize: bool):
+        if parenthesize:
+            self._append('(')
+            self._emit(node)
+            self._append(')')
+        else:
+            self._emit(node)
 
     @_on(BinaryExpr)
     def _transpile_binary_expr(self, bin_expr: BinaryExpr):
-        self._write('(')
-        self._emit(bin_expr.left)
-        self._write(') ', bin_expr.op.value, ' (')
-        self._emit(bin_expr.right)
-        self._write(')')
+        # 最热的路径：直接查表和分派，不经过 _precedence / _emit_operand，括号和运算符拼在同一个片段里
+        append, dispatch = self._append, self._dispatch
+        prec, infix = _BINARY_EMIT[bin_expr.op]
+        left, right = bin_expr.left, bin_expr.right
+        left_cls, right_cls = left.__class__, right.__class__
+        if left_cls is BinaryExpr:
+            left_prec = _BINARY_PREC[left.op]  # type: ignore
+        else:
+            left_prec = _CLASS_PREC.get(left_cls, _PREC_PRIMARY)
+        if right_cls is BinaryExpr:
+            right_prec = _BINARY_PREC[right.op]  # type: ignore
+        else:
+            right_prec = _CLASS_PREC.get(right_cls, _PREC_PRIMARY)
+        # 运算符都是左结合，右操作数优先级相同时也需要括号
+        wrap_left, wrap_right = left_prec < prec, right_prec <= prec
+        if wrap_left:
+            append('(')
+        dispatch[left_cls](self, left)
+        append(infix[wrap_left][wrap_right])
+        dispatch[right_cls](self, right)
+        if wrap_right:
+            append(')')
 
     @_on(UnaryExpr)
     def _transpile_unary_expr(self, unary: UnaryExpr):
-        self._write(unary.op.value)
-        self._emit(unary.expr)
+        self._append(unary.op.value)
+        operand = unary.expr
+        # 操作数也以 + / - 开头时要加括号，否则 - -x 会输出成 --x
+        signed = ((type(operand) is UnaryExpr and operand.op is not UnaryOp.NOT)  # type: ignore
+                  or (type(operand) is NumberLiteral and operand.value < 0))  # type: ignore
+        self._emit_operand(operand, _precedence(operand) < _PREC_UNARY or (signed and unary.op is not UnaryOp.NOT))
 
     @_on(ConditionExpr)
     def _transpile_condition_expr(self, expr: ConditionExpr):
-        self._write('(')
-        self._emit(expr.condition)
-        self._write(') ? (')
+        # 右结合，只有条件部分遇到嵌套的条件表达式时需要括号
+        self._emit_operand(expr.condition, _precedence(expr.condition) <= _PREC_CONDITIONAL)
+        self._append(' ? ')
         self._emit(expr.consequence)
-        self._write(') : (')
+        self._append(' : ')
         self._emit(expr.alternative)
-        self._write(')')
 
     @_on(AssignmentExpr)
     def _transpile_assignment_expr(self, expr: AssignmentExpr):
         self._emit(expr.left)
-        self._write(expr.op.value)
+        self._append(expr.op.value)
         self._emit(expr.right)
-        self._write(';')
+        self._append(';')
 
     def transpile(self, node: Node):
-        self._buffer.truncate(0)
+        if self.optimize:
+            node = optimize(node)
+        self._reset(None)
         self._emit(node)
-        return self._buffer.getvalue()
+        self._seal()
+        result = ''.join(self._pending)
+        self._pending.clear()
+        self._pending_size = 0
+        return result
+
+    def transpile_to(self, node: Node, fp: TextIO):
+        # 按顶层声明分块写出，峰值内存约为 buffer_size 加上最大的单个声明
+        if self.optimize:
+            node = optimize(node)
+        self._reset(fp)
+        try:
+            self._emit(node)
+            self._flush(force=True)
+        finally:
+            self._out = None
+
+
+_forked_funcs: Optional[List[Tuple[Scope, Func]]] = None
+
+
+def _transpile_func_job(job: Union[int, Tuple[Scope, Func]]) -> str:
+    if isinstance(job, int):
+        assert _forked_funcs is not None
+        scope, func = _forked_funcs[job]
+    else:
+        scope, func = job
+    transpiler = Transpiler()
+    transpiler.current_scope = scope
+    transpiler._emit(func)
+    return transpiler._take()
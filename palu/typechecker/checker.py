@@ -0,0 +1,614 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from palu.ast.expr import (AssignmentExpr, BinaryExpr, CallExpr, ConditionExpr,
+                           IdentExpr, ParenthesizedExpr, TypedIdent, UnaryExpr)
+from palu.ast.func import Func
+from palu.ast.literals import (BooleanLiteral, NullLiteral, NumberLiteral,
+                               StringLiteral)
+from palu.ast.node import Node
+from palu.ast.op import AsssignmentOp, BinaryOp, UnaryOp
+from palu.ast.source import ModDeclare, SourceFile
+from palu.ast.statements import (DeclareStatement, EmptyStatement,
+                                 ExternalFunctionSpec, ExternalStatement,
+                                 ExternalVariableSpec, If, ReturnStatement,
+                                 TypeAliasStatement, WhileLoop)
+from palu.typechecker.predefined import global_scope
+from palu.typechecker.scope import Scope, SymbolRedefinedException
+from palu.typechecker.symbol import PaluSymbol, Qualifier, builtin_type
+
+
+class TypeCheckError(NamedTuple):
+    pos: Tuple[int, int]
+    message: str
+
+
+class PaluTypeError(Exception):
+    def __init__(self, errors: List[TypeCheckError]) -> None:
+        super().__init__(f'{len(errors)} type error(s)')
+        self.errors = errors
+
+
+class PaluType(NamedTuple):
+    # 解析掉类型别名之后的基础类型和指针层数
+    symbol: PaluSymbol
+    pointer: int = 0
+
+    def __str__(self) -> str:
+        return self.symbol.name + '*' * self.pointer
+
+
+class FunctionSignature(NamedTuple):
+    # 解析掉别名之后的函数签名，用来比较不同模块里同一个函数的声明；类型未定义的位置为 None
+    params: Tuple[Optional[PaluType], ...]
+    returns: Optional[PaluType]
+    variadic: bool = False
+
+    def __str__(self) -> str:
+        params = [str(p) if p is not None else '?' for p in self.params] + (['...'] if self.variadic else [])
+        returns = str(self.returns) if self.returns is not None else '?'
+        return f'({", ".join(params) or "void"}) -> {returns}'
+
+
+# 字面量的类型，按上下文决定能否赋值给具体类型
+_INT_LITERAL = PaluType(PaluSymbol('{integer}', None, []))
+_NULL = PaluType(PaluSymbol('null', None, []))
+_STRING_LITERAL = PaluType(PaluSymbol('{string}', None, []))
+# 变长参数函数的最后一个参数
+_VARIADIC = PaluSymbol('...', None, [])
+
+# 内置类型是单例，按对象判断即可
+_INTEGRAL = frozenset(builtin_type(name) for name in ('i8', 'u8', 'i16', 'u16', 'i32', 'u32', 'i64', 'u64'))
+_NUMERIC = _INTEGRAL | {builtin_type('f32'), builtin_type('f64')}
+_CHAR = frozenset((builtin_type('i8'), builtin_type('u8')))
+
+_ARITHMETIC = frozenset((BinaryOp.ADD, BinaryOp.SUB, BinaryOp.MUL, BinaryOp.DIV))
+_BITWISE = frozenset((BinaryOp.PERC, BinaryOp.BIT_OR, BinaryOp.BIT_AND, BinaryOp.BIT_XOR,
+                      BinaryOp.LSHIFT, BinaryOp.RSHIFT))
+_LOGICAL = frozenset((BinaryOp.AND, BinaryOp.OR))
+_INTEGRAL_ASSIGN = frozenset((AsssignmentOp.LSAssign, AsssignmentOp.RSAssign, AsssignmentOp.BAAssign,
+                              AsssignmentOp.BOAssign, AsssignmentOp.BXAssign))
+
+
+def _is_integral(t: PaluType) -> bool:
+    return t is _INT_LITERAL or (not t.pointer and t.symbol in _INTEGRAL)
+
+
+def _is_numeric(t: PaluType) -> bool:
+    return t is _INT_LITERAL or (not t.pointer and t.symbol in _NUMERIC)
+
+
+def _is_scalar(t: PaluType) -> bool:
+    return bool(t.pointer) or t is _NULL or _is_numeric(t) or t.symbol is builtin_type('bool')
+
+
+def _assignable(target: PaluType, value: PaluType) -> bool:
+    if target == value:
+        return True
+    elif value is _INT_LITERAL:
+        return _is_numeric(target)
+    elif value is _NULL:
+        return target.pointer > 0
+    elif value is _STRING_LITERAL:
+        # 字符串字面量可以传给 string 或者 C 的 char 指针
+        return ((not target.pointer and target.symbol is builtin_type('string'))
+                or (target.pointer == 1 and target.symbol in _CHAR))
+    return False
+
+
+def _ident_name(ident: IdentExpr) -> str:
+    return ident.ident[0] if len(ident.ident) == 1 else '.'.join(ident.ident)
+
+
+def _expr_operands(node: Node) -> Sequence[Node]:
+    cls = type(node)
+    if cls is BinaryExpr:
+        return (node.left, node.right)  # type: ignore
+    elif cls is UnaryExpr or cls is ParenthesizedExpr:
+        return (node.expr,)  # type: ignore
+    elif cls is ConditionExpr:
+        return (node.condition, node.consequence, node.alternative)  # type: ignore
+    elif cls is CallExpr:
+        return node.args  # type: ignore
+    return ()
+
+
+class _FunctionChecker(object):
+    # 检查单个函数体，只读访问模块作用域，可以在子进程里独立运行
+    def __init__(self, module_scope: Scope, errors: List[TypeCheckError]) -> None:
+        super().__init__()
+        self.scope = module_scope
+        self.errors = errors
+        self.returns: Optional[PaluType] = None
+        self._statements: Dict[type, Callable] = {
+            DeclareStatement: self._check_declare,
+            AssignmentExpr: self._check_assignment,
+            If: self._check_if,
+            WhileLoop: self._check_while,
+            ReturnStatement: self._check_return,
+            TypeAliasStatement: self._check_type_alias,
+            CallExpr: self.expr_type,
+            EmptyStatement: lambda stmt: None,
+        }
+        self._exprs: Dict[type, Callable] = {
+            IdentExpr: self._type_ident,
+            NumberLiteral: lambda node, operands: _INT_LITERAL,
+            StringLiteral: lambda node, operands: _STRING_LITERAL,
+            NullLiteral: lambda node, operands: _NULL,
+            BooleanLiteral: lambda node, operands: self._builtin('bool'),
+            ParenthesizedExpr: lambda node, operands: operands[0],
+            BinaryExpr: self._type_binary,
+            UnaryExpr: self._type_unary,
+            ConditionExpr: self._type_condition,
+            CallExpr: self._type_call,
+        }
+
+    def error(self, node: Optional[Node], message: str):
+        self.errors.append(TypeCheckError(node.start_pos if node is not None else (0, 0), message))
+
+    def _builtin(self, name: str) -> PaluType:
+        return PaluType(builtin_type(name))
+
+    def resolve_type(self, ident: IdentExpr, pointer: bool = False) -> Optional[PaluType]:
+        found = self.scope.lookup(_ident_name(ident))
+        if found is None:
+            self.error(ident, f'unknown type {_ident_name(ident)}')
+            return None
+
+        symbol = found.symbol
+        if not (symbol.is_builtin_type or symbol.is_type_decl):
+            self.error(ident, f'{symbol.name} is not a type')
+            return None
+        return resolve_symbol_type(symbol, 1 if pointer else 0)
+
+    def declare(self, node: Optional[Node], symbol: PaluSymbol):
+        try:
+            self.scope.add_symbol(symbol)
+        except SymbolRedefinedException:
+            self.error(node, f'{symbol.name} was redefined in this scope')
+
+    def check_func(self, func: Func, symbol: PaluSymbol):
+        function_scope = Scope()
+        self.scope.add_child_scope(function_scope)
+        outer, self.scope = self.scope, function_scope
+        try:
+            self.returns = resolve_symbol_type(symbol.ret) if symbol.ret is not None else None
+            for param in symbol.params or ():
+                if param is not _VARIADIC:
+                    self.declare(func, param)
+            self.check_block(func.body, new_scope=False)
+        finally:
+            self.scope = outer
+            function_scope.parent = None
+
+    def check_block(self, statements: Sequence[Node], new_scope: bool = True):
+        outer = self.scope
+        if new_scope:
+            self.scope = Scope()
+            outer.add_child_scope(self.scope)
+        try:
+            statements_dispatch = self._statements
+            for stmt in statements:
+                handler = statements_dispatch.get(type(stmt))
+                if handler is None:
+                    self.error(stmt, f'unexpected {type(stmt).__name__} in function body')
+                else:
+                    handler(stmt)
+        finally:
+            if new_scope:
+                self.scope.parent = None
+                self.scope = outer
+
+    def _check_declare(self, stmt: DeclareStatement):
+        value = self.expr_type(stmt.initial_value) if stmt.initial_value is not None else None
+        typed_ident: TypedIdent = stmt.typed_ident
+        declared = self.resolve_type(typed_ident.typing, typed_ident.is_pointer) if typed_ident.typing else None
+        if declared is not None and value is not None and not _assignable(declared, value):
+            self.error(stmt, f'cannot initialize {typed_ident.ident} of type {declared} with {value}')
+
+        # 先检查初始值再声明变量，`let a: i32 = a` 会报告 a 未定义
+        if typed_ident.typing is not None:
+            self.declare(stmt, variable_symbol(typed_ident, self.scope))
+            return
+
+        # 没有写类型时取初始值的类型，后面的使用照常检查；推断不出来时按未定义类型处理，不再重复报错
+        inferred: Optional[PaluType] = None
+        if stmt.initial_value is None:
+            self.error(stmt, f'cannot infer the type of {typed_ident.ident} without an initial value')
+        elif value is not None:
+            inferred = _inferred_type(value)
+            if inferred is None:
+                self.error(stmt, f'cannot infer the type of {typed_ident.ident} from {value}')
+        self.declare(stmt, _typed_variable(typed_ident.ident, inferred))
+
+    def _check_assignment(self, stmt: AssignmentExpr):
+        value = self.expr_type(stmt.right)
+        target = self._type_ident(stmt.left, ())
+        if target is None or value is None:
+            return
+
+        if stmt.op is not AsssignmentOp.Direct:
+            numeric = _is_integral if stmt.op in _INTEGRAL_ASSIGN else _is_numeric
+            if not numeric(target):
+                self.error(stmt, f'operator {stmt.op.value} is not supported for {target}')
+                return
+        if not _assignable(target, value):
+            self.error(stmt, f'cannot assign {value} to {_ident_name(stmt.left)} of type {target}')
+
+    def _check_condition(self, condition: Node):
+        cond = self.expr_type(condition)
+        if cond is not None and not _is_scalar(cond):
+            self.error(condition, f'condition of type {cond} is not a scalar')
+
+    def _check_if(self, stmt: If):
+        self._check_condition(stmt.condition)
+        self.check_block(stmt.consequence)
+        if stmt.alternative is not None:
+            self.check_block(stmt.alternative)
+
+    def _check_while(self, stmt: WhileLoop):
+        self._check_condition(stmt.condition)
+        self.check_block(stmt.body)
+
+    def _check_return(self, stmt: ReturnStatement):
+        if stmt.expr is None:
+            if self.returns is not None and self.returns.symbol is not builtin_type('void'):
+                self.error(stmt, f'missing return value of type {self.returns}')
+            return
+
+        value = self.expr_type(stmt.expr)
+        if value is not None and self.returns is not None and not _assignable(self.returns, value):
+            self.error(stmt, f'cannot return {value} from a function returning {self.returns}')
+
+    def _check_type_alias(self, stmt: TypeAliasStatement):
+        symbol = alias_symbol(stmt, self)
+        if symbol is not None:
+            self.declare(stmt, symbol)
+
+    def expr_type(self, expr: Node) -> Optional[PaluType]:
+        # 显式栈后序遍历，超长的表达式链不会触发递归深度限制；None 表示子表达式已经报告过错误
+        exprs = self._exprs
+        values: List[Optional[PaluType]] = []
+        stack: List[Tuple[Node, bool]] = [(expr, False)]
+        while stack:
+            node, visited = stack.pop()
+            operands = _expr_operands(node)
+            if not visited and operands:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(operands))
+                continue
+
+            count = len(operands)
+            operand_types = values[len(values) - count:] if count else []
+            if count:
+                del values[len(values) - count:]
+
+            handler = exprs.get(type(node))
+            if handler is None:
+                self.error(node, f'unexpected {type(node).__name__} in expression')
+                values.append(None)
+            elif any(t is None for t in operand_types):
+                values.append(None)
+            else:
+                values.append(handler(node, operand_types))
+        return values[0]
+
+    def _type_ident(self, node: IdentExpr, operands) -> Optional[PaluType]:
+        name = _ident_name(node)
+        found = self.scope.lookup(name)
+        if found is None:
+            self.error(node, f'{name} is not defined')
+            return None
+        if not found.symbol.is_variable:
+            self.error(node, f'{name} is not a variable')
+            return None
+        return variable_type(found.symbol)
+
+    def _unify(self, node: Node, left: PaluType, right: PaluType, what: str) -> Optional[PaluType]:
+        if left == right:
+            return left
+        if left is _INT_LITERAL and _is_numeric(right):
+            return right
+        if right is _INT_LITERAL and _is_numeric(left):
+            return left
+        if left is _NULL and right.pointer:
+            return right
+        if right is _NULL and left.pointer:
+            return left
+        self.error(node, f'mismatched types {left} and {right} in {what}')
+        return None
+
+    def _type_binary(self, node: BinaryExpr, operands: List[PaluType]) -> Optional[PaluType]:
+        left, right = operands
+        op = node.op
+        if op in _LOGICAL:
+            if not (_is_scalar(left) and _is_scalar(right)):
+                self.error(node, f'operator {op.value} requires scalar operands, got {left} and {right}')
+                return None
+            return self._builtin('bool')
+        elif op in _ARITHMETIC:
+            # 指针加减整数
+            if op in (BinaryOp.ADD, BinaryOp.SUB) and left.pointer and _is_integral(right):
+                return left
+            if not (_is_numeric(left) and _is_numeric(right)):
+                self.error(node, f'operator {op.value} requires numeric operands, got {left} and {right}')
+                return None
+            return self._unify(node, left, right, f'operator {op.value}')
+        elif op in _BITWISE:
+            if not (_is_integral(left) and _is_integral(right)):
+                self.error(node, f'operator {op.value} requires integral operands, got {left} and {right}')
+                return None
+            if op in (BinaryOp.LSHIFT, BinaryOp.RSHIFT):
+                return left
+            return self._unify(node, left, right, f'operator {op.value}')
+
+        # 比较运算
+        if self._unify(node, left, right, f'operator {op.value}') is None:
+            return None
+        return self._builtin('bool')
+
+    def _type_unary(self, node: UnaryExpr, operands: List[PaluType]) -> Optional[PaluType]:
+        value = operands[0]
+        if node.op is UnaryOp.NOT:
+            if not _is_scalar(value):
+                self.error(node, f'operator ! requires a scalar operand, got {value}')
+                return None
+            return self._builtin('bool')
+        if not _is_numeric(value):
+            self.error(node, f'operator {node.op.value} requires a numeric operand, got {value}')
+            return None
+        return value
+
+    def _type_condition(self, node: ConditionExpr, operands: List[PaluType]) -> Optional[PaluType]:
+        cond, consequence, alternative = operands
+        if not _is_scalar(cond):
+            self.error(node.condition, f'condition of type {cond} is not a scalar')
+            return None
+        return self._unify(node, consequence, alternative, 'conditional expression')
+
+    def _type_call(self, node: CallExpr, operands: List[PaluType]) -> Optional[PaluType]:
+        name = _ident_name(node.ident)
+        found = self.scope.lookup(name)
+        if found is None:
+            self.error(node.ident, f'{name} is not defined')
+            return None
+        symbol = found.symbol
+        if not symbol.is_function:
+            self.error(node.ident, f'{name} is not a function')
+            return None
+
+        params = list(symbol.params or ())
+        variadic = bool(params) and params[-1] is _VARIADIC
+        if variadic:
+            params.pop()
+        if len(operands) < len(params) or (len(operands) > len(params) and not variadic):
+            self.error(node, f'{name} expects {len(params)} argument(s), got {len(operands)}')
+        for idx, (param, arg) in enumerate(zip(params, operands)):
+            expected = variable_type(param)
+            if expected is not None and not _assignable(expected, arg):
+                self.error(node.args[idx], f'argument {idx + 1} of {name} expects {expected}, got {arg}')
+        return resolve_symbol_type(symbol.ret) if symbol.ret is not None else None
+
+
+def resolve_symbol_type(symbol: PaluSymbol, pointer: int = 0) -> PaluType:
+    # 沿别名链找到基础类型，别名本身为指针时累加层数
+    while symbol.is_type_alias:
+        if symbol.is_pointer:
+            pointer += 1
+        symbol = symbol.specifier
+    return PaluType(symbol, pointer)
+
+
+def _inferred_type(value: PaluType) -> Optional[PaluType]:
+    # 字面量取 C 里的默认类型，null 推断不出指向的类型
+    if value is _INT_LITERAL:
+        return PaluType(builtin_type('i32'))
+    elif value is _STRING_LITERAL:
+        return PaluType(builtin_type('string'))
+    elif value is _NULL or value == PaluType(builtin_type('void')):
+        return None
+    return value
+
+
+def _typed_variable(name: str, typing: Optional[PaluType]) -> PaluSymbol:
+    if typing is None:
+        return PaluSymbol(name, None, [], is_variable=True)
+    # 多级指针用匿名的指针别名表示，resolve_symbol_type 沿别名链累加层数
+    specifier = typing.symbol
+    for _ in range(typing.pointer - 1):
+        specifier = PaluSymbol(specifier.name + '*', specifier, [], is_type_alias=True, is_pointer=True)
+    return PaluSymbol(name, specifier, [], is_variable=True, is_pointer=typing.pointer > 0)
+
+
+def variable_type(symbol: PaluSymbol) -> Optional[PaluType]:
+    # 类型未定义时 specifier 为 None，错误在声明处已经报告过
+    if symbol.specifier is None:
+        return None
+    return resolve_symbol_type(symbol.specifier, 1 if symbol.is_pointer else 0)
+
+
+def _lookup_type(ident: IdentExpr, scope: Scope) -> Optional[PaluSymbol]:
+    found = scope.lookup(_ident_name(ident))
+    if found is None or not (found.symbol.is_builtin_type or found.symbol.is_type_decl):
+        return None
+    return found.symbol
+
+
+def variable_symbol(typed_ident: TypedIdent, scope: Scope, qualifiers: Sequence[Qualifier] = ()) -> PaluSymbol:
+    specifier = _lookup_type(typed_ident.typing, scope) if typed_ident.typing is not None else None
+    return PaluSymbol(typed_ident.ident, specifier, qualifiers, is_variable=True, is_pointer=typed_ident.is_pointer)
+
+
+def alias_symbol(stmt: TypeAliasStatement, checker: _FunctionChecker) -> Optional[PaluSymbol]:
+    if checker.resolve_type(stmt.typing) is None:
+        return None
+    specifier = _lookup_type(stmt.typing, checker.scope)
+    return PaluSymbol(stmt.ident, specifier, [], is_type_alias=True, is_pointer=stmt.is_pointer)
+
+
+class TypeChecker(object):
+    # 第一遍只收集模块级的类型别名、external 声明和函数签名，
+    # 第二遍逐个检查函数体；函数体之间互不影响，函数数量达到 parallel_threshold 时分发到进程池
+    def __init__(self, jobs: int = 1, parallel_threshold: int = 64) -> None:
+        super().__init__()
+        self.jobs = jobs
+        self.parallel_threshold = parallel_threshold
+
+    def check(self, source_file: SourceFile) -> List[TypeCheckError]:
+        errors: List[TypeCheckError] = []
+        module_scope = Scope(source_file.mod or None, Scope.ScopeKind.Mod, name_mangling=bool(source_file.mod))
+        global_scope.add_child_scope(module_scope)
+        try:
+            funcs = self._collect(source_file, module_scope, errors)
+            if self.jobs > 1 and len(funcs) >= self.parallel_threshold:
+                errors.extend(self._check_parallel(module_scope, funcs))
+            else:
+                checker = _FunctionChecker(module_scope, errors)
+                for func, symbol in funcs:
+                    checker.check_func(func, symbol)
+        finally:
+            module_scope.parent = None
+
+        errors.sort()
+        return errors
+
+    def signatures(self, source_file: SourceFile) -> Dict[str, FunctionSignature]:
+        # 模块定义的函数签名，同时按原名和 name mangling 之后的 C 符号名索引
+        result: Dict[str, FunctionSignature] = {}
+        module_scope = Scope(source_file.mod or None, Scope.ScopeKind.Mod, name_mangling=bool(source_file.mod))
+        global_scope.add_child_scope(module_scope)
+        try:
+            for func, symbol in self._collect(source_file, module_scope, []):
+                signature = _signature(symbol)
+                result[func.func_name] = signature
+                result[module_scope.name_mangling(func.func_name)] = signature
+        finally:
+            module_scope.parent = None
+        return result
+
+    def check_externals(self, source_file: SourceFile,
+                        definitions: Mapping[str, FunctionSignature]) -> List[TypeCheckError]:
+        # 拿 external fn 声明和其它模块中的定义比较，定义的签名改变之后依赖方不需要重新生成也能发现不一致
+        errors: List[TypeCheckError] = []
+        module_scope = Scope(source_file.mod or None, Scope.ScopeKind.Mod, name_mangling=bool(source_file.mod))
+        global_scope.add_child_scope(module_scope)
+        try:
+            checker = _FunctionChecker(module_scope, [])
+            for stmt in source_file.statements:
+                if isinstance(stmt, TypeAliasStatement):
+                    symbol = alias_symbol(stmt, checker)
+                    if symbol is not None:
+                        checker.declare(stmt, symbol)
+                elif isinstance(stmt, ExternalStatement) and isinstance(stmt.spec, ExternalFunctionSpec):
+                    spec = stmt.spec
+                    expected = definitions.get(spec.ident)
+                    if expected is None:
+                        continue
+                    declared = _signature(self._function_symbol(spec.ident, spec.params, spec.returns, checker, stmt, ()))
+                    if declared != expected:
+                        errors.append(TypeCheckError(stmt.start_pos, f'external fn {spec.ident}{declared} '
+                                                                     f'does not match its definition {expected}'))
+        finally:
+            module_scope.parent = None
+        return errors
+
+    def _collect(self, source_file: SourceFile, module_scope: Scope,
+                 errors: List[TypeCheckError]) -> List[Tuple[Func, PaluSymbol]]:
+        checker = _FunctionChecker(module_scope, errors)
+        funcs: List[Tuple[Func, PaluSymbol]] = []
+        # name mangling 之后的 C 符号名，检查不同声明生成同名 C 符号
+        c_names: Dict[str, str] = {}
+
+        def declare(node: Node, symbol: PaluSymbol, c_name: str):
+            previous = c_names.get(c_name)
+            if previous is not None and previous != symbol.name:
+                checker.error(node, f'{symbol.name} conflicts with {previous} after name mangling ({c_name})')
+            c_names.setdefault(c_name, symbol.name)
+            checker.declare(node, symbol)
+
+        for stmt in source_file.statements:
+            if isinstance(stmt, ModDeclare):
+                continue
+            elif isinstance(stmt, TypeAliasStatement):
+                symbol = alias_symbol(stmt, checker)
+                if symbol is not None:
+                    declare(stmt, symbol, stmt.ident)
+            elif isinstance(stmt, ExternalStatement):
+                spec = stmt.spec
+                if isinstance(spec, ExternalFunctionSpec):
+                    symbol = self._function_symbol(spec.ident, spec.params, spec.returns, checker, stmt, (Qualifier.Extern,))
+                    declare(stmt, symbol, spec.ident)
+                elif isinstance(spec, ExternalVariableSpec):
+                    typed_ident = spec.typed_ident
+                    if typed_ident.typing is not None:
+                        checker.resolve_type(typed_ident.typing)
+                    declare(stmt, variable_symbol(typed_ident, module_scope, (Qualifier.Extern,)), typed_ident.ident)
+            elif isinstance(stmt, Func):
+                symbol = self._function_symbol(stmt.func_name, stmt.params, stmt.returns, checker, stmt, ())
+                declare(stmt, symbol, module_scope.name_mangling(stmt.func_name))
+                funcs.append((stmt, symbol))
+            else:
+                checker.error(stmt, f'unexpected {type(stmt).__name__} at module level')
+        return funcs
+
+    def _function_symbol(self, name: str, params: Sequence[Union[TypedIdent, str]], returns: IdentExpr,
+                         checker: _FunctionChecker, node: Node, qualifiers: Sequence[Qualifier]) -> PaluSymbol:
+        param_symbols: List[PaluSymbol] = []
+        for param in params:
+            if param == '...':
+                param_symbols.append(_VARIADIC)
+            elif isinstance(param, TypedIdent):
+                if param.typing is not None:
+                    checker.resolve_type(param.typing)
+                param_symbols.append(variable_symbol(param, checker.scope))
+        checker.resolve_type(returns)
+        return PaluSymbol(name, None, qualifiers, is_function=True, params=param_symbols,
+                          ret=_lookup_type(returns, checker.scope))
+
+    def _check_parallel(self, module_scope: Scope, funcs: List[Tuple[Func, PaluSymbol]]) -> List[TypeCheckError]:
+        global _forked_jobs
+        chunksize = max(1, len(funcs) // (self.jobs * 4))
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # 与 Transpiler 相同，fork 的子进程直接继承模块作用域和 AST，只传下标
+            _forked_jobs = (module_scope, funcs)
+            executor = ProcessPoolExecutor(self.jobs, mp_context=multiprocessing.get_context('fork'))
+            jobs: Sequence[Union[int, Tuple[Scope, Func, PaluSymbol]]] = range(len(funcs))
+        else:
+            executor = ProcessPoolExecutor(self.jobs)
+            jobs = [(module_scope, func, symbol) for func, symbol in funcs]
+
+        errors: List[TypeCheckError] = []
+        try:
+            with executor:
+                for result in executor.map(_check_func_job, jobs, chunksize=chunksize):
+                    errors.extend(result)
+        finally:
+            _forked_jobs = None
+        return errors
+
+
+def _signature(symbol: PaluSymbol) -> FunctionSignature:
+    params = [p for p in symbol.params or () if p is not _VARIADIC]
+    return FunctionSignature(tuple(map(variable_type, params)),
+                             resolve_symbol_type(symbol.ret) if symbol.ret is not None else None,
+                             len(params) != len(symbol.params or ()))
+
+
+_forked_jobs: Optional[Tuple[Scope, List[Tuple[Func, PaluSymbol]]]] = None
+
+
+def _check_func_job(job: Union[int, Tuple[Scope, Func, PaluSymbol]]) -> List[TypeCheckError]:
+    if isinstance(job, int):
+        assert _forked_jobs is not None
+        module_scope, funcs = _forked_jobs
+        func, symbol = funcs[job]
+    else:
+        module_scope, func, symbol = job
+    errors: List[TypeCheckError] = []
+    _FunctionChecker(module_scope, errors).check_func(func, symbol)
+    return errors
+
+
+def check(source_file: SourceFile, jobs: int = 1) -> List[TypeCheckError]:
+    return TypeChecker(jobs).check(source_file)
@@ -1,3 +1,4 @@
+import sys
 from palu.typechecker.symbol import PaluSymbol
 from typing import Dict, List, Optional
 from enum import Enum
@@ -11,6 +12,8 @@ class SymbolRedefinedException(Exception):
 
 
 class ScopedSymbol:
+    __slots__ = ('scope', 'symbol')
+
     def __init__(self, scope: 'Scope', sym: PaluSymbol) -> None:
         self.scope = scope
         self.symbol = sym
@@ -38,8 +41,39 @@ class Scope(object):
             self._name_mangling = name_mangling
 
         self.symbols: Dict[str, PaluSymbol] = {}
-        self.parent: Optional[Scope] = None
-        self.children: List[Scope] = []
+        # 与 symbols 一一对应，lookup 直接返回这里的对象，不再每次分配 ScopedSymbol
+        self._scoped: Dict[str, ScopedSymbol] = {}
+        self._parent: Optional[Scope] = None
+        # dict 保持插入顺序，同时让 reparent 时的删除是 O(1)
+        self._children: Dict[Scope, None] = {}
+        # 沿作用域链查找的结果（包括未找到），外层作用域变化时由 _invalidate 清空
+        self._cache: Dict[str, Optional[ScopedSymbol]] = {}
+
+    @property
+    def parent(self) -> Optional['Scope']:
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent: Optional['Scope']):
+        if self._parent is not None:
+            del self._parent._children[self]
+        self._parent = parent
+        if parent is not None:
+            parent._children[self] = None
+        # 只有这棵子树的查找结果会变，新建的叶子作用域只需要清空自己
+        self._invalidate()
+
+    @property
+    def children(self) -> List['Scope']:
+        return list(self._children)
+
+    def _invalidate(self):
+        stack = [self]
+        while stack:
+            scope = stack.pop()
+            if scope._cache:
+                scope._cache.clear()
+            stack.extend(scope._children)
 
     def name_mangling(self, name: str):
         if self._name_mangling:
@@ -49,19 +83,37 @@ class Scope(object):
         return name
 
     def lookup(self, name: str) -> Optional[ScopedSymbol]:
-        if name in self.symbols:
-            return ScopedSymbol(self, self.symbols[name])
-        elif self.parent is not None:
-            return self.parent.lookup(name)
-        else:
-            return None
+        cache = self._cache
+        if name in cache:
+            return cache[name]
+
+        result = None
+        scope: Optional[Scope] = self
+        while scope is not None:
+            result = scope._scoped.get(name)
+            if result is not None:
+                break
+            # 外层作用域已经缓存过这个名字时直接复用
+            if scope is not self and name in scope._cache:
+                result = scope._cache[name]
+                break
+            scope = scope._parent
+
+        cache[name] = result
+        return result
 
     def add_symbol(self, *symbols: PaluSymbol):
         for sym in symbols:
-            if sym in self.symbols:
-                raise SymbolRedefinedException(sym, self.symbols[sym.name])
+            name = sys.intern(sym.name)
+            if name in self.symbols:
+                raise SymbolRedefinedException(sym, self.symbols[name])
 
-            self.symbols[sym.name] = sym
+            self.symbols[name] = sym
+            scoped = self._scoped[name] = ScopedSymbol(self, sym)
+            self._cache[name] = scoped
+            # 子作用域可能缓存了外层的同名符号或未找到的结果
+            for child in self._children:
+                child._invalidate()
 
     def add_child_scope(self, scope: 'Scope'):
-        self.children.append(scope)
+        scope.parent = self
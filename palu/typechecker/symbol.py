@@ -1,5 +1,6 @@
+import sys
 from enum import Enum
-from typing import Optional, Sequence
+from typing import Dict, FrozenSet, Optional, Sequence
 
 
 class AmbiguousException(Exception):
@@ -15,7 +16,32 @@ class Qualifier(Enum):
     Static = 'static'
 
 
+# 各种 is_xxx 标记和限定符合并到一个 int 里，判断只需要一次位运算
+IS_VARIABLE = 1 << 0
+IS_POINTER = 1 << 1
+IS_SLICE = 1 << 2
+IS_ARRAY = 1 << 3
+IS_FUNCTION = 1 << 4
+IS_STRUCT = 1 << 5
+IS_UNION = 1 << 6
+IS_ENUM = 1 << 7
+IS_TYPE_ALIAS = 1 << 8
+IS_TYPE_DECL = 1 << 9
+IS_BUILTIN_TYPE = 1 << 10
+
+_QUALIFIER_SHIFT = 16
+QUALIFIER_BITS: Dict[Qualifier, int] = {q: 1 << (_QUALIFIER_SHIFT + idx) for idx, q in enumerate(Qualifier)}
+CONST = QUALIFIER_BITS[Qualifier.Const]
+VOLATILE = QUALIFIER_BITS[Qualifier.Volatile]
+EXPORT = QUALIFIER_BITS[Qualifier.Export]
+EXTERN = QUALIFIER_BITS[Qualifier.Extern]
+STATIC = QUALIFIER_BITS[Qualifier.Static]
+
+
 class PaluSymbol(object):
+    # struct/union/enum 的成员共用 _fields，由对应的标记决定含义
+    __slots__ = ('_name', '_specifier', '_flags', '_array_size', '_params', '_ret', '_function_receiver', '_fields')
+
     def __init__(self, name: str, specifier: Optional['PaluSymbol'], qualifiers: Sequence[Qualifier], *,
                  is_variable: bool = False, is_pointer: bool = False, is_slice: bool = False, is_array: bool = False, array_size: Optional[int] = None,
                  is_function: bool = False, params: Optional[Sequence['PaluSymbol']] = None, ret: Optional['PaluSymbol'] = None, function_receiver: Optional['PaluSymbol'] = None,
@@ -25,55 +51,66 @@ class PaluSymbol(object):
                  is_type_alias: bool = False,
                  is_builtin_type: bool = False) -> None:
         super().__init__()
-        self._name = name
+        self._name = sys.intern(name)
         self._specifier = specifier
-        self._qualifiers = set(qualifiers)
 
-        # variable
-        self._is_variable = is_variable
-        self._is_pointer = is_pointer
-        self._is_slice = is_slice
-        self._is_array = is_array
-        self._array_size = array_size
+        flags = 0
+        for qualifier in qualifiers:
+            flags |= QUALIFIER_BITS[qualifier]
 
-        if self._is_variable:
-            if self._is_pointer and self._is_slice:
+        # variable
+        if is_variable:
+            flags |= IS_VARIABLE
+            if is_pointer and is_slice:
                 raise AmbiguousException("is pointer also slice")
 
-            if self._is_pointer and self._is_array:
+            if is_pointer and is_array:
                 raise AmbiguousException("is pointer also array")
 
-            if self._is_array and self._is_slice:
+            if is_array and is_slice:
                 raise AmbiguousException("is array also slice")
 
+        if is_pointer:
+            flags |= IS_POINTER
+        if is_slice:
+            flags |= IS_SLICE
+        if is_array:
+            flags |= IS_ARRAY
+        self._array_size = array_size
+
         # function
-        self._is_function = is_function
+        if is_function:
+            flags |= IS_FUNCTION
         self._params = params
         self._ret = ret
         self._function_receiver = function_receiver
 
-        self._is_type_decl = False
-
-        # struct
-        self._is_struct = is_struct
-        self._struct_fields = struct_fields
-
-        # union
-        self._is_union = is_union
-        self._union_fields = union_fields
-
-        # enum
-        self._is_enum = is_enum
-        self._enum_fields = enum_fields
+        # struct / union / enum / alias
+        if is_struct:
+            flags |= IS_STRUCT
+        if is_union:
+            flags |= IS_UNION
+        if is_enum:
+            flags |= IS_ENUM
+        if is_type_alias:
+            flags |= IS_TYPE_ALIAS
+        if is_struct or is_enum or is_union or is_type_alias:
+            flags |= IS_TYPE_DECL
+        self._fields = struct_fields if is_struct else union_fields if is_union else enum_fields if is_enum else None
 
-        # alias
-        self._is_type_alias = is_type_alias
+        # builtin types
+        if is_builtin_type:
+            flags |= IS_BUILTIN_TYPE
+        self._flags = flags
 
-        if self._is_struct or self._is_enum or self._is_union or self._is_type_alias:
-            self._is_type_decl = True
+    def __reduce_ex__(self, protocol):
+        # 内置类型 pickle 之后仍然是同一个单例，类型比较可以继续用 is
+        if _BUILTIN_TYPES.get(self._name) is self:
+            return builtin_type, (self._name,)
+        return super().__reduce_ex__(max(protocol, 2))
 
-        # builtin types
-        self._is_builtin_type = is_builtin_type
+    def __repr__(self) -> str:
+        return f'<PaluSymbol {self._name}>'
 
     @property
     def name(self):
@@ -83,41 +120,49 @@ class PaluSymbol(object):
     def specifier(self):
         return self._specifier
 
+    @property
+    def flags(self) -> int:
+        return self._flags
+
+    @property
+    def qualifiers(self) -> FrozenSet[Qualifier]:
+        return frozenset(q for q, bit in QUALIFIER_BITS.items() if self._flags & bit)
+
     @property
     def is_static(self):
-        return self._qualifiers.issubset((Qualifier.Static,))
+        return bool(self._flags & STATIC)
 
     @property
     def is_export(self):
-        return self._qualifiers.issubset((Qualifier.Export,))
+        return bool(self._flags & EXPORT)
 
     @property
     def is_extern(self):
-        return self._qualifiers.issubset((Qualifier.Extern,))
+        return bool(self._flags & EXTERN)
 
     @property
     def is_const(self):
-        return self._qualifiers.issubset((Qualifier.Const,))
+        return bool(self._flags & CONST)
 
     @property
     def is_volatile(self):
-        return self._qualifiers.issubset((Qualifier.Volatile,))
+        return bool(self._flags & VOLATILE)
 
     @property
     def is_variable(self):
-        return self._is_variable
+        return bool(self._flags & IS_VARIABLE)
 
     @property
     def is_pointer(self):
-        return self._is_pointer
+        return bool(self._flags & IS_POINTER)
 
     @property
     def is_slice(self):
-        return self._is_slice
+        return bool(self._flags & IS_SLICE)
 
     @property
     def is_array(self):
-        return self._is_array
+        return bool(self._flags & IS_ARRAY)
 
     @property
     def array_size(self):
@@ -125,7 +170,7 @@ class PaluSymbol(object):
 
     @property
     def is_function(self):
-        return self._is_function
+        return bool(self._flags & IS_FUNCTION)
 
     @property
     def params(self):
@@ -141,36 +186,45 @@ class PaluSymbol(object):
 
     @property
     def is_struct(self):
-        return self._is_struct
+        return bool(self._flags & IS_STRUCT)
 
     @property
     def struct_fields(self):
-        return self._struct_fields
+        return self._fields if self._flags & IS_STRUCT else None
 
     @property
     def is_union(self):
-        return self._is_union
+        return bool(self._flags & IS_UNION)
 
     @property
     def union_fields(self):
-        return self._union_fields
+        return self._fields if self._flags & IS_UNION else None
 
     @property
     def is_enum(self):
-        return self._is_enum
+        return bool(self._flags & IS_ENUM)
 
     @property
     def enum_fields(self):
-        return self._enum_fields
+        return self._fields if self._flags & IS_ENUM else None
 
     @property
     def is_type_alias(self):
-        return self._is_type_alias
+        return bool(self._flags & IS_TYPE_ALIAS)
 
     @property
     def is_type_decl(self):
-        return self._is_type_decl
+        return bool(self._flags & IS_TYPE_DECL)
 
     @property
     def is_builtin_type(self):
-        return self._is_builtin_type
+        return bool(self._flags & IS_BUILTIN_TYPE)
+
+
+BUILTIN_TYPE_NAMES = ('void', 'bool', 'i8', 'u8', 'i16', 'u16', 'i32', 'u32', 'i64', 'u64', 'f32', 'f64', 'string')
+_BUILTIN_TYPES: Dict[str, PaluSymbol] = {name: PaluSymbol(name, None, [], is_builtin_type=True) for name in BUILTIN_TYPE_NAMES}
+
+
+def builtin_type(name: str) -> PaluSymbol:
+    # 内置类型全局唯一，所有作用域共享同一个对象
+    return _BUILTIN_TYPES[name]
@@ -0,0 +1,203 @@
+import hashlib
+import os
+import time
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from palu.ast.func import Func
+from palu.ast.source import SourceFile
+from palu.ast.statements import ExternalFunctionSpec, ExternalStatement
+from palu.compiler import CompileResult, _write_if_changed, output_path, scan_sources
+from palu.transpiler import Transpiler
+from palu.typechecker.checker import FunctionSignature, TypeChecker
+from palu.typechecker.scope import Scope
+
+
+class ModuleInterface(NamedTuple):
+    mod: str
+    # 本模块定义的函数，同时包含原名和 name mangling 之后的名字
+    provides: FrozenSet[str]
+    # external 声明引用的名字
+    requires: FrozenSet[str]
+    # 函数签名，变化时依赖本模块的文件需要重新生成
+    signatures: FrozenSet[tuple]
+
+
+def _type_key(value) -> tuple:
+    if isinstance(value, str):
+        return (value,)
+    typing = getattr(value, 'typing', value)
+    return (*typing.ident, getattr(value, 'is_pointer', False))
+
+
+def module_interface(source_file: SourceFile) -> ModuleInterface:
+    mod = source_file.mod
+    scope = Scope(mod, Scope.ScopeKind.Mod, name_mangling=bool(mod))
+    provides: Set[str] = set()
+    requires: Set[str] = set()
+    signatures: Set[tuple] = set()
+    for stmt in source_file.statements:
+        if isinstance(stmt, Func):
+            provides.add(stmt.func_name)
+            provides.add(scope.name_mangling(stmt.func_name))
+            signatures.add((stmt.func_name, tuple(_type_key(p) for p in stmt.params), _type_key(stmt.returns)))
+        elif isinstance(stmt, ExternalStatement):
+            spec = stmt.spec
+            requires.add(spec.ident if isinstance(spec, ExternalFunctionSpec) else spec.typed_ident.ident)
+    return ModuleInterface(mod, frozenset(provides), frozenset(requires), frozenset(signatures))
+
+
+class _Entry(object):
+    __slots__ = ('stamp', 'digest', 'ast', 'interface', 'signatures')
+
+    def __init__(self, stamp: Tuple[int, int], digest: bytes, ast: Optional[SourceFile],
+                 interface: Optional[ModuleInterface], signatures: Optional[Dict[str, FunctionSignature]] = None) -> None:
+        self.stamp = stamp
+        self.digest = digest
+        self.ast = ast
+        self.interface = interface
+        self.signatures = signatures or {}
+
+
+class Watcher(object):
+    # 轮询源码目录的 (mtime, size)，只重新解析内容确实发生变化的文件；
+    # 某个模块导出的函数签名或 mod 名变化时，通过 external 声明依赖它的文件用缓存的 AST 重新检查 external 声明；
+    # 生成的 C 代码只取决于文件自身，依赖方不需要重新输出
+    def __init__(self, roots: Iterable[str], out_dir: Optional[str] = None, jobs: int = 1) -> None:
+        super().__init__()
+        self.roots = list(roots)
+        self.out_dir = out_dir
+        self.transpiler = Transpiler(jobs=jobs)
+        self.checker = TypeChecker()
+        self.entries: Dict[str, _Entry] = {}
+
+    def _output(self, path: str) -> str:
+        # --out-dir 下保留相对监视目录的路径，不同子目录中的同名文件不会互相覆盖
+        for root in self.roots:
+            if path.startswith(os.path.join(root, '')):
+                return output_path(path, self.out_dir, root)
+        return output_path(path, self.out_dir)
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        return scan_sources(self.roots)
+
+    def dependents(self, names: Iterable[str]) -> Set[str]:
+        names = set(names)
+        return {path for path, entry in self.entries.items()
+                if entry.interface is not None and not names.isdisjoint(entry.interface.requires)}
+
+    def poll(self) -> List[CompileResult]:
+        stamps = self.scan()
+        results: List[CompileResult] = []
+        rebuilt: Set[str] = set()
+        # 接口发生变化的模块所提供的名字，变化前后的都算
+        changed_names: Set[str] = set()
+
+        for path in [p for p in self.entries if p not in stamps]:
+            interface = self.entries.pop(path).interface
+            if interface is not None:
+                changed_names |= interface.provides
+
+        for path, stamp in sorted(stamps.items()):
+            entry = self.entries.get(path)
+            if entry is not None and entry.stamp == stamp:
+                continue
+
+            result, interface_changed = self._rebuild(path, stamp, entry)
+            if result is None:
+                continue
+            results.append(result)
+            rebuilt.add(path)
+            if interface_changed:
+                for interface in (entry.interface if entry else None, self.entries[path].interface):
+                    if interface is not None:
+                        changed_names |= interface.provides
+
+        definitions = self.definitions()
+        for idx, result in enumerate(results):
+            if result.error is None:
+                results[idx] = result._replace(error=self._check_externals(result.source, definitions))
+        for path in sorted(self.dependents(changed_names) - rebuilt):
+            start = time.perf_counter()
+            error = self._check_externals(path, definitions)
+            results.append(CompileResult(path, self._output(path), time.perf_counter() - start, error))
+        return results
+
+    def definitions(self) -> Dict[str, FunctionSignature]:
+        definitions: Dict[str, FunctionSignature] = {}
+        for entry in self.entries.values():
+            definitions.update(entry.signatures)
+        return definitions
+
+    def _check_externals(self, path: str, definitions: Dict[str, FunctionSignature]) -> Optional[str]:
+        ast = self.entries[path].ast
+        if ast is None:
+            return None
+        try:
+            errors = self.checker.check_externals(ast, definitions)
+        except Exception as e:
+            return f'{path}: {type(e).__name__}: {e}'
+        return '; '.join(f'{path}:{line + 1}:{column + 1}: {text}' for (line, column), text in errors) or None
+
+    def _rebuild(self, path: str, stamp: Tuple[int, int],
+                 entry: Optional[_Entry]) -> Tuple[Optional[CompileResult], bool]:
+        from palu.parser import PaluSyntaxError, parse
+
+        start = time.perf_counter()
+        output = self._output(path)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            return CompileResult(path, output, time.perf_counter() - start, str(e)), False
+
+        digest = hashlib.sha256(data).digest()
+        if entry is not None and entry.digest == digest:
+            # 只是 touch 了一下，内容没变
+            entry.stamp = stamp
+            return None, False
+
+        try:
+            ast = parse(data)
+        except Exception as e:
+            # 保留上一次成功解析的结果，依赖关系不受语法错误影响；
+            # 语法之外的异常（比如还不支持的字面量）也只让这一个文件失败，监视不会中断
+            previous = entry.interface if entry is not None else None
+            self.entries[path] = _Entry(stamp, digest, entry.ast if entry is not None else None, previous,
+                                        entry.signatures if entry is not None else None)
+            if isinstance(e, PaluSyntaxError):
+                message = '; '.join(f'{path}:{line + 1}:{column + 1}: syntax error' for line, column in e.errors)
+            else:
+                message = f'{path}: {type(e).__name__}: {e}'
+            return CompileResult(path, output, time.perf_counter() - start, message), False
+
+        interface = module_interface(ast)
+        previous = entry.interface if entry is not None else None
+        try:
+            signatures = self.checker.signatures(ast)
+        except Exception:
+            # 签名里的错误由 check 报告，这里只是拿不到用来比较的定义
+            signatures = {}
+        self.entries[path] = _Entry(stamp, digest, ast, interface, signatures)
+        changed = previous is None or (previous.mod, previous.signatures) != (interface.mod, interface.signatures)
+        return self._emit(path, ast, start), changed
+
+    def _emit(self, path: str, ast: Optional[SourceFile], start: Optional[float] = None) -> CompileResult:
+        if start is None:
+            start = time.perf_counter()
+        output = self._output(path)
+        if ast is None:
+            return CompileResult(path, output, time.perf_counter() - start, f'{path}: no successful parse to emit')
+        try:
+            _write_if_changed(output, self.transpiler.transpile(ast))
+        except OSError as e:
+            return CompileResult(path, output, time.perf_counter() - start, str(e))
+        except Exception as e:
+            return CompileResult(path, output, time.perf_counter() - start, f'{path}: {type(e).__name__}: {e}')
+        return CompileResult(path, output, time.perf_counter() - start)
+
+    def run(self, callback: Callable[[List[CompileResult]], None], interval: float = 0.5):
+        while True:
+            results = self.poll()
+            if results:
+                callback(results)
+            time.sleep(interval)
@@ -0,0 +1,40 @@
+import pytest
+
+from palu.ast.expr import BinaryExpr, CallExpr, IdentExpr, TypedIdent
+from palu.ast.func import Func
+from palu.ast.literals import NumberLiteral
+from palu.ast.op import BinaryOp
+from palu.ast.source import ModDeclare, SourceFile
+from palu.ast.statements import If, ReturnStatement
+
+
+def _ident(row, column, name):
+    return IdentExpr((row, column), (row, column + len(name)), name)
+
+
+def _minus(row, column, name, value):
+    # name - value
+    return BinaryExpr((row, column), (row, column + len(name) + 4), BinaryOp.SUB, _ident(row, column, name),
+                      NumberLiteral((row, column + len(name) + 3), (row, column + len(name) + 4), str(value)))
+
+
+@pytest.fixture
+def fib_source() -> SourceFile:
+    # 手工构造的 fib 模块，不依赖 grammar；每个测试拿到一棵新的语法树
+    # mod fib
+    # fn fib(n: i32) -> i32 do
+    #     if n <= 2 do
+    #         return n - 1
+    #     end
+    #     return fib(n - 1) + fib(n - 2)
+    # end
+    n_lte_2 = BinaryExpr((2, 7), (2, 13), BinaryOp.LTE, _ident(2, 7, 'n'), NumberLiteral((2, 12), (2, 13), '2'))
+    base = If((2, 4), (4, 7), n_lte_2, [ReturnStatement((3, 8), (3, 20), _minus(3, 15, 'n', 1))], None)
+    recurse = BinaryExpr((5, 11), (5, 34), BinaryOp.ADD,
+                         CallExpr((5, 11), (5, 21), _ident(5, 11, 'fib'), _minus(5, 15, 'n', 1)),
+                         CallExpr((5, 24), (5, 34), _ident(5, 24, 'fib'), _minus(5, 28, 'n', 2)))
+    func = Func((1, 0), (6, 3), 'fib', [TypedIdent('n', _ident(1, 10, 'i32'))], _ident(1, 18, 'i32'), [
+        base,
+        ReturnStatement((5, 4), (5, 34), recurse),
+    ])
+    return SourceFile((0, 0), (7, 0), [ModDeclare((0, 0), (0, 7), 'fib'), func])
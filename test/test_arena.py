@@ -0,0 +1,62 @@
+from palu.ast.arena import AstArena
+from palu.ast.expr import BinaryExpr, CallExpr, IdentExpr
+from palu.ast.func import Func
+from palu.ast.op import BinaryOp
+from palu.ast.source import SourceFile
+from palu.ast.statements import If, ReturnStatement
+from palu.transpiler import Transpiler
+
+
+def _ident(row, name):
+    return IdentExpr((row, 0), (row, len(name)), name)
+
+
+def test_round_trip(fib_source):
+    arena = AstArena.from_node(fib_source)
+
+    restored = arena.node(0)
+    assert isinstance(restored, SourceFile)
+    assert restored.mod == 'fib'
+    assert Transpiler().transpile(restored) == Transpiler().transpile(fib_source)
+
+    func_idx = [*arena.children(0)][1]
+    assert arena.kind(func_idx) is Func
+    assert arena.start_pos(func_idx) == (1, 0)
+    assert arena.node(func_idx).body[1].start_pos == (5, 4)
+    assert len([*arena.find(CallExpr)]) == 2
+
+
+def test_payloads_are_shared(fib_source):
+    arena = AstArena.from_node(fib_source)
+    idents = [*arena.find(IdentExpr)]
+    assert len({arena.payloads[idx] for idx in idents}) == 3
+
+
+def test_deep_expression():
+    expr = _ident(0, 'n')
+    for _ in range(100_000):
+        expr = BinaryExpr((0, 0), (0, 0), BinaryOp.ADD, expr, _ident(0, 'n'))
+
+    restored = AstArena.from_node(expr).node(0)
+    depth = 0
+    while isinstance(restored, BinaryExpr):
+        depth += 1
+        restored = restored.left
+    assert depth == 100_000
+
+
+def test_views_read_fields_without_building_nodes(fib_source):
+    arena = AstArena.from_node(fib_source)
+    func_idx = [*arena.children(0)][1]
+    assert arena.field(func_idx, 'func_name') == 'fib'
+    body = arena.field(func_idx, 'body')
+    assert [arena.kind(idx) for idx in body] == [If, ReturnStatement]
+    assert arena.field(arena.field(body[0], 'condition'), 'op') is BinaryOp.LTE
+
+    view = arena.view(0)
+    assert view.mod == 'fib'
+    func = view.statements[1]
+    assert func.kind is Func and func.start_pos == (1, 0)
+    assert func.params[0].ident == 'n' and func.params[0].typing.ident == ('i32',)
+    assert func.body[0].alternative is None
+    assert func.body[1].expr.right.args[0].left.ident == ('n',)
@@ -0,0 +1,27 @@
+import pickle
+
+from palu.ast.expr import BinaryExpr, IdentExpr, TypedIdent
+from palu.ast.literals import NumberLiteral
+from palu.ast.node import field_names
+from palu.ast.op import BinaryOp
+
+
+def test_nodes_are_slotted_and_keep_positions():
+    expr = BinaryExpr((70000, 4), (70000, 9), BinaryOp.ADD,
+                      IdentExpr((70000, 4), (70000, 5), 'n'), NumberLiteral((70000, 8), (70000, 9), '1'))
+
+    assert not hasattr(expr, '__dict__')
+    assert expr.start_pos == (70000, 4)
+    assert expr.end_pos == (70000, 9)
+
+    expr.start_pos = (1, 2)
+    assert expr.start_pos == (1, 2)
+
+    copied = pickle.loads(pickle.dumps(expr))
+    assert copied.right.value == 1
+    assert copied.left.end_pos == (70000, 5)
+
+
+def test_field_names():
+    assert field_names(BinaryExpr) == ('left', 'right', 'op')
+    assert field_names(TypedIdent) == ('ident', 'typing', 'is_pointer')
@@ -0,0 +1,45 @@
+import os
+import time
+
+from palu.cache import CompilationCache
+from palu.compiler import compile_files
+
+
+def test_get_put(tmp_path):
+    cache = CompilationCache(str(tmp_path))
+    key = cache.key(b'mod a')
+    assert key != cache.key(b'mod b')
+    assert key != cache.key(b'mod a', options='-O')
+    assert cache.get(key) is None
+
+    cache.put(key, 'int a;')
+    assert cache.get(key) == 'int a;'
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = CompilationCache(str(tmp_path), max_bytes=20)
+    keys = [cache.key(bytes([i])) for i in range(3)]
+    for idx, key in enumerate(keys):
+        cache.put(key, 'x' * 10)
+        path = os.path.join(str(tmp_path), key[:2], key + '.c')
+        os.utime(path, (time.time() - 100 + idx, time.time() - 100 + idx))
+
+    # 读取会刷新使用时间，第一个条目因此保留下来
+    assert cache.get(keys[0]) is not None
+    cache.evict()
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_compile_files_uses_cache(tmp_path):
+    source = tmp_path / 'a.palu'
+    source.write_bytes(b'mod a')
+    cache = CompilationCache(str(tmp_path / 'cache'))
+    cache.put(cache.key(b'mod a'), 'cached output')
+
+    results = list(compile_files([(str(source), str(tmp_path / 'a.c'))], cache=cache))
+
+    assert results[0].cached
+    assert (tmp_path / 'a.c').read_text() == 'cached output'
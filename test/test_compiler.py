@@ -0,0 +1,65 @@
+import os
+
+from palu.compiler import (compile_files, conflicting_outputs, expand_source_roots,
+                           expand_sources, output_path, write_atomic)
+
+HERE = os.path.dirname(__file__)
+
+
+def test_expand_sources(tmp_path):
+    (tmp_path / 'pkg').mkdir()
+    for name in ('a.palu', 'b.palu', 'pkg/c.palu', 'notes.txt'):
+        (tmp_path / name).write_text('')
+
+    paths = expand_sources([str(tmp_path / '*.palu'), str(tmp_path), str(tmp_path / 'a.palu')])
+    assert [os.path.relpath(p, tmp_path) for p in paths] == ['a.palu', 'b.palu', os.path.join('pkg', 'c.palu')]
+
+
+def test_output_path():
+    assert output_path('src/fib.palu') == 'src/fib.c'
+    assert output_path('src/fib.palu', 'build') == os.path.join('build', 'fib.c')
+    assert output_path('src/a/fib.palu', 'build', 'src') == os.path.join('build', 'a', 'fib.c')
+    assert output_path('other/fib.palu', 'build', 'src') == os.path.join('build', 'fib.c')
+
+
+def test_out_dir_keeps_directory_layout(tmp_path):
+    for name in ('a/x.palu', 'b/x.palu'):
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text('')
+
+    roots = expand_source_roots([str(tmp_path), str(tmp_path / '*' / 'x.palu')])
+    jobs = [(path, output_path(path, 'build', root)) for path, root in roots]
+    assert [os.path.relpath(output, 'build') for _, output in jobs] == [os.path.join('a', 'x.c'), os.path.join('b', 'x.c')]
+    assert conflicting_outputs(jobs) == {}
+
+    flattened = [(path, output_path(path, 'build')) for path, _ in roots]
+    assert conflicting_outputs(flattened) == {os.path.join('build', 'x.c'): [path for path, _ in roots]}
+
+
+def test_write_atomic(tmp_path):
+    target = tmp_path / 'out' / 'fib.c'
+    write_atomic(str(target), 'int x;')
+    write_atomic(str(target), 'int y;')
+    assert target.read_text() == 'int y;'
+    assert os.listdir(tmp_path / 'out') == ['fib.c']
+
+
+def test_compile_files(tmp_path):
+    source = os.path.join(HERE, 'fibonacci.palu')
+    jobs = [(source, str(tmp_path / 'a.c')), (source, str(tmp_path / 'b.c'))]
+    results = list(compile_files(jobs, workers=2))
+
+    assert [r.error for r in results] == [None, None]
+    assert (tmp_path / 'a.c').read_text() == (tmp_path / 'b.c').read_text()
+
+
+def test_unsupported_input_fails_only_its_file(tmp_path):
+    bad = tmp_path / 'bad.palu'
+    bad.write_text('fn f(void) -> i32 do\n    return 0x10\nend\n')
+    good = os.path.join(HERE, 'fibonacci.palu')
+    jobs = [(str(bad), str(tmp_path / 'bad.c')), (good, str(tmp_path / 'good.c'))]
+    results = list(compile_files(jobs, workers=2))
+
+    assert results[0].error is not None and results[0].error.startswith(f'{bad}: ValueError')
+    assert results[1].error is None
+    assert not (tmp_path / 'bad.c').exists()
@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from palu import __version__
+from palu.daemon import DaemonClient, DaemonError, DaemonServer, DaemonUnavailable, default_socket_path
+
+
+def _serve(path):
+    DaemonServer(path).serve()
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    path = str(tmp_path / 'palu.sock')
+    process = multiprocessing.get_context('fork').Process(target=_serve, args=(path,))
+    process.start()
+
+    client = DaemonClient(path, timeout=10)
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            client.ping()
+            break
+        except DaemonUnavailable:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+
+    yield client
+    if process.is_alive():
+        process.terminate()
+    process.join()
+
+
+def test_ping(daemon):
+    response = daemon.ping()
+    assert response['version'] == __version__
+    assert response['pid'] != os.getpid()
+
+
+def test_compile_reports_errors_with_client_paths(daemon, tmp_path):
+    results = daemon.compile([('missing.palu', 'missing.c')])
+    assert len(results) == 1
+    assert results[0]['source'] == 'missing.palu'
+    assert results[0]['output'] == 'missing.c'
+    assert 'No such file' in results[0]['error']
+
+
+def test_shutdown_removes_socket(daemon):
+    daemon.shutdown()
+    deadline = time.monotonic() + 10
+    while os.path.exists(daemon.path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert not os.path.exists(daemon.path)
+    with pytest.raises(DaemonUnavailable):
+        daemon.ping()
+
+
+def test_unknown_op(daemon):
+    with pytest.raises(DaemonError, match="unknown op 'nope'"):
+        daemon.request({'op': 'nope'})
+
+
+def test_default_socket_directory_is_private(tmp_path, monkeypatch):
+    monkeypatch.delenv('PALU_SOCKET', raising=False)
+    runtime_dir = tmp_path / 'run'
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(runtime_dir))
+    assert default_socket_path() == str(runtime_dir / 'palu.sock')
+    assert runtime_dir.stat().st_mode & 0o777 == 0o700
+
+    runtime_dir.chmod(0o755)
+    with pytest.raises(DaemonUnavailable, match='mode 0700'):
+        default_socket_path()
+
+
+def test_refuses_to_replace_other_files(tmp_path):
+    path = tmp_path / 'palu.sock'
+    path.write_text('not a socket')
+    with pytest.raises(DaemonUnavailable, match='not a palu daemon socket'):
+        DaemonServer(str(path))
+    assert path.read_text() == 'not a socket'
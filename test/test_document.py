@@ -0,0 +1,77 @@
+from palu.ast.expr import BinaryExpr, IdentExpr
+from palu.ast.op import BinaryOp
+from palu.document import Document, _shifted
+from palu.parser import parse
+from palu.transpiler import Transpiler
+
+SOURCE = b'''\
+mod demo
+
+fn one(void) -> i32 do
+    return 1
+end
+
+fn two(void) -> i32 do
+    return 2
+end
+'''
+
+
+def test_edit_reuses_unchanged_declarations():
+    doc = Document(SOURCE)
+    mod, one, two = doc.source_file.statements
+
+    offset = SOURCE.index(b'return 2') + len(b'return ')
+    doc.edit(offset, offset + 1, b'42')
+    new_mod, new_one, new_two = doc.source_file.statements
+
+    assert new_mod is mod
+    assert new_one is one
+    assert new_two is not two
+    assert Transpiler().transpile(doc.source_file) == Transpiler().transpile(parse(doc.source))
+
+
+def test_edit_shifts_positions_of_reused_declarations():
+    doc = Document(SOURCE)
+    _, one, two = doc.source_file.statements
+    assert two.start_pos == (6, 0)
+
+    offset = SOURCE.index(b'fn one')
+    doc.edit(offset, offset, b'\n\n')
+    _, new_one, new_two = doc.source_file.statements
+
+    # 平移的是副本，之前返回的语法树不受影响
+    assert new_two is not two
+    assert two.start_pos == (6, 0)
+    assert new_two.start_pos == (8, 0)
+    assert new_one.start_pos == (4, 0)
+    assert Transpiler().transpile(doc.source_file) == Transpiler().transpile(parse(doc.source))
+
+
+def test_edit_drops_declarations_on_the_edited_row():
+    source = b'mod demo\nfn one(void) -> i32 do return 1 end fn two(void) -> i32 do return 2 end\n'
+    doc = Document(source)
+    _, one, two = doc.source_file.statements
+
+    # 不增减行，但后面同一行的声明列号变了
+    offset = source.index(b'return 1') + len(b'return ')
+    doc.edit(offset, offset + 1, b'100')
+    _, new_one, new_two = doc.source_file.statements
+    assert new_two is not two
+    assert new_two.start_pos == (1, two.start_pos[1] + 2)
+
+
+def test_shifted_copies_every_node(fib_source):
+    func = fib_source.statements[1]
+    before = Transpiler().transpile(func)
+    copy = _shifted(func, 3)
+
+    assert copy.start_pos == (4, 0) and func.start_pos == (1, 0)
+    assert copy.body[1].expr.left.start_pos == (8, 11) and func.body[1].expr.left.start_pos == (5, 11)
+    assert copy.params[0] is not func.params[0] and copy.body[0].consequence is not func.body[0].consequence
+    assert Transpiler().transpile(copy) == before
+
+    expr = IdentExpr((0, 0), (0, 1), 'n')
+    for _ in range(100_000):
+        expr = BinaryExpr((0, 0), (0, 1), BinaryOp.ADD, expr, IdentExpr((0, 0), (0, 1), 'n'))
+    assert _shifted(expr, 1).start_pos == (1, 0)
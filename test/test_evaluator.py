@@ -0,0 +1,234 @@
+import io
+import sys
+
+import pytest
+
+from palu.ast.expr import BinaryExpr, CallExpr, IdentExpr, TypedIdent
+from palu.ast.func import Func
+from palu.ast.literals import NumberLiteral, StringLiteral
+from palu.ast.op import BinaryOp
+from palu.ast.source import SourceFile
+from palu.ast.statements import If, ReturnStatement
+from palu.evaluator import EvalError, Evaluator, _printf, format_value
+from palu.parser import parse
+
+
+def _ident(row, name):
+    return IdentExpr((row, 0), (row, len(name)), name)
+
+
+def _load(source: bytes, **kwargs) -> Evaluator:
+    evaluator = Evaluator(**kwargs)
+    evaluator.load(parse(source))
+    return evaluator
+
+
+def test_runaway_recursion_is_reported():
+    # fn forever(n: i32) -> i32 do return forever(n) end
+    forever = Func((0, 0), (0, 0), 'forever', [TypedIdent('n', _ident(0, 'i32'))], _ident(0, 'i32'), [
+        ReturnStatement((0, 0), (0, 0), CallExpr((0, 0), (0, 0), _ident(0, 'forever'), _ident(0, 'n'))),
+    ])
+    evaluator = Evaluator()
+    evaluator.load(SourceFile((0, 0), (0, 0), [forever]))
+    with pytest.raises(EvalError, match='recursion'):
+        evaluator.call('forever', 1)
+
+
+def test_deep_recursion():
+    # fn sum(n: i64) -> i64 do if n == 0 do return 0 end return n + sum(n - 1) end
+    n = _ident(0, 'n')
+    recurse = CallExpr((0, 0), (0, 0), _ident(0, 'sum'),
+                       BinaryExpr((0, 0), (0, 0), BinaryOp.SUB, n, NumberLiteral((0, 0), (0, 1), '1')))
+    func = Func((0, 0), (0, 0), 'sum', [TypedIdent('n', _ident(0, 'i64'))], _ident(0, 'i64'), [
+        If((0, 0), (0, 0), BinaryExpr((0, 0), (0, 0), BinaryOp.EQ, n, NumberLiteral((0, 0), (0, 1), '0')),
+           [ReturnStatement((0, 0), (0, 0), NumberLiteral((0, 0), (0, 1), '0'))], None),
+        ReturnStatement((0, 0), (0, 0), BinaryExpr((0, 0), (0, 0), BinaryOp.ADD, n, recurse)),
+    ])
+    evaluator = Evaluator()
+    evaluator.load(SourceFile((0, 0), (0, 0), [func]))
+
+    limit = sys.getrecursionlimit()
+    assert evaluator.call('sum', 20000) == 20000 * 20001 // 2
+    assert sys.getrecursionlimit() == limit
+
+
+def test_evaluate_expression_against_loaded_functions(fib_source):
+    evaluator = Evaluator()
+    evaluator.load(fib_source)
+    call = CallExpr((0, 0), (0, 6), _ident(0, 'fib'), NumberLiteral((0, 4), (0, 5), '1'))
+    expr = BinaryExpr((0, 0), (0, 10), BinaryOp.SUB, call, NumberLiteral((0, 9), (0, 10), '1'))
+    assert evaluator.evaluate(expr) == -1
+
+    with pytest.raises(EvalError, match='not defined'):
+        evaluator.evaluate(IdentExpr((0, 0), (0, 1), 'x'))
+
+
+def test_fib():
+    evaluator = _load(b'''\
+mod fib
+
+fn fib(n: i32) -> i32 do
+    if n <= 2 do
+        return n - 1
+    end
+    return fib(n - 1) + fib(n - 2)
+end
+''')
+    assert [evaluator.call('fib', n) for n in range(1, 10)] == [0, 1, 1, 2, 3, 5, 8, 13, 21]
+
+
+def test_fixed_width_integers():
+    evaluator = _load(b'''\
+fn wrap_u8(n: i32) -> u8 do
+    let acc: u8 = 0
+    let i: i32 = 0
+    while i < n do
+        acc += 100
+        i += 1
+    end
+    return acc
+end
+
+fn square(a: i32) -> i32 do
+    return a * a
+end
+
+fn promoted(a: u8) -> i32 do
+    return a + a
+end
+
+fn mixed_sign(void) -> bool do
+    let u: u32 = 1
+    return -1 < u
+end
+
+fn truncate(a: i32, b: i32) -> i32 do
+    return a / b + a % b
+end
+
+fn shift(a: u64) -> u64 do
+    return a << 63
+end
+''')
+    assert evaluator.call('wrap_u8', 3) == 44
+    assert evaluator.call('square', 65536) == 0
+    assert evaluator.call('promoted', 200) == 400
+    assert evaluator.call('mixed_sign') is False
+    assert evaluator.call('truncate', -7, 2) == -4
+    assert evaluator.call('shift', 3) == 1 << 63
+
+
+def test_runtime_errors():
+    evaluator = _load(b'''\
+fn div(a: i32, b: i32) -> i32 do
+    return a / b
+end
+
+fn shl(a: i32, b: i32) -> i32 do
+    return a << b
+end
+''')
+    with pytest.raises(EvalError, match='division by zero'):
+        evaluator.call('div', 1, 0)
+    with pytest.raises(EvalError, match='shift count'):
+        evaluator.call('shl', 1, 32)
+
+
+def test_externals_and_modules():
+    out = io.StringIO()
+    evaluator = _load(b'''\
+external fn printf(fmt: *u8, ...) -> i32
+external fn math_twice(n: i32) -> i32
+external fn clock(void) -> i64
+
+fn main(void) -> i32 do
+    printf("%d %s\\n", math_twice(21), "done")
+    return clock()
+end
+''', externals={'clock': lambda: 1 << 40}, stdout=out)
+
+    with pytest.raises(EvalError, match='math_twice is not provided'):
+        evaluator.call('main')
+
+    evaluator.load(parse(b'mod math\n\nfn twice(n: i32) -> i32 do\n    return n * 2\nend\n'))
+    assert evaluator.call('main') == 0
+    assert out.getvalue() == '42 done\n'
+
+
+def test_format_value():
+    assert [format_value(v) for v in (None, True, 3, 'a')] == ['null', 'true', '3', 'a']
+
+
+def test_reloaded_function_is_seen_by_compiled_callers():
+    def returning(name, body):
+        return Func((0, 0), (0, 0), name, ['void'], _ident(0, 'i32'), [ReturnStatement((0, 0), (0, 0), body)])
+
+    evaluator = Evaluator()
+    f = returning('f', NumberLiteral((0, 0), (0, 1), '1'))
+    g = returning('g', CallExpr((0, 0), (0, 3), _ident(0, 'f')))
+    evaluator.load(SourceFile((0, 0), (0, 0), [f, g]))
+    assert evaluator.call('g') == 1
+
+    evaluator.load(SourceFile((0, 0), (0, 0), [returning('f', NumberLiteral((0, 0), (0, 1), '2'))]))
+    assert evaluator.call('g') == 2
+
+
+def test_printf_uses_c_integer_widths():
+    out = io.StringIO()
+    _printf(out, '%u %x %hhu %lu %d\n', -1, -1, -1, -1, 1 << 32)
+    assert out.getvalue() == '4294967295 ffffffff 255 18446744073709551615 0\n'
+
+
+def test_printf_reports_missing_and_mismatched_arguments():
+    out = io.StringIO()
+    with pytest.raises(EvalError, match='no argument for %d'):
+        _printf(out, '%d\n')
+    with pytest.raises(EvalError, match='%d does not accept string'):
+        _printf(out, '%d\n', 'x')
+    with pytest.raises(EvalError, match='%s does not accept i32'):
+        _printf(out, '%s\n', 1)
+    assert out.getvalue() == ''
+
+
+def _returning(name, returns, body):
+    return Func((0, 0), (0, 0), name, ['void'], _ident(0, returns), [ReturnStatement((0, 0), (0, 0), body)])
+
+
+def test_failed_load_keeps_previous_definitions():
+    evaluator = Evaluator()
+    g = _returning('g', 'i32', NumberLiteral((0, 0), (0, 1), '1'))
+    h = _returning('h', 'i32', BinaryExpr((0, 0), (0, 0), BinaryOp.ADD, CallExpr((0, 0), (0, 3), _ident(0, 'g')),
+                                          NumberLiteral((0, 0), (0, 1), '1')))
+    evaluator.load(SourceFile((0, 0), (0, 0), [g, h]))
+
+    with pytest.raises(EvalError, match='undefined is not defined'):
+        evaluator.load(SourceFile((0, 0), (0, 0), [_returning('g', 'i32', _ident(0, 'undefined'))]))
+    assert evaluator.call('h') == 2
+
+    # h 按 g 的新签名重新编译失败，整个 load 被拒绝，同时加载的 k 也不生效
+    with pytest.raises(EvalError, match='operator \\+ is not supported'):
+        evaluator.load(SourceFile((0, 0), (0, 0), [
+            _returning('g', 'string', StringLiteral((0, 0), (0, 3), '"a"')),
+            _returning('k', 'i32', NumberLiteral((0, 0), (0, 1), '3')),
+        ]))
+    assert evaluator.call('h') == 2
+    with pytest.raises(EvalError, match='k is not a function'):
+        evaluator.call('k')
+
+
+def test_callers_are_recompiled_when_a_signature_changes():
+    def square_g(returns):
+        return _returning('h', returns, BinaryExpr((0, 0), (0, 0), BinaryOp.MUL, CallExpr((0, 0), (0, 3), _ident(0, 'g')),
+                                                   NumberLiteral((0, 0), (0, 5), '65536')))
+
+    evaluator = Evaluator()
+    evaluator.load(SourceFile((0, 0), (0, 0), [_returning('g', 'i32', NumberLiteral((0, 0), (0, 5), '65536')),
+                                               square_g('i64')]))
+    assert evaluator.call('h') == 0
+
+    evaluator.load(SourceFile((0, 0), (0, 0), [_returning('g', 'i64', NumberLiteral((0, 0), (0, 5), '65536'))]))
+    assert evaluator.call('h') == 1 << 32
+
+    with pytest.raises(EvalError, match='operator \\* is not supported'):
+        evaluator.load(SourceFile((0, 0), (0, 0), [_returning('g', 'string', StringLiteral((0, 0), (0, 3), '"a"'))]))
+    assert evaluator.call('h') == 1 << 32
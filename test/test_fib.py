@@ -22,4 +22,5 @@ def test_compile_fib():
         return fib(n-1) + fib(n-2)
     end
     '''))
-    assert result =='typedef u8* bytes;extern i32 printf(bytes fmt,...);i32 fib_fib(i32 n) {if((n) == (1)) {return 0;}if((n) == (2)) {return 1;}return (fib((n) - (1))) + (fib((n) - (2)));}'
+    assert result == ('typedef u8* bytes;extern i32 printf(bytes fmt,...);'
+                      'i32 fib_fib(i32 n) {if(n == 1) {return 0;}if(n == 2) {return 1;}return fib(n - 1) + fib(n - 2);}')
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+from palu import grammar
+
+
+def test_cache_dir_override(monkeypatch, tmp_path):
+    monkeypatch.setenv('PALU_CACHE_DIR', str(tmp_path))
+    assert grammar.cache_dir() == str(tmp_path)
+    assert os.path.dirname(grammar.library_path()) == str(tmp_path)
+
+
+def test_grammar_hash_tracks_sources(monkeypatch, tmp_path):
+    (tmp_path / 'grammar.js').write_text('module.exports = grammar({name: "palu"});')
+    monkeypatch.setattr(grammar, 'GRAMMAR_DIR', str(tmp_path))
+    monkeypatch.setattr(grammar, '_grammar_hash', None)
+    first = grammar.grammar_hash()
+
+    # 结果会被缓存，直到进程重启
+    (tmp_path / 'grammar.js').write_text('module.exports = grammar({name: "palu2"});')
+    assert grammar.grammar_hash() == first
+
+    monkeypatch.setattr(grammar, '_grammar_hash', None)
+    assert grammar.grammar_hash() != first
+
+
+def test_import_does_not_load_language():
+    code = 'import palu.parser, palu.grammar; assert palu.grammar._language is None'
+    subprocess.check_call([sys.executable, '-c', code], cwd=os.path.dirname(grammar.GRAMMAR_DIR))
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+
+from palu.index import (KIND_EXTERNAL_FUNC, KIND_FUNC, KIND_TYPE_ALIAS,
+                        SCHEMA_VERSION, WorkspaceIndex, _rows)
+from palu.outline import (FuncOutline, Outline, ParamOutline,
+                          TypeAliasOutline, TypeRef)
+
+_I32 = TypeRef(('i32',))
+
+
+def test_rows_mangle_module_functions_only():
+    result = Outline('fib', (
+        TypeAliasOutline('bytes', TypeRef(('u8',), True), (2, 0)),
+        FuncOutline('printf', (ParamOutline('fmt', TypeRef(('bytes',))), '...'), _I32, (3, 0), True),
+        FuncOutline('fib', (ParamOutline('n', _I32),), _I32, (5, 0)),
+        FuncOutline('size', (ParamOutline('buf', TypeRef(('std', 'bytes'), True)),), TypeRef(('libc', 'size_t')), (9, 0)),
+    ))
+    rows = _rows('/src/fib.palu', result)
+    assert [(name, c_name, kind, signature) for _, name, c_name, kind, _, _, _, signature in rows] == [
+        ('bytes', 'bytes', KIND_TYPE_ALIAS, '*u8'),
+        ('printf', 'printf', KIND_EXTERNAL_FUNC, '(fmt: bytes, ...) -> i32'),
+        ('fib', 'fib_fib', KIND_FUNC, '(n: i32) -> i32'),
+        ('size', 'fib_size', KIND_FUNC, '(buf: *std.bytes) -> libc.size_t'),
+    ]
+
+    rows = _rows('/src/main.palu', Outline(None, (FuncOutline('main', ('void',), _I32, (0, 0)),)))
+    assert rows[0][2] == 'main'
+
+
+def test_outdated_schema_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'index.db')
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE files (path TEXT)')
+    db.execute(f'PRAGMA user_version = {SCHEMA_VERSION + 1}')
+    db.commit()
+    db.close()
+
+    with WorkspaceIndex(path) as index:
+        assert index.files() == []
+        assert index.db.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+
+
+def test_update_is_incremental(tmp_path):
+    src = tmp_path / 'src'
+    src.mkdir()
+    fib = src / 'fib.palu'
+    fib.write_bytes(b'mod fib\n\nfn fib(n: i32) -> i32 do\n    return n\nend\n')
+    main = src / 'main.palu'
+    main.write_bytes(b'external fn fib_fib(n: i32) -> i32\n\nfn main(void) -> i32 do\n    return fib_fib(10)\nend\n')
+
+    with WorkspaceIndex(str(tmp_path / 'index.db')) as index:
+        update = index.update([str(src)])
+        assert sorted(update.indexed) == [str(fib), str(main)]
+
+        assert [s.path for s in index.definitions('fib_fib')] == [str(fib)]
+        assert index.dependents(str(fib)) == {str(main)}
+        assert {s.kind for s in index.lookup('fib_fib')} == {KIND_FUNC, KIND_EXTERNAL_FUNC}
+
+        # touch 但内容不变
+        os.utime(fib, ns=(1, 1))
+        update = index.update([str(src)])
+        assert update.indexed == [] and update.unchanged == 2
+
+        fib.write_bytes(b'mod fib\n\nfn fib2(n: i32) -> i32 do\n    return n\nend\n')
+        main.unlink()
+        update = index.update([str(src)])
+        assert update.indexed == [str(fib)]
+        assert update.removed == [str(main)]
+        assert index.definitions('fib_fib') == []
+        assert [s.name for s in index.module('fib')] == ['fib2']
+
+
+def test_dependents_and_definitions_follow_c_names(tmp_path):
+    fib = str(tmp_path / 'fib.palu')
+    main = str(tmp_path / 'main.palu')
+    with WorkspaceIndex(':memory:') as index:
+        for path, result in ((fib, Outline('fib', (FuncOutline('fib', (ParamOutline('n', _I32),), _I32, (2, 0)),))),
+                             (main, Outline(None, (FuncOutline('fib_fib', (ParamOutline('n', _I32),), _I32, (0, 0), True),
+                                                   FuncOutline('main', ('void',), _I32, (2, 0)))))):
+            index.db.execute('INSERT INTO files VALUES (?, 0, 0, x\'\', ?, 0)', (path, result.mod))
+            index.db.executemany('INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?)', _rows(path, result))
+
+        assert [s.path for s in index.definitions('fib_fib')] == [fib]
+        assert index.dependents(fib) == {main}
+        assert index.dependents(main) == set()
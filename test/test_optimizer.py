@@ -0,0 +1,117 @@
+import shutil
+import subprocess
+
+import pytest
+
+from palu.ast.expr import BinaryExpr, CallExpr, ConditionExpr, IdentExpr, TypedIdent, UnaryExpr
+from palu.ast.func import Func
+from palu.ast.literals import BooleanLiteral, NumberLiteral
+from palu.ast.op import BinaryOp, UnaryOp
+from palu.ast.source import SourceFile
+from palu.ast.statements import DeclareStatement, If, ReturnStatement, WhileLoop
+from palu.optimizer import optimize
+from palu.transpiler import Transpiler
+
+
+def _num(value):
+    return NumberLiteral((0, 0), (0, 1), str(value))
+
+
+def _bin(op, left, right):
+    return BinaryExpr((0, 0), (0, 1), op, left, right)
+
+
+def _neg(expr):
+    return UnaryExpr((0, 0), (0, 1), UnaryOp.SUB, expr)
+
+
+def _emit(expr):
+    return Transpiler(optimize=True).transpile(ReturnStatement((0, 0), (0, 1), expr))
+
+
+X = IdentExpr((0, 0), (0, 1), 'x')
+
+
+def test_fold_constants():
+    assert _emit(_bin(BinaryOp.ADD, _num(1), _bin(BinaryOp.MUL, _num(2), _num(3)))) == 'return 7;'
+    assert _emit(_bin(BinaryOp.DIV, _neg(_num(7)), _num(2))) == 'return -3;'
+    assert _emit(_bin(BinaryOp.PERC, _neg(_num(7)), _num(2))) == 'return -1;'
+    assert _emit(_bin(BinaryOp.LT, _num(1), _num(2))) == 'return 1;'
+    assert _emit(_bin(BinaryOp.AND, _num(1), _bin(BinaryOp.GT, _num(1), _num(2)))) == 'return 0;'
+    assert _emit(UnaryExpr((0, 0), (0, 1), UnaryOp.NOT, _num(0))) == 'return 1;'
+    assert _emit(UnaryExpr((0, 0), (0, 1), UnaryOp.NOT, BooleanLiteral((0, 0), (0, 1), 'true'))) == 'return FALSE;'
+    assert _emit(ConditionExpr((0, 0), (0, 1), _bin(BinaryOp.EQ, _num(1), _num(1)), X, _num(0))) == 'return x;'
+
+
+def test_keep_undefined_or_overflowing_expressions():
+    assert _emit(_bin(BinaryOp.DIV, _num(1), _num(0))) == 'return 1 / 0;'
+    assert _emit(_bin(BinaryOp.MUL, _num(1 << 30), _num(4))) == 'return 1073741824 * 4;'
+    assert _emit(_bin(BinaryOp.LSHIFT, _num(1), _num(40))) == 'return 1 << 40;'
+    assert _emit(_bin(BinaryOp.ADD, X, _num(2147483648))) == 'return x + 2147483648;'
+
+
+def test_identities_and_short_circuit():
+    assert _emit(_bin(BinaryOp.MUL, X, _num(1))) == 'return x;'
+    assert _emit(_bin(BinaryOp.ADD, _num(0), _bin(BinaryOp.LSHIFT, X, _num(0)))) == 'return x;'
+    # x * 0 可能丢掉 x 的副作用，不化简
+    assert _emit(_bin(BinaryOp.MUL, X, _num(0))) == 'return x * 0;'
+    call = CallExpr((0, 0), (0, 1), IdentExpr((0, 0), (0, 1), 'f'))
+    assert _emit(_bin(BinaryOp.AND, BooleanLiteral((0, 0), (0, 1), 'false'), call)) == 'return FALSE;'
+
+
+def test_constant_branches():
+    ret_x = ReturnStatement((0, 0), (0, 1), X)
+    ret_0 = ReturnStatement((0, 0), (0, 1), _num(0))
+    declare = DeclareStatement((0, 0), (0, 1), TypedIdent('y', IdentExpr((0, 0), (0, 1), 'i32')), _num(1))
+
+    body = [
+        If((0, 0), (0, 1), _bin(BinaryOp.GT, _num(2), _num(1)), [ret_x], [ret_0]),
+        If((0, 0), (0, 1), BooleanLiteral((0, 0), (0, 1), 'false'), [ret_x], None),
+        If((0, 0), (0, 1), BooleanLiteral((0, 0), (0, 1), 'false'), [ret_x], [declare]),
+        WhileLoop((0, 0), (0, 1), _num(0), [ret_x]),
+    ]
+    transpiler = Transpiler(optimize=True)
+    assert ''.join(transpiler.transpile(stmt) for stmt in optimize(If((0, 0), (0, 1), X, body, None)).consequence) == \
+        'return x;if(1) {i32 y = 1;}'
+
+
+def test_does_not_modify_input(fib_source):
+    before = Transpiler().transpile(fib_source)
+    assert Transpiler(optimize=True).transpile(fib_source) == before
+    assert Transpiler().transpile(fib_source) == before
+
+
+def test_long_chain_does_not_recurse():
+    expr = X
+    for _ in range(100_000):
+        expr = _bin(BinaryOp.ADD, expr, _num(0))
+    assert optimize(expr) is X
+
+
+def test_constant_root_statement_becomes_a_block():
+    ret_x = ReturnStatement((0, 0), (0, 1), X)
+    transpiler = Transpiler(optimize=True)
+    assert transpiler.transpile(If((0, 0), (0, 1), BooleanLiteral((0, 0), (0, 1), 'true'), [ret_x], None)) == \
+        'if(1) {return x;}'
+    assert transpiler.transpile(WhileLoop((0, 0), (0, 1), _num(0), [ret_x])) == 'if(1) {}'
+
+
+@pytest.mark.skipif(shutil.which('gcc') is None, reason='gcc is not installed')
+def test_folded_integer_program_compiles(tmp_path):
+    # 没有用到 true/false 的程序折叠之后也不能引入 TRUE/FALSE
+    n = IdentExpr((0, 0), (0, 1), 'n')
+    i32 = IdentExpr((0, 0), (0, 1), 'i32')
+    declare = DeclareStatement((0, 0), (0, 1), TypedIdent('y', i32), n)
+    body = [
+        If((0, 0), (0, 1), _bin(BinaryOp.AND, _bin(BinaryOp.LT, _num(1), _num(2)), _num(3)), [declare], None),
+        WhileLoop((0, 0), (0, 1), _bin(BinaryOp.OR, _num(0), _bin(BinaryOp.EQ, _num(1), _num(2))), [declare]),
+        ReturnStatement((0, 0), (0, 1), _bin(BinaryOp.ADD, _bin(BinaryOp.GTE, n, _num(0)),
+                                             UnaryExpr((0, 0), (0, 1), UnaryOp.NOT, _bin(BinaryOp.NE, _num(1), _num(1))))),
+    ]
+    func = Func((0, 0), (0, 1), 'f', [TypedIdent('n', i32)], i32, body)
+    code = Transpiler(optimize=True).transpile(SourceFile((0, 0), (0, 1), [func]))
+    assert 'TRUE' not in code and 'FALSE' not in code
+
+    path = tmp_path / 'f.c'
+    path.write_text('typedef int i32;' + code)
+    subprocess.run(['gcc', '-fsyntax-only', '-Werror', str(path)], check=True)
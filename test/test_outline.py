@@ -0,0 +1,73 @@
+from palu.outline import (FuncOutline, ParamOutline, TypeAliasOutline,
+                          TypeRef, VariableOutline, outline, outline_file)
+
+_SOURCE = b'''\
+mod fib
+
+type bytes = *u8
+external fn printf(fmt: bytes, ...) -> i32
+external counter: i32
+
+fn fib(n: i32) -> i32 do
+    type local = i64
+    if n <= 2 do
+        return n - 1
+    end
+    return fib(n - 1) + fib(n - 2)
+end
+
+fn main(void) -> i32 do
+    return fib(10)
+end
+'''
+
+
+def test_outline_collects_top_level_declarations():
+    result = outline(_SOURCE)
+
+    assert result.mod == 'fib'
+    assert not result.has_error
+    assert result.declarations == (
+        TypeAliasOutline('bytes', TypeRef(('u8',), True), (2, 0)),
+        FuncOutline('printf', (ParamOutline('fmt', TypeRef(('bytes',))), '...'), TypeRef(('i32',)), (3, 0), True),
+        VariableOutline('counter', TypeRef(('i32',)), (4, 0)),
+        FuncOutline('fib', (ParamOutline('n', TypeRef(('i32',))),), TypeRef(('i32',)), (6, 0)),
+        FuncOutline('main', ('void',), TypeRef(('i32',)), (14, 0)),
+    )
+
+
+def test_outline_file_matches_outline(tmp_path):
+    path = tmp_path / 'fib.palu'
+    path.write_bytes(_SOURCE)
+    assert outline_file(str(path)) == outline(_SOURCE)
+
+
+def test_outline_keeps_declarations_around_syntax_errors():
+    result = outline(b'fn broken(void) -> i32 do\n    return )\nend\n\nfn ok(void) -> i32 do\n    return 1\nend\n')
+    assert result.has_error
+    assert [d.name for d in result.declarations][-1:] == ['ok']
+
+
+def test_outline_reads_pointer_and_dotted_types():
+    # 语法中函数返回值只能是 ident_expr，指针类型只出现在参数、变量和类型别名里
+    result = outline(b'''\
+external fn memcpy(dest: *u8, src: *u8, n: libc.size_t) -> libc.size_t
+external errno: *libc.int
+
+fn head(buf: *std.bytes, n: i32) -> std.bytes do
+    return 0
+end
+''')
+
+    assert not result.has_error
+    assert result.declarations == (
+        FuncOutline('memcpy', (
+            ParamOutline('dest', TypeRef(('u8',), True)),
+            ParamOutline('src', TypeRef(('u8',), True)),
+            ParamOutline('n', TypeRef(('libc', 'size_t'))),
+        ), TypeRef(('libc', 'size_t')), (0, 0), True),
+        VariableOutline('errno', TypeRef(('libc', 'int'), True), (1, 0)),
+        FuncOutline('head', (ParamOutline('buf', TypeRef(('std', 'bytes'), True)),
+                             ParamOutline('n', TypeRef(('i32',)))),
+                    TypeRef(('std', 'bytes')), (3, 0)),
+    )
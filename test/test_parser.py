@@ -0,0 +1,81 @@
+import pytest
+
+from palu.ast.expr import BinaryExpr, IdentExpr
+from palu.ast.op import BinaryOp
+from palu.parser import PaluSyntaxError, parse, parse_file
+from palu.transpiler import Transpiler
+
+
+def test_syntax_errors_are_collected_in_one_pass():
+    with pytest.raises(PaluSyntaxError) as exc_info:
+        parse(b'''\
+fn one(void) -> i32 do
+    return 1 +
+end
+
+fn two(void) -> i32 do
+    let x: i32 = )
+end
+''')
+
+    errors = exc_info.value.errors
+    assert errors[0] == (exc_info.value.line, exc_info.value.column)
+    assert errors == sorted(errors)
+    # 行号从 0 开始：两个函数里的错误都要报告，不能只停在第一个
+    lines = {line for line, _ in errors}
+    assert 1 in lines
+    assert 5 in lines
+    assert all(0 < line < 6 for line, _ in errors)
+
+
+def test_long_expression_chain_does_not_recurse():
+    terms = 100_000
+    source = 'fn f(n: i32) -> i32 do\n    return {}\nend\n'.format(' + '.join(['n'] * terms))
+    func = parse(source.encode('utf-8')).statements[0]
+
+    depth = 0
+    expr = func.body[0].expr
+    while isinstance(expr, BinaryExpr):
+        assert expr.op is BinaryOp.ADD
+        assert isinstance(expr.right, IdentExpr)
+        depth += 1
+        expr = expr.left
+
+    assert depth == terms - 1
+    assert expr.ident == ('n',)
+
+
+def test_identifiers_share_one_object():
+    source_file = parse(b'''\
+fn fib(n: i32) -> i32 do
+    return fib(n - 1) + fib(n - 2)
+end
+''')
+    func = source_file.statements[0]
+    expr = func.body[0].expr
+    assert func.params[0].ident is expr.left.args[0].left.ident[0]
+    assert func.returns.ident[0] is func.params[0].typing.ident[0]
+    assert func.func_name is expr.left.ident.ident[0] is expr.right.ident.ident[0]
+
+
+def test_parse_file_matches_parse(tmp_path):
+    source = b'''\
+mod fib
+
+external fn printf(fmt: *u8, ...) -> i32
+
+fn fib(n: i32) -> i32 do
+    if n <= 2 do
+        return n - 1
+    end
+    return fib(n - 1) + fib(n - 2)
+end
+'''
+    path = tmp_path / 'fib.palu'
+    path.write_bytes(source)
+    empty = tmp_path / 'empty.palu'
+    empty.write_bytes(b'')
+
+    transpiler = Transpiler()
+    assert transpiler.transpile(parse_file(str(path))) == transpiler.transpile(parse(source))
+    assert parse_file(str(empty)).statements == []
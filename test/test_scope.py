@@ -0,0 +1,106 @@
+import pickle
+
+import pytest
+
+from palu.typechecker.predefined import global_scope
+from palu.typechecker.scope import Scope, SymbolRedefinedException
+from palu.typechecker.symbol import PaluSymbol, Qualifier, builtin_type
+
+
+def _var(name):
+    return PaluSymbol(name, None, [], is_variable=True)
+
+
+def _chain(depth):
+    scopes = [Scope('root', Scope.ScopeKind.Mod)]
+    for _ in range(depth):
+        child = Scope()
+        scopes[-1].add_child_scope(child)
+        scopes.append(child)
+    return scopes
+
+
+def test_redefinition_is_detected():
+    scope = Scope()
+    scope.add_symbol(_var('a'))
+    with pytest.raises(SymbolRedefinedException):
+        scope.add_symbol(_var('a'))
+
+
+def test_lookup_walks_the_chain_without_allocating():
+    scopes = _chain(50)
+    scopes[0].add_symbol(_var('a'))
+    found = scopes[-1].lookup('a')
+
+    assert found is not None
+    assert found.scope is scopes[0]
+    assert found.mangling_name == 'root_a'
+    assert scopes[-1].lookup('a') is found
+    assert scopes[25].lookup('a') is found
+    assert scopes[-1].lookup('missing') is None
+
+
+def test_cache_is_invalidated_by_outer_definitions():
+    scopes = _chain(3)
+    assert scopes[-1].lookup('a') is None
+
+    scopes[1].add_symbol(_var('a'))
+    assert scopes[-1].lookup('a').scope is scopes[1]
+
+    # 内层遮蔽外层
+    scopes[-1].add_symbol(_var('a'))
+    assert scopes[-1].lookup('a').scope is scopes[-1]
+    assert scopes[2].lookup('a').scope is scopes[1]
+
+
+def test_reparenting_changes_lookup():
+    first, second, child = Scope(), Scope(), Scope()
+    first.add_symbol(_var('a'))
+    first.add_child_scope(child)
+    assert child.lookup('a').scope is first
+
+    second.add_child_scope(child)
+    assert child.lookup('a') is None
+    assert first.children == []
+    assert second.children == [child]
+
+
+def test_reparenting_only_invalidates_the_moved_subtree():
+    root, left, right = Scope(), Scope(), Scope()
+    root.add_symbol(_var('a'))
+    root.add_child_scope(left)
+    grandchild = Scope()
+    left.add_child_scope(grandchild)
+    assert grandchild.lookup('a').scope is root
+    assert left.lookup('b') is None
+
+    # 挂上新的叶子作用域不会清空兄弟作用域的缓存
+    root.add_child_scope(right)
+    assert 'a' in grandchild._cache and 'b' in left._cache
+
+    # 外层新增符号要让所有后代的缓存失效，包括缓存过的未找到结果
+    root.add_symbol(_var('b'))
+    assert left.lookup('b').scope is root
+    assert grandchild.lookup('b').scope is root
+
+    right.parent = None
+    assert root.children == [left]
+
+
+def test_symbol_flags_and_builtin_singletons():
+    i32 = builtin_type('i32')
+    assert global_scope.lookup('i32').symbol is i32
+    assert pickle.loads(pickle.dumps(i32)) is i32
+
+    plain = PaluSymbol('a', i32, [], is_variable=True)
+    assert not plain.is_static and not plain.is_export
+    assert not hasattr(plain, '__dict__')
+
+    sym = PaluSymbol('b', i32, [Qualifier.Static, Qualifier.Const], is_variable=True, is_pointer=True)
+    assert sym.is_static and sym.is_const and not sym.is_export
+    assert sym.is_variable and sym.is_pointer and not sym.is_array
+    assert sym.qualifiers == {Qualifier.Static, Qualifier.Const}
+
+    copied = pickle.loads(pickle.dumps(sym))
+    assert copied.flags == sym.flags
+    assert copied.specifier is i32
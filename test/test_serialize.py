@@ -0,0 +1,64 @@
+import pytest
+
+from palu.ast.arena import AstArena
+from palu.ast.expr import BinaryExpr, IdentExpr, UnaryExpr
+from palu.ast.literals import NumberLiteral, StringLiteral
+from palu.ast.op import BinaryOp, UnaryOp
+from palu.ast.serialize import AstFormatError, dump, dumps, load, loads
+from palu.ast.source import ModDeclare, SourceFile
+from palu.ast.statements import ReturnStatement
+from palu.cache import CompilationCache
+from palu.transpiler import Transpiler
+
+
+def test_round_trip(fib_source):
+    data = dumps(fib_source)
+    arena = loads(data)
+
+    assert len(arena) == len(AstArena.from_node(fib_source))
+    assert Transpiler().transpile(arena.node(0)) == Transpiler().transpile(fib_source)
+
+    func_idx = [*arena.children(0)][1]
+    assert arena.start_pos(func_idx) == (1, 0)
+    assert arena.end_pos(func_idx) == (6, 3)
+
+
+def test_payload_values():
+    expr = BinaryExpr((0, 0), (0, 9), BinaryOp.SUB,
+                      UnaryExpr((0, 0), (0, 2), UnaryOp.SUB, IdentExpr((0, 1), (0, 2), 'a')),
+                      NumberLiteral((0, 5), (0, 9), '-300'))
+    source = SourceFile((0, 0), (1, 0), [ModDeclare((0, 0), (0, 5), '模块'),
+                                         ReturnStatement((1, 0), (1, 9), expr),
+                                         ReturnStatement((2, 0), (2, 9), StringLiteral((2, 7), (2, 9), '"x"'))])
+
+    restored = loads(dumps(source)).node(0)
+    assert restored.mod == '模块'
+    assert restored.statements[1].expr.op is BinaryOp.SUB
+    assert restored.statements[1].expr.left.op is UnaryOp.SUB
+    assert Transpiler().transpile(restored) == Transpiler().transpile(source)
+
+
+def test_load_from_file(fib_source, tmp_path):
+    path = tmp_path / 'fib.ast'
+    with open(path, 'wb') as f:
+        dump(fib_source, f)
+
+    with open(path, 'rb') as f:
+        arena = load(f)
+    assert Transpiler().transpile(arena.node(0)) == Transpiler().transpile(fib_source)
+
+
+def test_rejects_invalid_data(fib_source):
+    data = dumps(fib_source)
+    with pytest.raises(AstFormatError):
+        loads(b'NOTPALU' + data[7:])
+    with pytest.raises(AstFormatError):
+        loads(data[:len(data) // 2])
+
+
+def test_cache_ast(fib_source, tmp_path):
+    cache = CompilationCache(str(tmp_path))
+    key = cache.key(b'mod fib')
+    assert cache.get_ast(key) is None
+    cache.put_ast(key, fib_source)
+    assert Transpiler().transpile(cache.get_ast(key).node(0)) == Transpiler().transpile(fib_source)
@@ -0,0 +1,206 @@
+import random
+import re
+from io import StringIO
+
+from palu.ast.expr import BinaryExpr, CallExpr, ConditionExpr, IdentExpr, ParenthesizedExpr, TypedIdent, UnaryExpr
+from palu.ast.func import Func
+from palu.ast.literals import NumberLiteral
+from palu.ast.op import BinaryOp, UnaryOp
+from palu.ast.source import ModDeclare, SourceFile
+from palu.ast.statements import ReturnStatement
+from palu.transpiler import Transpiler
+
+
+def _ident(*name):
+    return IdentExpr((0, 0), (0, 0), *name)
+
+
+def _source(functions=2):
+    statements = [ModDeclare((0, 0), (0, 0), 'demo')]
+    for i in range(functions):
+        body = [ReturnStatement((0, 0), (0, 0), BinaryExpr((0, 0), (0, 0), BinaryOp.ADD, _ident('n'),
+                                                             NumberLiteral((0, 0), (0, 0), str(i))))]
+        statements.append(Func((0, 0), (0, 0), f'f{i}', [TypedIdent('n', _ident('i32'))], _ident('i32'), body))
+    return SourceFile((0, 0), (0, 0), statements)
+
+
+class _CountingWriter(StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super().write(s)
+
+
+def test_transpiler_is_reusable():
+    transpiler = Transpiler()
+    first = transpiler.transpile(_source())
+    assert first == 'i32 demo_f0(i32 n) {return n + 0;}i32 demo_f1(i32 n) {return n + 1;}'
+    assert transpiler.transpile(_source()) == first
+
+
+def test_transpile_to_streams_in_chunks():
+    transpiler = Transpiler(buffer_size=16)
+    out = _CountingWriter()
+    transpiler.transpile_to(_source(10), out)
+
+    assert out.getvalue() == Transpiler().transpile(_source(10))
+    assert out.writes == 10
+    assert transpiler.transpile(_source()) == Transpiler().transpile(_source())
+
+
+def test_subclasses_use_parent_handler():
+    class HexLiteral(NumberLiteral):
+        __slots__ = ()
+
+    assert Transpiler().transpile(HexLiteral((0, 0), (0, 0), '255')) == '255'
+
+
+def test_parallel_output_matches_serial():
+    source = _source(20)
+    transpiler = Transpiler(jobs=2, parallel_threshold=1)
+    assert transpiler.transpile(source) == Transpiler().transpile(source)
+
+    out = StringIO()
+    transpiler.transpile_to(source, out)
+    assert out.getvalue() == Transpiler().transpile(source)
+
+
+# C 运算符优先级（与 C 标准一致），用于把生成的 C 表达式解析回来
+_C_BINARY_PREC = {'||': 1, '&&': 2, '|': 3, '^': 4, '&': 5, '==': 6, '!=': 6, '<': 7, '>': 7, '<=': 7, '>=': 7,
+                  '<<': 9, '>>': 9, '+': 10, '-': 10, '*': 11, '/': 11, '%': 11}
+# ++ 和 -- 也作为 token，一元运算符粘在一起时解析会失败
+_C_TOKEN = re.compile(r'\s*(\d+|[A-Za-z_]\w*|\+\+|--|<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%<>&|^!?:(),])')
+
+
+def _tokenize(text):
+    tokens, pos = [], 0
+    while pos < len(text):
+        match = _C_TOKEN.match(text, pos)
+        assert match, text[pos:]
+        tokens.append(match.group(1))
+        pos = match.end()
+    return tokens
+
+
+class _CParser(object):
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        assert expected is None or token == expected, (token, expected, self.tokens)
+        self.pos += 1
+        return token
+
+    def parse(self):
+        result = self.conditional()
+        assert self.peek() is None, self.tokens[self.pos:]
+        return result
+
+    def conditional(self):
+        condition = self.binary(1)
+        if self.peek() != '?':
+            return condition
+        self.take('?')
+        consequence = self.conditional()
+        self.take(':')
+        return ('?:', condition, consequence, self.conditional())
+
+    def binary(self, min_prec):
+        left = self.unary()
+        while self.peek() in _C_BINARY_PREC and _C_BINARY_PREC[self.peek()] >= min_prec:
+            op = self.take()
+            left = (op, left, self.binary(_C_BINARY_PREC[op] + 1))
+        return left
+
+    def unary(self):
+        token = self.take()
+        if token in ('-', '+', '!'):
+            return ('unary' + token, self.unary())
+        elif token == '(':
+            inner = self.conditional()
+            self.take(')')
+            return inner
+        elif token.isdigit():
+            return int(token)
+        assert token.isidentifier(), token
+        if self.peek() != '(':
+            return token
+        self.take('(')
+        args = []
+        while self.peek() != ')':
+            if args:
+                self.take(',')
+            args.append(self.conditional())
+        self.take(')')
+        return ('call', token, *args)
+
+
+def _shape(node):
+    # 与 _CParser 相同的树形表示，括号不出现在结果中
+    if isinstance(node, ParenthesizedExpr):
+        return _shape(node.expr)
+    elif isinstance(node, BinaryExpr):
+        return (node.op.value, _shape(node.left), _shape(node.right))
+    elif isinstance(node, UnaryExpr):
+        return ('unary' + node.op.value, _shape(node.expr))
+    elif isinstance(node, ConditionExpr):
+        return ('?:', _shape(node.condition), _shape(node.consequence), _shape(node.alternative))
+    elif isinstance(node, CallExpr):
+        return ('call', node.ident.ident[0], *map(_shape, node.args))
+    elif isinstance(node, NumberLiteral):
+        return ('unary-', -node.value) if node.value < 0 else node.value
+    return node.ident[0]
+
+
+def _random_expr(rng, depth):
+    if depth == 0 or rng.random() < 0.2:
+        if rng.random() < 0.5:
+            return _ident(rng.choice('abc'))
+        return NumberLiteral((0, 0), (0, 0), str(rng.randint(-3, 9)))
+
+    kind = rng.random()
+    if kind < 0.6:
+        return BinaryExpr((0, 0), (0, 0), rng.choice(list(BinaryOp)),
+                          _random_expr(rng, depth - 1), _random_expr(rng, depth - 1))
+    elif kind < 0.75:
+        return UnaryExpr((0, 0), (0, 0), rng.choice(list(UnaryOp)), _random_expr(rng, depth - 1))
+    elif kind < 0.85:
+        return ConditionExpr((0, 0), (0, 0), *(_random_expr(rng, depth - 1) for _ in range(3)))
+    elif kind < 0.95:
+        return ParenthesizedExpr((0, 0), (0, 0), _random_expr(rng, depth - 1))
+    return CallExpr((0, 0), (0, 0), _ident('f'), *(_random_expr(rng, depth - 1) for _ in range(rng.randint(0, 2))))
+
+
+def test_minimal_parentheses_preserve_structure():
+    rng = random.Random(20)
+    transpiler = Transpiler()
+    for _ in range(3000):
+        expr = _random_expr(rng, rng.randint(1, 6))
+        text = transpiler.transpile(ReturnStatement((0, 0), (0, 0), expr))
+        assert text.startswith('return ') and text.endswith(';')
+        assert _CParser(text[len('return '):-1]).parse() == _shape(expr), text
+
+
+def test_only_needed_parentheses_are_emitted():
+    a, b, c = _ident('a'), _ident('b'), _ident('c')
+
+    def emit(expr):
+        return Transpiler().transpile(ReturnStatement((0, 0), (0, 0), expr))[len('return '):-1]
+
+    def binary(op, left, right):
+        return BinaryExpr((0, 0), (0, 0), op, left, right)
+
+    assert emit(binary(BinaryOp.ADD, binary(BinaryOp.ADD, a, b), c)) == 'a + b + c'
+    assert emit(binary(BinaryOp.SUB, a, binary(BinaryOp.SUB, b, c))) == 'a - (b - c)'
+    assert emit(binary(BinaryOp.MUL, binary(BinaryOp.ADD, a, b), c)) == '(a + b) * c'
+    assert emit(binary(BinaryOp.ADD, a, binary(BinaryOp.MUL, b, c))) == 'a + b * c'
+    assert emit(UnaryExpr((0, 0), (0, 0), UnaryOp.SUB, UnaryExpr((0, 0), (0, 0), UnaryOp.SUB, a))) == '-(-a)'
+    assert emit(ParenthesizedExpr((0, 0), (0, 0), binary(BinaryOp.MUL, a, b))) == '(a * b)'
@@ -0,0 +1,121 @@
+from palu.ast.expr import AssignmentExpr, BinaryExpr, CallExpr, IdentExpr, TypedIdent
+from palu.ast.func import Func
+from palu.ast.literals import BooleanLiteral, NullLiteral, NumberLiteral, StringLiteral
+from palu.ast.op import AsssignmentOp, BinaryOp
+from palu.ast.source import ModDeclare, SourceFile
+from palu.ast.statements import (DeclareStatement, ExternalFunctionSpec, ExternalStatement,
+                                 ReturnStatement, TypeAliasStatement)
+from palu.typechecker.checker import TypeChecker, check
+from palu.typechecker.predefined import global_scope
+
+
+def _ident(row, name):
+    return IdentExpr((row, 0), (row, len(name)), name)
+
+
+def _func(row, name, params, returns, body):
+    return Func((row, 0), (row, 1), name, params, _ident(row, returns), body)
+
+
+def _module(*statements):
+    return SourceFile((0, 0), (100, 0), [ModDeclare((0, 0), (0, 5), 'demo'), *statements])
+
+
+def _messages(source):
+    return [error.message for error in check(source)]
+
+
+def test_fib_is_well_typed(fib_source):
+    assert check(fib_source) == []
+    assert global_scope.children == []
+
+
+def test_declare_assign_and_call():
+    printf = ExternalStatement((1, 0), (1, 1), ExternalFunctionSpec(
+        (1, 0), (1, 1), 'printf', [TypedIdent('fmt', _ident(1, 'u8'), True), '...'], _ident(1, 'i32')))
+    main = _func(2, 'main', ['void'], 'i32', [
+        DeclareStatement((3, 0), (3, 1), TypedIdent('n', _ident(3, 'i32')), NumberLiteral((3, 5), (3, 6), '1')),
+        AssignmentExpr((4, 0), (4, 1), _ident(4, 'n'), AsssignmentOp.AddAssign, NumberLiteral((4, 5), (4, 6), '1')),
+        CallExpr((5, 0), (5, 1), _ident(5, 'printf'), StringLiteral((5, 7), (5, 11), '"%d"'), _ident(5, 'n')),
+        ReturnStatement((6, 0), (6, 1), _ident(6, 'n')),
+    ])
+    assert _messages(_module(printf, main)) == []
+
+
+def test_reports_errors_in_position_order():
+    bytes_alias = TypeAliasStatement((1, 0), (1, 1), 'bytes', _ident(1, 'u8'), True)
+    f = _func(2, 'f', [TypedIdent('p', _ident(2, 'bytes'))], 'i32', [
+        DeclareStatement((3, 0), (3, 1), TypedIdent('a', _ident(3, 'i32')), BooleanLiteral((3, 5), (3, 9), 'true')),
+        DeclareStatement((4, 0), (4, 1), TypedIdent('a', _ident(4, 'i32')), NumberLiteral((4, 5), (4, 6), '1')),
+        DeclareStatement((5, 0), (5, 1), TypedIdent('q', _ident(5, 'bytes')), NullLiteral((5, 5), (5, 9))),
+        AssignmentExpr((6, 0), (6, 1), _ident(6, 'a'), AsssignmentOp.Direct, _ident(6, 'p')),
+        CallExpr((7, 0), (7, 1), _ident(7, 'f'), NumberLiteral((7, 2), (7, 3), '1')),
+        CallExpr((8, 0), (8, 1), _ident(8, 'g')),
+        ReturnStatement((9, 0), (9, 1), BinaryExpr((9, 7), (9, 12), BinaryOp.ADD, _ident(9, 'a'), _ident(9, 'missing'))),
+    ])
+    assert _messages(_module(bytes_alias, f)) == [
+        'cannot initialize a of type i32 with bool',
+        'a was redefined in this scope',
+        'cannot assign u8* to a of type i32',
+        'argument 1 of f expects u8*, got {integer}',
+        'g is not defined',
+        'missing is not defined',
+    ]
+
+
+def test_name_conflict_after_mangling():
+    external = ExternalStatement((1, 0), (1, 1), ExternalFunctionSpec((1, 0), (1, 1), 'demo_f', ['void'], _ident(1, 'i32')))
+    f = _func(2, 'f', ['void'], 'i32', [ReturnStatement((3, 0), (3, 1), NumberLiteral((3, 7), (3, 8), '0'))])
+    assert _messages(_module(external, f)) == ['f conflicts with demo_f after name mangling (demo_f)']
+
+
+def test_parallel_matches_serial():
+    funcs = [_func(row, f'f{row}', [TypedIdent('n', _ident(row, 'i32'))], 'i32', [
+        ReturnStatement((row, 4), (row, 5), _ident(row, 'n' if row % 3 else 'x')),
+    ]) for row in range(1, 40)]
+    source = _module(*funcs)
+
+    serial = check(source)
+    assert len(serial) == 13
+    assert TypeChecker(jobs=2, parallel_threshold=8).check(source) == serial
+
+
+def test_check_externals_against_definitions():
+    f = _func(1, 'f', [TypedIdent('n', _ident(1, 'i32'))], 'i32', [ReturnStatement((2, 0), (2, 1), _ident(2, 'n'))])
+    definitions = TypeChecker().signatures(_module(f))
+    assert set(definitions) == {'f', 'demo_f'}
+    assert str(definitions['f']) == '(i32) -> i32'
+
+    # 别名解析之后再比较
+    alias = TypeAliasStatement((1, 0), (1, 1), 'int', _ident(1, 'i32'))
+    same = ExternalStatement((2, 0), (2, 1), ExternalFunctionSpec(
+        (2, 0), (2, 1), 'demo_f', [TypedIdent('x', _ident(2, 'int'))], _ident(2, 'int')))
+    wider = ExternalStatement((3, 0), (3, 1), ExternalFunctionSpec(
+        (3, 0), (3, 1), 'f', [TypedIdent('n', _ident(3, 'i64'))], _ident(3, 'i32')))
+    unknown = ExternalStatement((4, 0), (4, 1), ExternalFunctionSpec((4, 0), (4, 1), 'puts', ['void'], _ident(4, 'i32')))
+    main = SourceFile((0, 0), (5, 0), [ModDeclare((0, 0), (0, 5), 'main'), alias, same, wider, unknown])
+    errors = TypeChecker().check_externals(main, definitions)
+    assert errors == [((3, 0), 'external fn f(i64) -> i32 does not match its definition (i32) -> i32')]
+    assert global_scope.children == []
+
+
+def test_untyped_let_takes_the_type_of_its_initial_value():
+    def let(row, name, value):
+        return DeclareStatement((row, 0), (row, 1), TypedIdent(name, None), value)
+
+    f = _func(1, 'f', [TypedIdent('p', _ident(1, 'u8'), True)], 'i32', [
+        let(2, 's', StringLiteral((2, 8), (2, 11), '"a"')),
+        let(3, 'n', NumberLiteral((3, 8), (3, 9), '1')),
+        let(4, 'q', _ident(4, 'p')),
+        AssignmentExpr((5, 0), (5, 1), _ident(5, 'q'), AsssignmentOp.Direct, _ident(5, 'n')),
+        let(6, 'z', NullLiteral((6, 8), (6, 12))),
+        DeclareStatement((7, 0), (7, 1), TypedIdent('x', None), None),
+        ReturnStatement((8, 0), (8, 1),
+                        BinaryExpr((8, 7), (8, 12), BinaryOp.ADD, _ident(8, 's'), NumberLiteral((8, 11), (8, 12), '1'))),
+    ])
+    assert _messages(_module(f)) == [
+        'cannot assign i32 to q of type u8*',
+        'cannot infer the type of z from null',
+        'cannot infer the type of x without an initial value',
+        'operator + requires numeric operands, got string and {integer}',
+    ]
@@ -0,0 +1,74 @@
+import os
+
+from palu.ast.expr import IdentExpr, TypedIdent
+from palu.ast.source import ModDeclare, SourceFile
+from palu.ast.statements import ExternalFunctionSpec, ExternalStatement
+from palu.watch import Watcher, module_interface
+
+MATH = b'''\
+mod math
+
+fn square(n: i32) -> i32 do
+    return n * n
+end
+'''
+
+MAIN = b'''\
+mod main
+
+external fn square(n: i32) -> i32
+
+fn main(void) -> i32 do
+    return square(3)
+end
+'''
+
+
+def test_module_interface(fib_source):
+    interface = module_interface(fib_source)
+    assert interface.mod == 'fib'
+    assert interface.provides == {'fib', 'fib_fib'}
+    assert interface.requires == set()
+
+    i32 = IdentExpr((0, 0), (0, 3), 'i32')
+    external = ExternalStatement((1, 0), (1, 30), ExternalFunctionSpec((1, 9), (1, 30), 'fib', [TypedIdent('n', i32)], i32))
+    interface = module_interface(SourceFile((0, 0), (2, 0), [ModDeclare((0, 0), (0, 8), 'main'), external]))
+    assert interface.requires == {'fib'}
+    assert interface.signatures == frozenset()
+
+
+def test_poll_rebuilds_changed_files_and_dependents(tmp_path):
+    (tmp_path / 'math.palu').write_bytes(MATH)
+    (tmp_path / 'main.palu').write_bytes(MAIN)
+    watcher = Watcher([str(tmp_path)])
+
+    results = watcher.poll()
+    assert sorted(os.path.basename(r.source) for r in results) == ['main.palu', 'math.palu']
+    assert all(r.error is None for r in results)
+    assert watcher.poll() == []
+
+    # 只改函数体，不影响依赖方
+    (tmp_path / 'math.palu').write_bytes(MATH.replace(b'n * n', b'n * n + 0'))
+    os.utime(tmp_path / 'math.palu', ns=(1, 1))
+    assert [os.path.basename(r.source) for r in watcher.poll()] == ['math.palu']
+
+    # 签名变化时重新检查依赖 square 的 main.palu，external 声明和新的定义不一致
+    (tmp_path / 'math.palu').write_bytes(MATH.replace(b'n: i32', b'n: i64'))
+    os.utime(tmp_path / 'math.palu', ns=(2, 2))
+    results = watcher.poll()
+    assert [os.path.basename(r.source) for r in results] == ['math.palu', 'main.palu']
+    assert results[0].error is None
+    assert 'external fn square(i32) -> i32 does not match its definition (i64) -> i32' in results[1].error
+
+    # 依赖方跟着改过来之后不再报错
+    (tmp_path / 'main.palu').write_bytes(MAIN.replace(b'n: i32', b'n: i64'))
+    os.utime(tmp_path / 'main.palu', ns=(3, 3))
+    results = watcher.poll()
+    assert [(os.path.basename(r.source), r.error) for r in results] == [('main.palu', None)]
+
+
+def test_unexpected_exception_fails_only_its_file(tmp_path):
+    watcher = Watcher([str(tmp_path)], str(tmp_path / 'out'))
+    result = watcher._emit(str(tmp_path / 'bad.palu'), SourceFile((0, 0), (1, 0), [object()]))
+    assert result.error is not None and 'KeyError' in result.error
+    assert not os.path.exists(result.output)
@@ -1,4 +1,4 @@
-from typing import Optional, List, Sequence, Tuple, Any, Union
+from typing import Callable, Optional, List, Sequence, Tuple, Any, Union
 
 
 class Node:
@@ -164,8 +164,8 @@ class TreeCursor:
 class Parser:
     """A Parser"""
 
-    def parse(self, source_code: bytes, old_tree: Tree = None) -> Tree:
-        """Parse source code, creating a syntax tree."""
+    def parse(self, source_code: Union[bytes, Callable[[int, Tuple[int, int]], bytes]], old_tree: Tree = None) -> Tree:
+        """Parse source code, creating a syntax tree. A read callback is accepted since 0.20."""
         ...
 
     def set_language(self, language: Language) -> None: